@@ -0,0 +1,32 @@
+"""Add cache generation
+
+Revision ID: 1e5a9c7d3b42
+Revises: 6d1c8b3f5e27
+Create Date: 2025-08-18 10:12:47.502113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1e5a9c7d3b42'
+down_revision: Union[str, Sequence[str], None] = '6d1c8b3f5e27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('cache_generation',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('generation', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('cache_generation')
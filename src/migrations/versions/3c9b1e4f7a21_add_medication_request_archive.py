@@ -0,0 +1,50 @@
+"""Add medication request archive
+
+Revision ID: 3c9b1e4f7a21
+Revises: 07576f4a8aad
+Create Date: 2025-07-01 10:12:04.118342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9b1e4f7a21'
+down_revision: Union[str, Sequence[str], None] = '07576f4a8aad'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The status enum type already exists from the medication_request table
+    status_enum = sa.Enum('active', 'completed', 'cancelled', 'on-hold', name='medication_request_status_enum').with_variant(
+        postgresql.ENUM('active', 'completed', 'cancelled', 'on-hold', name='medication_request_status_enum', create_type=False),
+        'postgresql',
+    )
+    op.create_table('medication_request_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('patient_reference', sa.Integer(), nullable=False),
+    sa.Column('clinician_reference', sa.String(length=20), nullable=False),
+    sa.Column('medication_reference', sa.String(length=10), nullable=False),
+    sa.Column('reason', sa.Text(), nullable=False),
+    sa.Column('prescribed_date', sa.Date(), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=True),
+    sa.Column('frequency', sa.String(length=50), nullable=False),
+    sa.Column('status', status_enum, nullable=False),
+    sa.Column('archived_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['clinician_reference'], ['clinician.registration_id'], ),
+    sa.ForeignKeyConstraint(['medication_reference'], ['medication.code'], ),
+    sa.ForeignKeyConstraint(['patient_reference'], ['patient.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('medication_request_archive')
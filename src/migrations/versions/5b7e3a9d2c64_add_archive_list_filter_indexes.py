@@ -0,0 +1,43 @@
+"""Add archive list filter indexes
+
+Revision ID: 5b7e3a9d2c64
+Revises: 8f2d4a6c1b93
+Create Date: 2025-08-21 14:03:52.770416
+
+"""
+from typing import Sequence, Union
+
+from patient_medication_app.database.online_migrations import (
+    create_index_concurrently,
+    drop_index_concurrently,
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e3a9d2c64'
+down_revision: Union[str, Sequence[str], None] = '8f2d4a6c1b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built concurrently on PostgreSQL, so archiving goes on meanwhile
+    create_index_concurrently('ix_medication_request_archive_status_prescribed_date', 'medication_request_archive', ['status', 'prescribed_date'])
+    create_index_concurrently('ix_medication_request_archive_patient_prescribed_date', 'medication_request_archive', ['patient_reference', 'prescribed_date'])
+    create_index_concurrently('ix_medication_request_archive_clinician_prescribed_date', 'medication_request_archive', ['clinician_reference', 'prescribed_date'])
+    create_index_concurrently('ix_medication_request_archive_medication_prescribed_date', 'medication_request_archive', ['medication_reference', 'prescribed_date'])
+    create_index_concurrently('ix_medication_request_archive_prescribed_date', 'medication_request_archive', ['prescribed_date'])
+    create_index_concurrently('ix_medication_request_archive_start_date', 'medication_request_archive', ['start_date'])
+    create_index_concurrently('ix_medication_request_archive_end_date', 'medication_request_archive', ['end_date'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('ix_medication_request_archive_end_date', 'medication_request_archive')
+    drop_index_concurrently('ix_medication_request_archive_start_date', 'medication_request_archive')
+    drop_index_concurrently('ix_medication_request_archive_prescribed_date', 'medication_request_archive')
+    drop_index_concurrently('ix_medication_request_archive_medication_prescribed_date', 'medication_request_archive')
+    drop_index_concurrently('ix_medication_request_archive_clinician_prescribed_date', 'medication_request_archive')
+    drop_index_concurrently('ix_medication_request_archive_patient_prescribed_date', 'medication_request_archive')
+    drop_index_concurrently('ix_medication_request_archive_status_prescribed_date', 'medication_request_archive')
@@ -0,0 +1,33 @@
+"""Add migration checkpoint
+
+Revision ID: 6d1c8b3f5e27
+Revises: 9a4f2e7b3d15
+Create Date: 2025-08-11 16:05:22.318940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d1c8b3f5e27'
+down_revision: Union[str, Sequence[str], None] = '9a4f2e7b3d15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('migration_checkpoint',
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('last_key', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('migration_checkpoint')
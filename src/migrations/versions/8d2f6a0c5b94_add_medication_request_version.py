@@ -0,0 +1,30 @@
+"""Add medication request version
+
+Revision ID: 8d2f6a0c5b94
+Revises: 3c9b1e4f7a21
+Create Date: 2025-07-08 09:41:27.603915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f6a0c5b94'
+down_revision: Union[str, Sequence[str], None] = '3c9b1e4f7a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('medication_request', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('medication_request_archive', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('medication_request_archive', 'version')
+    op.drop_column('medication_request', 'version')
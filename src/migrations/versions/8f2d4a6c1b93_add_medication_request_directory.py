@@ -0,0 +1,32 @@
+"""Add medication request directory
+
+Revision ID: 8f2d4a6c1b93
+Revises: 1e5a9c7d3b42
+Create Date: 2025-08-20 09:41:05.318274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f2d4a6c1b93'
+down_revision: Union[str, Sequence[str], None] = '1e5a9c7d3b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('medication_request_directory',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('patient_reference', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('medication_request_directory')
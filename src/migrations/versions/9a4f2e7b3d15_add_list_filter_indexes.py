@@ -0,0 +1,55 @@
+"""Add list filter indexes
+
+Revision ID: 9a4f2e7b3d15
+Revises: f2b8d4c6a913
+Create Date: 2025-08-04 10:27:39.614052
+
+"""
+from typing import Sequence, Union
+
+from patient_medication_app.database.online_migrations import (
+    create_index_concurrently,
+    drop_index_concurrently,
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4f2e7b3d15'
+down_revision: Union[str, Sequence[str], None] = 'f2b8d4c6a913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built concurrently on PostgreSQL, so writes to the tables go on
+    create_index_concurrently('ix_medication_request_status_prescribed_date', 'medication_request', ['status', 'prescribed_date'])
+    create_index_concurrently('ix_medication_request_patient_prescribed_date', 'medication_request', ['patient_reference', 'prescribed_date'])
+    create_index_concurrently('ix_medication_request_clinician_prescribed_date', 'medication_request', ['clinician_reference', 'prescribed_date'])
+    create_index_concurrently('ix_medication_request_medication_prescribed_date', 'medication_request', ['medication_reference', 'prescribed_date'])
+    create_index_concurrently('ix_medication_request_prescribed_date', 'medication_request', ['prescribed_date'])
+    create_index_concurrently('ix_medication_request_start_date', 'medication_request', ['start_date'])
+    create_index_concurrently('ix_medication_request_end_date', 'medication_request', ['end_date'])
+    create_index_concurrently('ix_medication_request_listing_patient_prescribed_date', 'medication_request_listing', ['patient_reference', 'prescribed_date'])
+    create_index_concurrently('ix_medication_request_listing_clinician_prescribed_date', 'medication_request_listing', ['clinician_reference', 'prescribed_date'])
+    create_index_concurrently('ix_medication_request_listing_medication_prescribed_date', 'medication_request_listing', ['medication_reference', 'prescribed_date'])
+    create_index_concurrently('ix_medication_request_listing_prescribed_date', 'medication_request_listing', ['prescribed_date'])
+    create_index_concurrently('ix_medication_request_listing_start_date', 'medication_request_listing', ['start_date'])
+    create_index_concurrently('ix_medication_request_listing_end_date', 'medication_request_listing', ['end_date'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('ix_medication_request_listing_end_date', 'medication_request_listing')
+    drop_index_concurrently('ix_medication_request_listing_start_date', 'medication_request_listing')
+    drop_index_concurrently('ix_medication_request_listing_prescribed_date', 'medication_request_listing')
+    drop_index_concurrently('ix_medication_request_listing_medication_prescribed_date', 'medication_request_listing')
+    drop_index_concurrently('ix_medication_request_listing_clinician_prescribed_date', 'medication_request_listing')
+    drop_index_concurrently('ix_medication_request_listing_patient_prescribed_date', 'medication_request_listing')
+    drop_index_concurrently('ix_medication_request_end_date', 'medication_request')
+    drop_index_concurrently('ix_medication_request_start_date', 'medication_request')
+    drop_index_concurrently('ix_medication_request_prescribed_date', 'medication_request')
+    drop_index_concurrently('ix_medication_request_medication_prescribed_date', 'medication_request')
+    drop_index_concurrently('ix_medication_request_clinician_prescribed_date', 'medication_request')
+    drop_index_concurrently('ix_medication_request_patient_prescribed_date', 'medication_request')
+    drop_index_concurrently('ix_medication_request_status_prescribed_date', 'medication_request')
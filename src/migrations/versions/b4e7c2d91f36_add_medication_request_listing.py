@@ -0,0 +1,55 @@
+"""Add medication request listing
+
+Revision ID: b4e7c2d91f36
+Revises: 8d2f6a0c5b94
+Create Date: 2025-07-15 14:03:51.287604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e7c2d91f36'
+down_revision: Union[str, Sequence[str], None] = '8d2f6a0c5b94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The status enum type already exists from the medication_request table
+    status_enum = sa.Enum('active', 'completed', 'cancelled', 'on-hold', name='medication_request_status_enum').with_variant(
+        postgresql.ENUM('active', 'completed', 'cancelled', 'on-hold', name='medication_request_status_enum', create_type=False),
+        'postgresql',
+    )
+    op.create_table('medication_request_listing',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('patient_reference', sa.Integer(), nullable=False),
+    sa.Column('clinician_reference', sa.String(length=20), nullable=False),
+    sa.Column('medication_reference', sa.String(length=10), nullable=False),
+    sa.Column('reason', sa.Text(), nullable=False),
+    sa.Column('prescribed_date', sa.Date(), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=True),
+    sa.Column('frequency', sa.String(length=50), nullable=False),
+    sa.Column('status', status_enum, nullable=False),
+    sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+    sa.Column('medication_code_name', sa.String(length=100), nullable=False),
+    sa.Column('clinician_first_name', sa.String(length=50), nullable=False),
+    sa.Column('clinician_last_name', sa.String(length=50), nullable=False),
+    sa.ForeignKeyConstraint(['clinician_reference'], ['clinician.registration_id'], ),
+    sa.ForeignKeyConstraint(['medication_reference'], ['medication.code'], ),
+    sa.ForeignKeyConstraint(['patient_reference'], ['patient.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_medication_request_listing_status_prescribed_date', 'medication_request_listing', ['status', 'prescribed_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_medication_request_listing_status_prescribed_date', table_name='medication_request_listing')
+    op.drop_table('medication_request_listing')
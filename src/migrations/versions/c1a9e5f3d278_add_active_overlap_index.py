@@ -0,0 +1,28 @@
+"""Add active overlap index
+
+Revision ID: c1a9e5f3d278
+Revises: b4e7c2d91f36
+Create Date: 2025-07-22 11:26:48.530172
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c1a9e5f3d278'
+down_revision: Union[str, Sequence[str], None] = 'b4e7c2d91f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_medication_request_active_overlap', 'medication_request', ['patient_reference', 'medication_reference', 'start_date'], unique=False, postgresql_where=sa.text("status = 'active'"), sqlite_where=sa.text("status = 'active'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_medication_request_active_overlap', table_name='medication_request', postgresql_where=sa.text("status = 'active'"), sqlite_where=sa.text("status = 'active'"))
@@ -0,0 +1,35 @@
+"""Add scheduler lease and active end date index
+
+Revision ID: e7d3a1b5c940
+Revises: c1a9e5f3d278
+Create Date: 2025-07-24 09:41:17.206815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7d3a1b5c940'
+down_revision: Union[str, Sequence[str], None] = 'c1a9e5f3d278'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('scheduler_lease',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('owner', sa.String(length=100), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_index('ix_medication_request_active_end_date', 'medication_request', ['end_date'], unique=False, postgresql_where=sa.text("status = 'active'"), sqlite_where=sa.text("status = 'active'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_medication_request_active_end_date', table_name='medication_request', postgresql_where=sa.text("status = 'active'"), sqlite_where=sa.text("status = 'active'"))
+    op.drop_table('scheduler_lease')
@@ -0,0 +1,52 @@
+"""Add medication request audit outbox and log
+
+Revision ID: f2b8d4c6a913
+Revises: e7d3a1b5c940
+Create Date: 2025-07-29 14:12:53.481207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b8d4c6a913'
+down_revision: Union[str, Sequence[str], None] = 'e7d3a1b5c940'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('medication_request_audit_outbox',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('medication_request_id', sa.Integer(), nullable=False),
+    sa.Column('action', sa.String(length=20), nullable=False),
+    sa.Column('actor', sa.String(length=100), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.Column('snapshot', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Monthly partitions are created by the audit drainer as it needs them
+    op.create_table('medication_request_audit',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.Column('medication_request_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('action', sa.String(length=20), nullable=False),
+    sa.Column('actor', sa.String(length=100), nullable=False),
+    sa.Column('changes', sa.JSON(), nullable=False),
+    sa.Column('snapshot', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('id', 'changed_at'),
+    postgresql_partition_by='RANGE (changed_at)'
+    )
+    op.create_index('ix_medication_request_audit_request_version', 'medication_request_audit', ['medication_request_id', 'version'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_medication_request_audit_request_version', table_name='medication_request_audit')
+    op.drop_table('medication_request_audit')
+    op.drop_table('medication_request_audit_outbox')
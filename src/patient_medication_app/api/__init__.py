@@ -5,6 +5,7 @@ This module initializes API routes for managing patient medication data.
 from fastapi import APIRouter
 
 from .medication_request_router import router as medication_request_router
+from .medication_router import router as medication_router
 
 api_router = APIRouter()
 
@@ -15,5 +16,10 @@ api_router.include_router(
     prefix="/medication-requests",
     tags=["medication_requests"],
 )
+api_router.include_router(
+    medication_router,
+    prefix="/medications",
+    tags=["medications"],
+)
 
 __all__ = ["api_router"]
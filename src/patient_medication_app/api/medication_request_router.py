@@ -2,213 +2,1392 @@
 This module defines the API routes for managing medication request data in the Patient Medication service.
 """
 
+import heapq
+import json
 from datetime import date
-from typing import Optional
+from functools import partial
+from typing import Callable, Generator, Iterator, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Header,
+    HTTPException,
+    Query,
+    UploadFile,
+)
+from fastapi.responses import Response, StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import Label
 
+from patient_medication_app.core.audit import audit_history, record_change
+from patient_medication_app.core.cache import result_cache
+from patient_medication_app.core.coalescing import SingleFlight
+from patient_medication_app.core.expand import (
+    UnknownExpansionError,
+    expand_rows,
+    parse_expand,
+)
+from patient_medication_app.core.export import (
+    MEDIA_TYPES,
+    ExportFormat,
+    ExportUnavailableError,
+    export_schema,
+    export_stream,
+)
+from patient_medication_app.core.importer import (
+    ImportFileError,
+    ImportFormat,
+    import_medication_requests,
+    iter_rows,
+)
 from patient_medication_app.core.models import (
     Clinician,
     Medication,
     MedicationRequest,
+    MedicationRequestArchive,
+    MedicationRequestListing,
     Patient,
 )
-from patient_medication_app.database.connections import get_session
+from patient_medication_app.core.overlaps import (
+    find_overlapping_requests,
+    lock_patient,
+)
+from patient_medication_app.core.queries import (
+    MedicationRequestFilters,
+    count_medication_requests,
+    medication_request_filters,
+)
+from patient_medication_app.core.read_model import record_created, record_updated
+from patient_medication_app.core.timeseries import (
+    ACTIVE_STATUSES,
+    MAX_TIMESERIES_DAYS,
+    TimeSeriesGroupBy,
+    TimeSeriesUnavailableError,
+    medication_request_timeseries,
+)
+from patient_medication_app.database.connections import (
+    get_session,
+    get_session_factory,
+)
+from patient_medication_app.database.sharding import (
+    ShardSet,
+    allocate_request_ids,
+    ensure_patient_placed,
+    get_shards,
+    requests_by_shard,
+    shard_for_request,
+)
+from patient_medication_app.metrics import register_metrics
 from patient_medication_app.schemas.medication_request import (
+    MedicationRequestAuditEntry,
+    MedicationRequestBatch,
+    MedicationRequestBatchResponse,
     MedicationRequestCreate,
+    MedicationRequestImportReport,
+    MedicationRequestLookup,
+    MedicationRequestLookupResponse,
     MedicationRequestResponse,
+    MedicationRequestTimeSeries,
     MedicationRequestUpdate,
 )
+from patient_medication_app.settings import settings
 
 router = APIRouter(tags=["medication_requests"])
 
+_response_list_adapter: TypeAdapter[list[MedicationRequestResponse]] = TypeAdapter(
+    list[MedicationRequestResponse]
+)
+
+# Coalesces identical concurrent list queries
+list_query_flight: SingleFlight[bytes] = SingleFlight()
+register_metrics("list_coalescing", list_query_flight.metrics)
+
+# Maximum page size of the list endpoint
+MAX_LIST_LIMIT = 1000
+
+
+def _live_model() -> type[MedicationRequest] | type[MedicationRequestListing]:
+    """Model to read live medication requests from: the listing when enabled."""
+    if settings.read_model_enabled:
+        return MedicationRequestListing
+    return MedicationRequest
+
+
+def _list_query(
+    db: Session,
+    model: (
+        type[MedicationRequest]
+        | type[MedicationRequestArchive]
+        | type[MedicationRequestListing]
+    ),
+    filters: MedicationRequestFilters,
+):
+    """
+    Build the filtered list query against the live, archive or listing table.
+
+    Rows are (request, medication_code_name, clinician_first_name,
+    clinician_last_name) whichever table is queried; only the listing needs no
+    joins to get the names.
+    """
+    conditions = medication_request_filters(model, filters)
+    if model is MedicationRequestListing:
+        return (
+            db.query(MedicationRequestListing)
+            .add_columns(
+                MedicationRequestListing.medication_code_name,
+                MedicationRequestListing.clinician_first_name,
+                MedicationRequestListing.clinician_last_name,
+            )
+            .filter(*conditions)
+        )
+
+    query = (
+        db.query(model)
+        .join(Medication, model.medication_reference == Medication.code)
+        .join(
+            Clinician,
+            model.clinician_reference == Clinician.registration_id,
+        )
+        .add_columns(
+            Medication.code_name.label("medication_code_name"),
+            Clinician.first_name.label("clinician_first_name"),
+            Clinician.last_name.label("clinician_last_name"),
+        )
+    )
+
+    return query.filter(*conditions)
+
+
+def _response_row(row) -> dict:
+    """Flatten a joined list query row into the response shape."""
+    req, medication_code_name, clinician_first_name, clinician_last_name = row
+    return {
+        **req.__dict__,
+        "medication_code_name": medication_code_name,
+        "clinician_first_name": clinician_first_name,
+        "clinician_last_name": clinician_last_name,
+    }
+
+
+def _list_models(
+    include_archived: bool,
+) -> list[
+    type[MedicationRequest]
+    | type[MedicationRequestArchive]
+    | type[MedicationRequestListing]
+]:
+    """Tables the list reads: the live table and, optionally, the archive."""
+    if include_archived:
+        return [_live_model(), MedicationRequestArchive]
+    return [_live_model()]
+
+
+def _sort_key(row: dict) -> tuple[date, int]:
+    return row["prescribed_date"], row["id"]
+
+
+def _list_rows(
+    db: Session,
+    filters: MedicationRequestFilters,
+    include_archived: bool,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    relations: tuple[str, ...] = (),
+) -> list[dict]:
+    """
+    Run the list query, newest prescription first, and return one page.
+
+    A single table pages in SQL. When the archive is searched too, each table
+    returns its first ``offset + limit`` rows and the page is cut from their
+    merge. The expanded ``relations`` are loaded for the page only.
+    """
+    models = _list_models(include_archived)
+    queries = [
+        _list_query(db, model, filters).order_by(
+            model.prescribed_date.desc(), model.id.desc()
+        )
+        for model in models
+    ]
+    if len(queries) == 1:
+        rows = [
+            _response_row(row) for row in queries[0].offset(offset).limit(limit).all()
+        ]
+    else:
+        end = None if limit is None else offset + limit
+        results = [
+            [_response_row(row) for row in query.limit(end).all()] for query in queries
+        ]
+        rows = list(heapq.merge(*results, key=_sort_key, reverse=True))[offset:end]
+    return expand_rows(db, rows, relations)
+
+
+def _dump_response_rows(rows: list[dict]) -> bytes:
+    # Relations that were not expanded are left out rather than null
+    return _response_list_adapter.dump_json(
+        _response_list_adapter.validate_python(rows), exclude_unset=True
+    )
+
+
+def _fetch_medication_requests(
+    session_factory: Callable[[], Session],
+    filters: MedicationRequestFilters,
+    include_archived: bool,
+    offset: int,
+    limit: Optional[int],
+    relations: tuple[str, ...],
+) -> bytes:
+    """
+    Run the list query and return the serialized JSON response body.
+
+    The query runs in a session of its own: the call is shared by coalesced
+    requests and outlives the request that started it when that one is
+    cancelled, so it must not use a request-scoped session.
+    """
+    with session_factory() as db:
+        return _dump_response_rows(
+            _list_rows(db, filters, include_archived, offset, limit, relations)
+        )
+
+
+def _shard_names(
+    shards: ShardSet, filters: MedicationRequestFilters
+) -> Optional[list[str]]:
+    """The shard a patient-scoped query runs on, or None for all shards."""
+    if filters.patient_reference is None:
+        return None
+    return [shards.shard_for(filters.patient_reference)]
+
+
+def _fetch_sharded_medication_requests(
+    shards: ShardSet,
+    filters: MedicationRequestFilters,
+    include_archived: bool,
+    offset: int,
+    limit: Optional[int],
+    relations: tuple[str, ...],
+) -> bytes:
+    """
+    Run the list query on the shards and return the serialized response body.
+
+    A patient-scoped query runs on that patient's shard only. Otherwise every
+    shard is queried in parallel for its first ``offset + limit`` rows, newest
+    prescription first, with their relations expanded from the same shard,
+    and the page is cut from the merged rows.
+    """
+    end = None if limit is None else offset + limit
+    rows = shards.gather_sorted(
+        partial(
+            _list_rows,
+            filters=filters,
+            include_archived=include_archived,
+            limit=end,
+            relations=relations,
+        ),
+        key=_sort_key,
+        reverse=True,
+        names=_shard_names(shards, filters),
+    )
+    return _dump_response_rows(rows[offset:end])
+
+
+def _count_rows(
+    db: Session,
+    filters: MedicationRequestFilters,
+    include_archived: bool,
+    estimate_above: Optional[int],
+) -> list[tuple[int, bool]]:
+    """Count the matching requests of each table the list reads."""
+    return [
+        count_medication_requests(db, model, filters, estimate_above)
+        for model in _list_models(include_archived)
+    ]
+
+
+def _dump_total_count(counts: list[tuple[int, bool]]) -> bytes:
+    return json.dumps(
+        {
+            "total": sum(count for count, _ in counts),
+            "estimated": any(estimated for _, estimated in counts),
+        }
+    ).encode()
+
+
+def _fetch_total_count(
+    session_factory: Callable[[], Session],
+    filters: MedicationRequestFilters,
+    include_archived: bool,
+    estimate_above: Optional[int],
+) -> bytes:
+    # In a session of its own, like _fetch_medication_requests
+    with session_factory() as db:
+        return _dump_total_count(
+            _count_rows(db, filters, include_archived, estimate_above)
+        )
+
+
+def _fetch_sharded_total_count(
+    shards: ShardSet,
+    filters: MedicationRequestFilters,
+    include_archived: bool,
+    estimate_above: Optional[int],
+) -> bytes:
+    counts = shards.scatter(
+        partial(
+            _count_rows,
+            filters=filters,
+            include_archived=include_archived,
+            estimate_above=estimate_above,
+        ),
+        _shard_names(shards, filters),
+    )
+    return _dump_total_count([count for shard in counts for count in shard])
+
+
+def _expansions(
+    expand: Optional[str] = Query(
+        None,
+        description="Comma-separated relations to nest: patient, clinician, medication",
+    ),
+) -> tuple[str, ...]:
+    """Parse the expand query parameter into relation names."""
+    try:
+        return parse_expand(expand)
+    except UnknownExpansionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _require_unsharded(shards: Optional[ShardSet] = Depends(get_shards)) -> None:
+    """Refuse endpoints that are not routed to shards when sharding is on."""
+    if shards is not None:
+        raise HTTPException(
+            status_code=501,
+            detail="This endpoint is not available when sharding is enabled",
+        )
+
+
+def _request_session(
+    medication_request_id: int,
+    db: Session = Depends(get_session),
+    shards: Optional[ShardSet] = Depends(get_shards),
+) -> Generator[Session, None, None]:
+    """
+    Session on the database holding the request in the path.
+
+    That is the shard of the request's patient when sharding is on, found
+    through the directory on the primary database.
+    """
+    if shards is None:
+        yield db
+        return
+    name = shard_for_request(db, shards, medication_request_id)
+    if name is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Medication request with id {medication_request_id} not found",
+        )
+    with shards.session(name) as shard_db:
+        yield shard_db
+
 
 @router.get("/", response_model=list[MedicationRequestResponse])
 async def get_medication_requests(
-    status: Optional[str] = Query(None, description="Filter by request status"),
+    status: Optional[list[str]] = Query(
+        None, description="Filter by request status, repeat for any of several"
+    ),
     prescribed_from: Optional[date] = Query(
         None, description="Filter by prescribed date from"
     ),
     prescribed_to: Optional[date] = Query(
         None, description="Filter by prescribed date to"
     ),
+    include_archived: bool = Query(
+        False, description="Also search archived (closed) medication requests"
+    ),
+    patient_reference: Optional[int] = Query(None, description="Filter by patient"),
+    clinician_reference: Optional[str] = Query(
+        None, description="Filter by clinician registration ID"
+    ),
+    medication_reference: Optional[str] = Query(
+        None, description="Filter by medication code"
+    ),
+    start_from: Optional[date] = Query(None, description="Filter by start date from"),
+    start_to: Optional[date] = Query(None, description="Filter by start date to"),
+    end_from: Optional[date] = Query(None, description="Filter by end date from"),
+    end_to: Optional[date] = Query(None, description="Filter by end date to"),
+    offset: int = Query(0, ge=0, description="Number of requests to skip"),
+    limit: Optional[int] = Query(
+        None, ge=1, le=MAX_LIST_LIMIT, description="Maximum number of requests"
+    ),
+    count: Optional[Literal["exact", "estimate"]] = Query(
+        None,
+        description=(
+            "Also return the number of matching requests in X-Total-Count; "
+            "estimate allows the planner's estimate for large results"
+        ),
+    ),
+    relations: tuple[str, ...] = Depends(_expansions),
     db: Session = Depends(get_session),
+    session_factory: Callable[[], Session] = Depends(get_session_factory),
+    shards: Optional[ShardSet] = Depends(get_shards),
 ):
     """
     Retrieve a list of medication requests with optional filters.
 
+    Requests are ordered newest prescription first and can be paged with
+    offset and limit. Serialized responses are cached per filter set until
+    the next write. Identical concurrent cache misses are coalesced: only the
+    first runs the query and the others share its serialized response. When
+    sharding is on, the query runs on the patient's shard, or on all shards
+    for unscoped queries.
+
+    With ``count``, the number of matching requests is returned in the
+    X-Total-Count header. An exact count scans every match; an estimate
+    takes the planner's row estimate when it exceeds the configured
+    threshold (PostgreSQL only), flagged by X-Total-Count-Estimated.
+
+    With ``expand``, each request nests its patient, clinician or medication.
+    They are loaded with one IN query per relation for the whole page.
+
     Args:
-        status: Optional filter by request status
+        status: Optional filter by request status, any of several
         prescribed_from: Optional filter by prescribed date (from)
         prescribed_to: Optional filter by prescribed date (to)
+        include_archived: Whether to include requests from the archive table
+        patient_reference: Optional filter by patient
+        clinician_reference: Optional filter by clinician
+        medication_reference: Optional filter by medication
+        start_from: Optional filter by start date (from)
+        start_to: Optional filter by start date (to)
+        end_from: Optional filter by end date (from)
+        end_to: Optional filter by end date (to)
+        offset: Number of requests to skip
+        limit: Optional maximum number of requests to return
+        count: Optional "exact" or "estimate" total count
+        relations: Relations to nest, from the expand parameter
         db: Database session dependency
+        session_factory: Opens the session of the coalesced query
+        shards: Shard set dependency, None when sharding is off
 
     Returns:
         List of medication requests matching the filter criteria
     """
-    query = (
-        db.query(MedicationRequest)
-        .join(Medication, MedicationRequest.medication_reference == Medication.code)
-        .join(
-            Clinician,
-            MedicationRequest.clinician_reference == Clinician.registration_id,
+    filters = MedicationRequestFilters(
+        statuses=tuple(sorted(set(s for s in status or () if s))),
+        prescribed_from=prescribed_from,
+        prescribed_to=prescribed_to,
+        patient_reference=patient_reference,
+        clinician_reference=clinician_reference,
+        medication_reference=medication_reference,
+        start_from=start_from,
+        start_to=start_to,
+        end_from=end_from,
+        end_to=end_to,
+    )
+    headers = {}
+    if count is not None:
+        estimate_above = (
+            settings.count_estimate_threshold if count == "estimate" else None
         )
-        .add_columns(
-            Medication.code_name.label("medication_code_name"),
-            Clinician.first_name.label("clinician_first_name"),
-            Clinician.last_name.label("clinician_last_name"),
+        if shards is not None:
+            fetch = partial(_fetch_sharded_total_count, shards)
+        else:
+            fetch = partial(_fetch_total_count, session_factory)
+        total = json.loads(
+            await _cached(
+                result_cache.key(
+                    db, "count", (filters, include_archived, estimate_above)
+                ),
+                partial(fetch, filters, include_archived, estimate_above),
+            )
         )
+        headers["X-Total-Count"] = str(total["total"])
+        headers["X-Total-Count-Estimated"] = str(total["estimated"]).lower()
+
+    if shards is not None:
+        fetch = partial(_fetch_sharded_medication_requests, shards)
+    else:
+        fetch = partial(_fetch_medication_requests, session_factory)
+    body = await _cached(
+        result_cache.key(
+            db, "list", (filters, include_archived, offset, limit, relations)
+        ),
+        partial(fetch, filters, include_archived, offset, limit, relations),
     )
+    return Response(content=body, media_type="application/json", headers=headers)
 
-    if status:
-        query = query.filter(MedicationRequest.status == status)
 
-    if prescribed_from:
-        query = query.filter(MedicationRequest.prescribed_date >= prescribed_from)
+async def _cached(cache_key: str, fetch: Callable[[], bytes]) -> bytes:
+    """Serve a serialized response from the cache, or fetch it coalesced."""
+    body = result_cache.get(cache_key)
+    if body is None:
+        body = await list_query_flight.do(cache_key, fetch)
+        result_cache.set(cache_key, body)
+    return body
 
-    if prescribed_to:
-        query = query.filter(MedicationRequest.prescribed_date <= prescribed_to)
 
-    results = query.all()
-    response = []
-    for req, medication_code_name, clinician_first_name, clinician_last_name in results:
-        response.append(
-            {
-                **req.__dict__,
-                "medication_code_name": medication_code_name,
-                "clinician_first_name": clinician_first_name,
-                "clinician_last_name": clinician_last_name,
-            }
-        )
-    return response
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {media_type: {} for media_type in MEDIA_TYPES.values()}}
+    },
+    dependencies=[Depends(_require_unsharded)],
+)
+async def export_medication_requests(
+    format: ExportFormat = Query("parquet", description="Export file format"),
+    status: Optional[list[str]] = Query(
+        None, description="Filter by request status, repeat for any of several"
+    ),
+    prescribed_from: Optional[date] = Query(
+        None, description="Filter by prescribed date from"
+    ),
+    prescribed_to: Optional[date] = Query(
+        None, description="Filter by prescribed date to"
+    ),
+    session_factory: Callable[[], Session] = Depends(get_session_factory),
+):
+    """
+    Export medication requests as Parquet or an Arrow IPC stream.
 
+    Takes the same filters as the list endpoint. Rows are streamed in record
+    batches, so the export is never held in memory in full. The stream reads
+    them in a session of its own, open for as long as the download runs.
 
-@router.post("/", response_model=MedicationRequestResponse)
-async def create_medication_request(
-    request: MedicationRequestCreate, db: Session = Depends(get_session)
+    Args:
+        format: Either "parquet" or "arrow"
+        status: Optional filter by request status, any of several when repeated
+        prescribed_from: Optional filter by prescribed date (from)
+        prescribed_to: Optional filter by prescribed date (to)
+        session_factory: Opens the session of the stream
+
+    Returns:
+        StreamingResponse: The exported file
+
+    Raises:
+        HTTPException: If pyarrow is not installed
+    """
+    try:
+        export_schema()
+    except ExportUnavailableError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    chunks = export_stream(
+        session_factory,
+        format,
+        sorted(set(s for s in status or () if s)),
+        prescribed_from,
+        prescribed_to,
+    )
+    extension = "parquet" if format == "parquet" else "arrows"
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="medication_requests.{extension}"'
+        },
+    )
+
+
+@router.get(
+    "/timeseries",
+    response_model=MedicationRequestTimeSeries,
+    dependencies=[Depends(_require_unsharded)],
+)
+async def get_medication_request_timeseries(
+    start: date = Query(..., description="First day to count"),
+    end: date = Query(..., description="Last day to count"),
+    group_by: TimeSeriesGroupBy = Query(
+        "medication_reference", description="Field to group the counts by"
+    ),
+    status: Optional[list[str]] = Query(
+        None,
+        description="Filter by request status, repeat for any of several; "
+        "all but cancelled by default",
+    ),
+    include_archived: bool = Query(
+        False, description="Also count archived (closed) medication requests"
+    ),
+    db: Session = Depends(get_session),
 ):
     """
-    Create a new medication request.
+    Daily counts of active medication requests per group.
+
+    A request counts as active on each day between its start date and end date
+    inclusive, or up to the end of the range when it has no end date.
+    Cancelled requests are not counted unless asked for in ``status``.
 
     Args:
-        request: The medication request data
+        start: First day to count
+        end: Last day to count
+        group_by: Either "medication_reference" or "status"
+        status: Optional filter by request status, any of several when repeated
+        include_archived: Whether to include requests from the archive table
         db: Database session dependency
 
     Returns:
-        MedicationRequestResponse: The created medication request with related data
+        MedicationRequestTimeSeries: Group labels and one row of daily counts per group
 
     Raises:
-        HTTPException: If referenced patient, clinician or medication not found
+        HTTPException: If the range is invalid or too long, or NumPy is not installed
     """
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if (end - start).days >= MAX_TIMESERIES_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Time series are limited to {MAX_TIMESERIES_DAYS} days",
+        )
+
+    try:
+        groups, counts = medication_request_timeseries(
+            db,
+            start,
+            end,
+            group_by,
+            sorted(set(s for s in status or () if s)) or ACTIVE_STATUSES,
+            include_archived,
+        )
+    except TimeSeriesUnavailableError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    return {
+        "start": start,
+        "end": end,
+        "group_by": group_by,
+        "groups": groups,
+        "counts": counts.tolist(),
+    }
+
+
+@router.post(
+    "/lookup",
+    response_model=MedicationRequestLookupResponse,
+    response_model_exclude_unset=True,
+)
+async def lookup_medication_requests(
+    lookup: MedicationRequestLookup,
+    relations: tuple[str, ...] = Depends(_expansions),
+    db: Session = Depends(get_session),
+    shards: Optional[ShardSet] = Depends(get_shards),
+):
+    """
+    Fetch many medication requests by id in one query.
+
+    When sharding is on, the query runs in parallel on the shards holding any
+    of the ids.
+
+    Args:
+        lookup: The ids to fetch, and whether to search the archive too
+        relations: Relations to nest, from the expand parameter
+        db: Database session dependency
+        shards: Shard set dependency, None when sharding is off
+
+    Returns:
+        MedicationRequestLookupResponse: The requests found, in the order their
+        ids were given, and the ids that were not found
+    """
+    ids = list(dict.fromkeys(lookup.ids))
+
+    fetch = partial(
+        _lookup_rows,
+        ids=ids,
+        include_archived=lookup.include_archived,
+        relations=relations,
+    )
+    if shards is not None:
+        found = {}
+        for shard_found in shards.scatter(
+            fetch, list(requests_by_shard(db, shards, ids))
+        ):
+            found.update(shard_found)
+    else:
+        found = fetch(db)
+    return {
+        "medication_requests": [found[i] for i in ids if i in found],
+        "not_found": [i for i in ids if i not in found],
+    }
+
+
+def _lookup_rows(
+    db: Session, ids: list[int], include_archived: bool, relations: tuple[str, ...]
+) -> dict[int, dict]:
+    """Load the requests with the given ids, by id, with ``relations`` expanded."""
+    live_model = _live_model()
+    found = {
+        row[0].id: _response_row(row)
+        for row in _list_query(db, live_model, MedicationRequestFilters())
+        .filter(live_model.id.in_(ids))
+        .all()
+    }
+    missing = [i for i in ids if i not in found]
+    if include_archived and missing:
+        found.update(
+            (row[0].id, _response_row(row))
+            for row in _list_query(
+                db, MedicationRequestArchive, MedicationRequestFilters()
+            )
+            .filter(MedicationRequestArchive.id.in_(missing))
+            .all()
+        )
+
+    expand_rows(db, list(found.values()), relations)
+    return found
+
+
+def _related_name_columns(
+    model: type[MedicationRequest],
+) -> list[Label]:
+    """Correlated subqueries selecting the medication and clinician names."""
+    return [
+        select(Medication.code_name)
+        .where(Medication.code == model.medication_reference)
+        .scalar_subquery()
+        .label("medication_code_name"),
+        select(Clinician.first_name)
+        .where(Clinician.registration_id == model.clinician_reference)
+        .scalar_subquery()
+        .label("clinician_first_name"),
+        select(Clinician.last_name)
+        .where(Clinician.registration_id == model.clinician_reference)
+        .scalar_subquery()
+        .label("clinician_last_name"),
+    ]
+
+
+# Patient ids, clinician names by registration ID and medication names by code
+References = tuple[set[int], dict[str, tuple[str, str]], dict[str, str]]
+
+
+def _load_references(
+    db: Session, requests: list[MedicationRequestCreate]
+) -> References:
+    """Load what ``requests`` reference, with one query per table."""
+    patient_ids = {request.patient_reference for request in requests}
+    registration_ids = {request.clinician_reference for request in requests}
+    codes = {request.medication_reference for request in requests}
+    patients = set(
+        db.execute(select(Patient.id).where(Patient.id.in_(patient_ids))).scalars()
+    )
+    clinicians = {
+        registration_id: (first_name, last_name)
+        for registration_id, first_name, last_name in db.execute(
+            select(
+                Clinician.registration_id, Clinician.first_name, Clinician.last_name
+            ).where(Clinician.registration_id.in_(registration_ids))
+        )
+    }
+    medications = dict(
+        db.execute(
+            select(Medication.code, Medication.code_name).where(
+                Medication.code.in_(codes)
+            )
+        ).all()
+    )
+    return patients, clinicians, medications
 
-    # These validations might be overkill eg in a real application I'd expect the clinician
-    # to have authorisation to prescribe medication, so they'd already be known to the system.
 
-    # Validate patient exists
-    patient = db.query(Patient).filter(Patient.id == request.patient_reference).first()
-    if not patient:
+def _check_references(request: MedicationRequestCreate, references: References) -> None:
+    """Raise a 404 for the first reference of ``request`` that does not exist."""
+    patients, clinicians, medications = references
+    if request.patient_reference not in patients:
         raise HTTPException(
             status_code=404,
             detail=f"Patient with id {request.patient_reference} not found",
         )
-
-    # Validate clinician exists
-    clinician = (
-        db.query(Clinician)
-        .filter(Clinician.registration_id == request.clinician_reference)
-        .first()
-    )
-    if not clinician:
+    if request.clinician_reference not in clinicians:
         raise HTTPException(
             status_code=404,
             detail=f"Clinician with registration ID {request.clinician_reference} not found",
         )
-
-    # Validate medication exists
-    medication = (
-        db.query(Medication)
-        .filter(Medication.code == request.medication_reference)
-        .first()
-    )
-    if not medication:
+    if request.medication_reference not in medications:
         raise HTTPException(
             status_code=404,
             detail=f"Medication with code {request.medication_reference} not found",
         )
 
-    # Create medication request
-    db_request = MedicationRequest(**request.dict())
-    db.add(db_request)
+
+def _check_overlaps(db: Session, request: MedicationRequestCreate) -> list[int]:
+    """
+    Find the active requests a new request would duplicate.
+
+    Returns:
+        Ids of the overlapping requests, empty when the check is off
+
+    Raises:
+        HTTPException: If there are any and the check is in reject mode
+    """
+    if settings.overlap_check_mode == "off" or request.status != "active":
+        return []
+    if settings.overlap_check_mode == "reject":
+        # Checks of concurrent creates for the patient run one after the other,
+        # so they cannot both pass and store the duplicate
+        lock_patient(db, request.patient_reference)
+    overlapping = find_overlapping_requests(
+        db,
+        request.patient_reference,
+        request.medication_reference,
+        request.start_date,
+        request.end_date,
+    )
+    if overlapping and settings.overlap_check_mode == "reject":
+        raise HTTPException(
+            status_code=409,
+            detail=(
+                f"Patient {request.patient_reference} already has active requests "
+                f"for medication {request.medication_reference} overlapping these "
+                f"dates: {', '.join(str(i) for i in overlapping)}"
+            ),
+        )
+    return overlapping
+
+
+def _insert_values(
+    request: MedicationRequestCreate, medication_request_id: Optional[int]
+) -> dict:
+    """Values of the INSERT, with the id when it was allocated up front."""
+    values = request.model_dump()
+    if medication_request_id is not None:
+        values["id"] = medication_request_id
+    return values
+
+
+@router.post(
+    "/", response_model=MedicationRequestResponse, response_model_exclude_unset=True
+)
+async def create_medication_request(
+    request: MedicationRequestCreate,
+    response: Response,
+    x_actor: str = Header(
+        "anonymous", description="Who makes the change, for the audit log"
+    ),
+    db: Session = Depends(get_session),
+    shards: Optional[ShardSet] = Depends(get_shards),
+):
+    """
+    Create a new medication request.
+
+    The references are not looked up up front: the insert relies on the
+    foreign keys and returns the related names in the same statement. Only
+    when a foreign key is violated are the references checked, to report
+    which one is missing.
+
+    New active requests are checked for duplicate therapy: existing active
+    requests for the same patient and medication with an overlapping date
+    range. Depending on the configured mode these are reported in the
+    X-Duplicate-Therapy header or the request is rejected.
+
+    When sharding is on, the request is created on its patient's shard, with
+    a copy of the patient from the primary database if they are not placed
+    there yet, and its id is allocated in the directory on the primary.
+
+    Args:
+        request: The medication request data
+        response: Used to report overlapping requests in a header
+        x_actor: Who creates the request, recorded in the audit log
+        db: Database session dependency
+        shards: Shard set dependency, None when sharding is off
+
+    Returns:
+        MedicationRequestResponse: The created medication request with related data
+
+    Raises:
+        HTTPException: If referenced patient, clinician or medication not found,
+            or the request overlaps an active one in reject mode
+    """
+    if shards is not None:
+        with shards.session_for_patient(request.patient_reference) as shard_db:
+            ensure_patient_placed(db, shard_db, request.patient_reference)
+            [request_id] = allocate_request_ids(db, [request.patient_reference])
+            created = _create_medication_request(
+                shard_db, request, response, x_actor, request_id
+            )
+    else:
+        created = _create_medication_request(db, request, response, x_actor)
+    # The cache generation lives on the primary database, also when sharded
+    result_cache.bump(db)
+    return created
+
+
+def _create_medication_request(
+    db: Session,
+    request: MedicationRequestCreate,
+    response: Response,
+    actor: str,
+    medication_request_id: Optional[int] = None,
+) -> dict:
+    overlapping = _check_overlaps(db, request)
+    if overlapping:
+        response.headers["X-Duplicate-Therapy"] = ",".join(str(i) for i in overlapping)
+
+    statement = (
+        insert(MedicationRequest)
+        .values(**_insert_values(request, medication_request_id))
+        .returning(
+            *MedicationRequest.__table__.columns,
+            *_related_name_columns(MedicationRequest),
+        )
+    )
+    try:
+        created = db.execute(statement).mappings().one()
+        record_created(db, created)
+        record_change(db, created, "create", actor)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        _check_references(request, _load_references(db, [request]))
+        raise
+
+    return dict(created)
+
+
+@router.post(
+    "/import",
+    response_model=MedicationRequestImportReport,
+    dependencies=[Depends(_require_unsharded)],
+)
+def import_medication_requests_file(
+    file: UploadFile = File(
+        ..., description="CSV or NDJSON file of medication requests"
+    ),
+    format: Optional[ImportFormat] = Query(
+        None, description="File format, inferred from the file name when omitted"
+    ),
+    x_actor: str = Header(
+        "anonymous", description="Who makes the change, for the audit log"
+    ),
+    db: Session = Depends(get_session),
+):
+    """
+    Bulk import medication requests from an uploaded CSV or NDJSON file.
+
+    Rows are validated and loaded in chunks; invalid rows and rows referencing
+    an unknown patient, clinician or medication are skipped and reported. The
+    import runs in the threadpool, so a large file does not hold up other
+    requests.
+
+    Args:
+        file: The uploaded file, with a header row for CSV
+        format: Either "csv" or "ndjson"
+        x_actor: Who imports the requests, recorded in the audit log
+        db: Database session dependency
+
+    Returns:
+        MedicationRequestImportReport: Counts of imported and rejected rows
+
+    Raises:
+        HTTPException: If the file format cannot be determined, or the file is
+            not UTF-8 text or not valid CSV (the chunks read before the error
+            stay imported)
+    """
+    if format is None:
+        filename = (file.filename or "").lower()
+        if filename.endswith(".csv"):
+            format = "csv"
+        elif filename.endswith((".ndjson", ".jsonl")):
+            format = "ndjson"
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail="Could not determine file format, pass format=csv or format=ndjson",
+            )
+
+    try:
+        return import_medication_requests(
+            db, iter_rows(file.file, format), actor=x_actor
+        )
+    except ImportFileError as e:
+        raise HTTPException(
+            status_code=422,
+            detail={"detail": str(e), "report": e.report.model_dump()},
+        )
+
+
+@router.post(
+    "/batch",
+    response_model=MedicationRequestBatchResponse,
+    response_model_exclude_unset=True,
+)
+async def apply_medication_request_batch(
+    batch: MedicationRequestBatch,
+    x_actor: str = Header(
+        "anonymous", description="Who makes the changes, for the audit log"
+    ),
+    db: Session = Depends(get_session),
+    shards: Optional[ShardSet] = Depends(get_shards),
+):
+    """
+    Create and update several medication requests in one transaction.
+
+    Operations run in order and either all apply or none do: the first
+    operation that fails rolls the batch back, and its error is returned with
+    its index in the batch. The patients, clinicians and medications the
+    creates reference are loaded up front with one query per table, and the
+    batch is committed once.
+
+    When sharding is on, the transaction runs on one shard, so every
+    operation of a batch must concern patients of that shard.
+
+    Args:
+        batch: The create and patch operations
+        x_actor: Who makes the changes, recorded in the audit log
+        db: Database session dependency
+        shards: Shard set dependency, None when sharding is off
+
+    Returns:
+        MedicationRequestBatchResponse: The created or updated request of each
+        operation, in order
+
+    Raises:
+        HTTPException: With the status of the failing operation, and as detail
+            its index and error
+    """
+    if shards is not None:
+        creates = [
+            operation.data for operation in batch.operations if operation.op == "create"
+        ]
+        with shards.session(_batch_shard(db, shards, batch)) as shard_db:
+            for patient_reference in {request.patient_reference for request in creates}:
+                ensure_patient_placed(db, shard_db, patient_reference)
+            request_ids = allocate_request_ids(
+                db, [request.patient_reference for request in creates]
+            )
+            results = _apply_batch(shard_db, batch, x_actor, iter(request_ids))
+    else:
+        results = _apply_batch(db, batch, x_actor)
+    # The cache generation lives on the primary database, also when sharded
+    result_cache.bump(db)
+    return {"results": results}
+
+
+def _batch_shard(db: Session, shards: ShardSet, batch: MedicationRequestBatch) -> str:
+    """
+    Name of the shard all operations of ``batch`` run on.
+
+    Raises:
+        HTTPException: If a patched request does not exist, or the operations
+            concern patients of different shards
+    """
+    names: list[str] = []
+    for index, operation in enumerate(batch.operations):
+        if operation.op == "create":
+            name = shards.shard_for(operation.data.patient_reference)
+        else:
+            found = shard_for_request(db, shards, operation.id)
+            if found is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail={
+                        "operation": index,
+                        "detail": f"Medication request with id {operation.id} not found",
+                    },
+                )
+            name = found
+        if names and name != names[0]:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "operation": index,
+                    "detail": "Operations of a batch must concern patients of "
+                    "one shard when sharding is enabled",
+                },
+            )
+        names.append(name)
+    return names[0]
+
+
+def _apply_batch(
+    db: Session,
+    batch: MedicationRequestBatch,
+    actor: str,
+    request_ids: Optional[Iterator[int]] = None,
+) -> list[dict]:
+    """
+    Apply the operations of ``batch`` in one transaction and commit it.
+
+    ``request_ids`` are the ids allocated up front for the creates, in order,
+    when sharding is on.
+    """
+    references = _load_references(
+        db,
+        [operation.data for operation in batch.operations if operation.op == "create"],
+    )
+    results = []
+    for index, operation in enumerate(batch.operations):
+        try:
+            if operation.op == "create":
+                results.append(
+                    _create_in_batch(
+                        db,
+                        operation.data,
+                        references,
+                        actor,
+                        None if request_ids is None else next(request_ids),
+                    )
+                )
+            else:
+                updated = _apply_update(
+                    db,
+                    operation.id,
+                    operation.data.model_dump(exclude_unset=True),
+                    operation.if_match,
+                )
+                record_updated(db, updated)
+                record_change(db, updated, "update", actor)
+                results.append(
+                    {
+                        "op": "patch",
+                        "medication_request": dict(updated),
+                        "duplicate_therapy": [],
+                    }
+                )
+        except HTTPException as e:
+            db.rollback()
+            raise HTTPException(
+                status_code=e.status_code,
+                detail={"operation": index, "detail": e.detail},
+            )
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(
+                status_code=409,
+                detail={
+                    "operation": index,
+                    "detail": "Conflicts with a concurrent change",
+                },
+            )
+
     db.commit()
-    db.refresh(db_request)
+    return results
+
 
-    # Return response with additional fields
+def _create_in_batch(
+    db: Session,
+    request: MedicationRequestCreate,
+    references: References,
+    actor: str,
+    medication_request_id: Optional[int] = None,
+) -> dict:
+    """Create a request of a batch, taking the related names from ``references``."""
+    _check_references(request, references)
+    overlapping = _check_overlaps(db, request)
+
+    created = dict(
+        db.execute(
+            insert(MedicationRequest)
+            .values(**_insert_values(request, medication_request_id))
+            .returning(*MedicationRequest.__table__.columns)
+        )
+        .mappings()
+        .one()
+    )
+    _, clinicians, medications = references
+    first_name, last_name = clinicians[request.clinician_reference]
+    created.update(
+        medication_code_name=medications[request.medication_reference],
+        clinician_first_name=first_name,
+        clinician_last_name=last_name,
+    )
+    record_created(db, created)
+    record_change(db, created, "create", actor)
     return {
-        **db_request.__dict__,
-        "medication_code_name": medication.code_name,
-        "clinician_first_name": clinician.first_name,
-        "clinician_last_name": clinician.last_name,
+        "op": "create",
+        "medication_request": created,
+        "duplicate_therapy": overlapping,
     }
 
 
-@router.patch("/{medication_request_id}", response_model=MedicationRequestResponse)
+def _parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """
+    Parse an If-Match header into the expected version.
+
+    Returns None for a missing header or ``*``. A tag that is not a version
+    number can never match, so it is returned as -1.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    tag = if_match.split(",")[0].strip().removeprefix("W/").strip('"')
+    return int(tag) if tag.isdigit() else -1
+
+
+@router.patch(
+    "/{medication_request_id}",
+    response_model=MedicationRequestResponse,
+    response_model_exclude_unset=True,
+)
 async def update_medication_request(
     medication_request_id: int,
     request: MedicationRequestUpdate,
-    db: Session = Depends(get_session),
+    response: Response,
+    if_match: Optional[str] = Header(
+        None, description="Version (ETag) the update is based on"
+    ),
+    x_actor: str = Header(
+        "anonymous", description="Who makes the change, for the audit log"
+    ),
+    db: Session = Depends(_request_session),
+    primary_db: Session = Depends(get_session),
 ):
     """
     Update an existing medication request.
 
-    Only end_date, frequency, and status can be updated.
+    Only end_date, frequency, and status can be updated. The update and the
+    lookup of the related names happen in a single UPDATE ... RETURNING. When
+    an If-Match header is given, the update only applies if the request is
+    still at that version.
 
     Args:
         medication_request_id: The ID of the medication request to update
         request: The fields to update
-        db: Database session dependency
+        response: Used to return the new version in the ETag header
+        if_match: Optional expected version of the medication request
+        x_actor: Who updates the request, recorded in the audit log
+        db: Session on the database holding the request, its shard when sharded
+        primary_db: Primary database session dependency, for the cache generation
 
     Returns:
         MedicationRequestResponse: The updated medication request
 
     Raises:
-        HTTPException: If medication request not found
+        HTTPException: If medication request not found, or its version does not
+            match If-Match
     """
-    # Get existing request with related data
-    db_request = (
-        db.query(MedicationRequest)
-        .join(Medication, MedicationRequest.medication_reference == Medication.code)
-        .join(
-            Clinician,
-            MedicationRequest.clinician_reference == Clinician.registration_id,
-        )
-        .add_columns(
-            Medication.code_name.label("medication_code_name"),
-            Clinician.first_name.label("clinician_first_name"),
-            Clinician.last_name.label("clinician_last_name"),
+    updated = _apply_update(
+        db,
+        medication_request_id,
+        request.model_dump(exclude_unset=True),
+        _parse_if_match(if_match),
+    )
+    record_updated(db, updated)
+    record_change(db, updated, "update", x_actor)
+    db.commit()
+    result_cache.bump(primary_db)
+
+    response.headers["ETag"] = f'"{updated["version"]}"'
+    return dict(updated)
+
+
+def _apply_update(
+    db: Session,
+    medication_request_id: int,
+    update_data: dict,
+    expected_version: Optional[int],
+):
+    """
+    Update the given fields of a request and bump its version.
+
+    Returns:
+        The updated request with its related names
+
+    Raises:
+        HTTPException: If the request does not exist, or is not at
+            ``expected_version``; the transaction is rolled back
+    """
+    # Update only the provided fields, returning the related names from
+    # correlated subqueries so the whole update is a single statement
+    statement = (
+        update(MedicationRequest)
+        .where(MedicationRequest.id == medication_request_id)
+        .values(**update_data, version=MedicationRequest.version + 1)
+        .returning(
+            *MedicationRequest.__table__.columns,
+            *_related_name_columns(MedicationRequest),
         )
-        .filter(MedicationRequest.id == medication_request_id)
-        .first()
+        .execution_options(synchronize_session=False)
     )
+    if expected_version is not None:
+        statement = statement.where(MedicationRequest.version == expected_version)
+
+    updated = db.execute(statement).mappings().first()
 
-    if not db_request:
+    if updated is None:
+        db.rollback()
+        exists = db.scalar(
+            select(MedicationRequest.id).where(
+                MedicationRequest.id == medication_request_id
+            )
+        )
+        if exists is not None and expected_version is not None:
+            raise HTTPException(
+                status_code=412,
+                detail=f"Medication request with id {medication_request_id} has been modified",
+            )
         raise HTTPException(
             status_code=404,
             detail=f"Medication request with id {medication_request_id} not found",
         )
+    return updated
 
-    # Update only the provided fields
-    update_data = request.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_request[0], field, value)
 
-    db.commit()
-    db.refresh(db_request[0])
+@router.get(
+    "/{medication_request_id}",
+    response_model=MedicationRequestResponse,
+    response_model_exclude_unset=True,
+)
+async def get_medication_request(
+    medication_request_id: int,
+    response: Response,
+    include_archived: bool = Query(
+        False, description="Also search archived (closed) medication requests"
+    ),
+    relations: tuple[str, ...] = Depends(_expansions),
+    db: Session = Depends(_request_session),
+):
+    """
+    Retrieve one medication request.
 
-    # Return updated request with additional fields
-    return {
-        **db_request[0].__dict__,
-        "medication_code_name": db_request.medication_code_name,
-        "clinician_first_name": db_request.clinician_first_name,
-        "clinician_last_name": db_request.clinician_last_name,
-    }
+    Args:
+        medication_request_id: The ID of the medication request
+        response: Used to return the version in the ETag header
+        include_archived: Whether to search the archive table too
+        relations: Relations to nest, from the expand parameter
+        db: Session on the database holding the request, its shard when sharded
+
+    Returns:
+        MedicationRequestResponse: The medication request
+
+    Raises:
+        HTTPException: If the medication request is not found
+    """
+    for model in _list_models(include_archived):
+        row = (
+            _list_query(db, model, MedicationRequestFilters())
+            .filter(model.id == medication_request_id)
+            .first()
+        )
+        if row is not None:
+            found = _response_row(row)
+            response.headers["ETag"] = f'"{found["version"]}"'
+            return expand_rows(db, [found], relations)[0]
+
+    raise HTTPException(
+        status_code=404,
+        detail=f"Medication request with id {medication_request_id} not found",
+    )
+
+
+@router.get(
+    "/{medication_request_id}/audit",
+    response_model=list[MedicationRequestAuditEntry],
+)
+async def get_medication_request_audit(
+    medication_request_id: int, db: Session = Depends(_request_session)
+):
+    """
+    Retrieve the audit history of a medication request.
+
+    Changes reach the audit log from the outbox in the background, so the
+    latest changes may take a few seconds to appear.
+
+    Args:
+        medication_request_id: The ID of the medication request
+        db: Session on the database holding the request, its shard when sharded
+
+    Returns:
+        The audit log entries of the request, oldest first
+    """
+    return audit_history(db, medication_request_id)
@@ -0,0 +1,39 @@
+"""Medications API Router
+This module defines the API routes for looking up medications in the Patient Medication service.
+"""
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from patient_medication_app.core.suggest import medication_index
+from patient_medication_app.database.connections import get_session
+from patient_medication_app.schemas.medication import MedicationSuggestion
+
+router = APIRouter(tags=["medications"])
+
+
+@router.get("/suggest", response_model=list[MedicationSuggestion])
+async def suggest_medications(
+    q: str = Query(..., min_length=1, max_length=100, description="Text typed so far"),
+    limit: int = Query(10, ge=1, le=50, description="Maximum number of suggestions"),
+    db: Session = Depends(get_session),
+):
+    """
+    Suggest medications by code or name for type-ahead search.
+
+    Served from the in-memory medication index; the database is only read,
+    in the threadpool, if the index has not been loaded yet or is due for its
+    periodic reload.
+
+    Args:
+        q: Text typed so far, matched against codes and names
+        limit: Maximum number of suggestions
+        db: Database session dependency
+
+    Returns:
+        Ranked medication suggestions, tolerant of typos
+    """
+    if medication_index.stale():
+        await run_in_threadpool(medication_index.ensure_loaded, db)
+    return [suggestion._asdict() for suggestion in medication_index.suggest(q, limit)]
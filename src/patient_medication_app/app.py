@@ -1,19 +1,120 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
 
 from patient_medication_app.api import api_router
+from patient_medication_app.core.audit import AuditDrainer
+from patient_medication_app.core.lifecycle import LifecycleScheduler
+from patient_medication_app.core.suggest import medication_index
+from patient_medication_app.database.connections import SessionLocal
+from patient_medication_app.database.sharding import shards
+from patient_medication_app.metrics import collect_metrics, register_metrics
+from patient_medication_app.middleware import (
+    AdmissionControlMiddleware,
+    AdmissionGate,
+    ProfilingMiddleware,
+)
+from patient_medication_app.settings import settings
+
+lifecycle_scheduler = LifecycleScheduler(
+    SessionLocal,
+    interval=settings.lifecycle_interval,
+    lease_ttl=settings.lifecycle_lease_ttl,
+    batch_size=settings.lifecycle_batch_size,
+    max_batches=settings.lifecycle_max_batches,
+    shards=shards,
+)
+register_metrics("lifecycle", lifecycle_scheduler.metrics)
+
+audit_drainer = AuditDrainer(
+    SessionLocal,
+    interval=settings.audit_drain_interval,
+    lease_ttl=settings.audit_drain_lease_ttl,
+    batch_size=settings.audit_drain_batch_size,
+    shards=shards,
+)
+register_metrics("audit_drain", audit_drainer.metrics)
+
+logger = logging.getLogger(__name__)
+
+
+def preload_medication_index() -> None:
+    """Build the medication index before the first keystroke, if possible."""
+    try:
+        with SessionLocal() as db:
+            medication_index.load(db)
+    except Exception:
+        # Startup does not depend on the database: the index is loaded on the
+        # first suggestion request instead
+        logger.warning("Could not preload the medication index", exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.medication_index_preload:
+        await run_in_threadpool(preload_medication_index)
+    if settings.lifecycle_enabled:
+        lifecycle_scheduler.start()
+    if settings.audit_enabled and settings.audit_drain_enabled:
+        audit_drainer.start()
+    yield
+    await lifecycle_scheduler.stop()
+    await audit_drainer.stop()
+
 
 app = FastAPI(
-    title="Patient Medication", description="Patient Medication API", version="0.1.0"
+    title="Patient Medication",
+    description="Patient Medication API",
+    version="0.1.0",
+    lifespan=lifespan,
 )
 
 app.include_router(api_router, tags=["api"])
 
+read_gate = AdmissionGate(
+    settings.admission_max_reads,
+    settings.admission_queue_size,
+    settings.admission_queue_timeout,
+)
+write_gate = AdmissionGate(
+    settings.admission_max_writes,
+    settings.admission_queue_size,
+    settings.admission_queue_timeout,
+)
+register_metrics("admission_reads", read_gate.metrics)
+register_metrics("admission_writes", write_gate.metrics)
+
+app.add_middleware(
+    ProfilingMiddleware,
+    output_dir=settings.profiling_dir,
+    token=settings.profiling_token,
+    sample_rate=settings.profiling_sample_rate,
+    interval=settings.profiling_interval,
+    max_duration=settings.profiling_max_duration,
+    max_profiles=settings.profiling_max_profiles,
+)
+# Added last so it runs first: shed requests are never profiled
+app.add_middleware(
+    AdmissionControlMiddleware,
+    read_gate=read_gate,
+    write_gate=write_gate,
+    exempt_paths=["/healthcheck", "/metrics"],
+    retry_after=settings.admission_retry_after,
+)
+
 
 @app.get("/healthcheck")
 async def healthcheck():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def metrics():
+    return collect_metrics()
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,275 @@
+"""Command line entry points for operational tasks.
+
+Run from the ``src`` directory, e.g.::
+
+    poetry run python -m patient_medication_app.cli archive --older-than-days 730
+"""
+
+import argparse
+import sys
+from datetime import date
+from typing import Optional, Sequence
+
+
+def _archive(args: argparse.Namespace) -> None:
+    from patient_medication_app.core.archive import archive_closed_requests
+    from patient_medication_app.database.connections import SessionLocal
+    from patient_medication_app.database.sharding import shards
+
+    options = {
+        "older_than_days": args.older_than_days,
+        "batch_size": args.batch_size,
+        "max_batches": args.max_batches,
+    }
+    with SessionLocal() as db:
+        if shards is None:
+            archived = archive_closed_requests(db, **options)
+        else:
+            # Medication requests live on the shards, the cache generation on
+            # the primary database
+            archived = 0
+            for name in shards.names:
+                with shards.session(name) as shard_db:
+                    archived += archive_closed_requests(
+                        shard_db, cache_db=db, **options
+                    )
+    print(f"Archived {archived} medication requests")
+
+
+def _export(args: argparse.Namespace) -> None:
+    from patient_medication_app.core.export import export_stream
+    from patient_medication_app.database.connections import SessionLocal
+
+    chunks = export_stream(
+        SessionLocal,
+        args.format,
+        statuses=args.status or (),
+        prescribed_from=args.prescribed_from,
+        prescribed_to=args.prescribed_to,
+        chunk_size=args.chunk_size,
+    )
+    with open(args.output, "wb") as output:
+        for chunk in chunks:
+            output.write(chunk)
+    print(f"Exported medication requests to {args.output}")
+
+
+def _import(args: argparse.Namespace) -> None:
+    from patient_medication_app.core.importer import (
+        ImportFileError,
+        ImportFormat,
+        import_medication_requests,
+        iter_rows,
+    )
+    from patient_medication_app.database.connections import SessionLocal
+
+    import_format: ImportFormat = args.format or (
+        "csv" if args.input.lower().endswith(".csv") else "ndjson"
+    )
+
+    def progress(report) -> None:
+        print(
+            f"{report.rows_read} rows read, {report.rows_imported} imported, "
+            f"{report.rows_failed} failed",
+            file=sys.stderr,
+        )
+
+    with SessionLocal() as db, open(args.input, "rb") as input_file:
+        try:
+            report = import_medication_requests(
+                db,
+                iter_rows(input_file, import_format),
+                chunk_size=args.chunk_size,
+                progress=progress,
+            )
+        except ImportFileError as e:
+            print(
+                f"{e}; imported {e.report.rows_imported} of "
+                f"{e.report.rows_read} medication requests before it",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+
+    for error in report.errors:
+        print(f"row {error.row}: {error.error}")
+    print(f"Imported {report.rows_imported} of {report.rows_read} medication requests")
+
+
+def _read_model(args: argparse.Namespace) -> None:
+    from patient_medication_app.core.read_model import (
+        check_read_model,
+        rebuild_read_model,
+    )
+    from patient_medication_app.database.connections import SessionLocal
+
+    with SessionLocal() as db:
+        if args.action == "rebuild":
+            written = rebuild_read_model(db, batch_size=args.batch_size)
+            print(f"Rebuilt {written} medication request listing rows")
+            return
+
+        counts = check_read_model(db)
+    print(", ".join(f"{name}: {count}" for name, count in counts.items()))
+    if any(counts.values()):
+        sys.exit(1)
+
+
+def _audit_overlaps(args: argparse.Namespace) -> None:
+    from patient_medication_app.core.overlaps import audit_overlapping_requests
+    from patient_medication_app.database.connections import SessionLocal
+
+    with SessionLocal() as db:
+        overlaps = audit_overlapping_requests(db)
+    for overlap in overlaps:
+        print(
+            f"patient {overlap.patient_reference} medication "
+            f"{overlap.medication_reference}: requests {overlap.first_id} "
+            f"and {overlap.second_id} overlap"
+        )
+    print(f"Found {len(overlaps)} overlapping pairs of active requests")
+    if overlaps:
+        sys.exit(1)
+
+
+def _shards(args: argparse.Namespace) -> None:
+    from patient_medication_app.database.sharding import (
+        misplaced_patients,
+        place_patients,
+        replicate_reference_data,
+        shards,
+    )
+
+    if shards is None:
+        print("Sharding is not configured, set SHARD_DATABASE_URLS")
+        sys.exit(1)
+
+    if args.action == "sync-reference":
+        from patient_medication_app.database.connections import SessionLocal
+
+        with SessionLocal() as db:
+            counts = replicate_reference_data(db, shards)
+            placed = place_patients(db, shards)
+        print(
+            f"Copied {', '.join(f'{count} {table} rows' for table, count in counts.items())} "
+            f"to {len(shards.names)} shards"
+        )
+        print(
+            f"Placed {sum(placed.values())} patients: "
+            + ", ".join(f"{count} on {name}" for name, count in placed.items())
+        )
+        return
+
+    misplaced = misplaced_patients(shards)
+    for name, patient_ids in misplaced.items():
+        print(f"{name}: {len(patient_ids)} misplaced patients")
+    if any(misplaced.values()):
+        sys.exit(1)
+
+
+def _backfill_estimate(args: argparse.Namespace) -> None:
+    from patient_medication_app.database.connections import engine
+    from patient_medication_app.database.online_migrations import Backfill
+
+    job = Backfill(
+        args.name,
+        args.table,
+        args.set,
+        where=args.where,
+        key=args.key,
+        batch_size=args.batch_size,
+        pause=args.pause,
+    )
+    with engine.connect() as connection:
+        estimate = job.estimate(connection, sample_batches=args.sample_batches)
+    print(
+        f"{estimate.rows} rows in {estimate.batches} batches of {args.batch_size}; "
+        f"{estimate.seconds_per_batch * 1000:.1f} ms per batch over "
+        f"{estimate.sampled_batches} sampled batches"
+    )
+    print(f"Estimated duration: {estimate.estimated_seconds:.1f} s")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for all subcommands."""
+    parser = argparse.ArgumentParser(prog="patient-medication")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    archive = subparsers.add_parser(
+        "archive", help="Move old closed medication requests to the archive table"
+    )
+    archive.add_argument("--older-than-days", type=int, default=None)
+    archive.add_argument("--batch-size", type=int, default=None)
+    archive.add_argument("--max-batches", type=int, default=None)
+    archive.set_defaults(func=_archive)
+
+    export = subparsers.add_parser(
+        "export", help="Export medication requests as Parquet or Arrow IPC"
+    )
+    export.add_argument("output", help="Path of the file to write")
+    export.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    export.add_argument(
+        "--status", action="append", help="Repeat to export any of several statuses"
+    )
+    export.add_argument("--prescribed-from", type=date.fromisoformat, default=None)
+    export.add_argument("--prescribed-to", type=date.fromisoformat, default=None)
+    export.add_argument("--chunk-size", type=int, default=10_000)
+    export.set_defaults(func=_export)
+
+    import_ = subparsers.add_parser(
+        "import", help="Bulk import medication requests from CSV or NDJSON"
+    )
+    import_.add_argument("input", help="Path of the file to import")
+    import_.add_argument("--format", choices=["csv", "ndjson"], default=None)
+    import_.add_argument("--chunk-size", type=int, default=5_000)
+    import_.set_defaults(func=_import)
+
+    read_model = subparsers.add_parser(
+        "read-model", help="Check or rebuild the denormalized listing table"
+    )
+    read_model.add_argument("action", choices=["check", "rebuild"])
+    read_model.add_argument("--batch-size", type=int, default=10_000)
+    read_model.set_defaults(func=_read_model)
+
+    audit_overlaps = subparsers.add_parser(
+        "audit-overlaps",
+        help="List overlapping active requests for the same patient and medication",
+    )
+    audit_overlaps.set_defaults(func=_audit_overlaps)
+
+    shards = subparsers.add_parser(
+        "shards",
+        help="Copy reference data and patients to the shards, or check placement",
+    )
+    shards.add_argument("action", choices=["sync-reference", "check"])
+    shards.set_defaults(func=_shards)
+
+    backfill_estimate = subparsers.add_parser(
+        "backfill-estimate",
+        help="Time a few batches of a migration backfill, rolled back, "
+        "and estimate the full run",
+    )
+    backfill_estimate.add_argument("table")
+    backfill_estimate.add_argument(
+        "--set", required=True, help="SET clause, e.g. \"frequency = 'daily'\""
+    )
+    backfill_estimate.add_argument("--where", default=None)
+    backfill_estimate.add_argument("--key", default="id")
+    backfill_estimate.add_argument("--batch-size", type=int, default=1000)
+    backfill_estimate.add_argument("--pause", type=float, default=0.0)
+    backfill_estimate.add_argument("--sample-batches", type=int, default=5)
+    backfill_estimate.add_argument(
+        "--name", default="", help="Checkpoint of the backfill, to estimate the rest"
+    )
+    backfill_estimate.set_defaults(func=_backfill_estimate)
+
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Parse arguments and run the selected subcommand."""
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
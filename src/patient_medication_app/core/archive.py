@@ -0,0 +1,103 @@
+"""Archival of closed medication requests.
+
+Completed and cancelled requests are moved out of the live ``medication_request``
+table into ``medication_request_archive`` so the hot table and its indexes only
+hold the working set.
+"""
+
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.cache import result_cache
+from patient_medication_app.core.models import (
+    MedicationRequest,
+    MedicationRequestArchive,
+    MedicationRequestColumns,
+)
+from patient_medication_app.core.read_model import record_removed
+from patient_medication_app.settings import settings
+
+CLOSED_STATUSES = ("completed", "cancelled")
+
+# Columns copied verbatim from the live table into the archive
+ARCHIVED_COLUMNS = ["id", *MedicationRequestColumns.__annotations__]
+
+
+def archive_cutoff(older_than_days: int, today: Optional[date] = None) -> date:
+    """Return the date before which closed requests are eligible for archival."""
+    return (today or date.today()) - timedelta(days=older_than_days)
+
+
+def archive_closed_requests(
+    db: Session,
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None,
+    cache_db: Optional[Session] = None,
+) -> int:
+    """
+    Move closed medication requests older than the cutoff into the archive.
+
+    Each batch is copied and deleted in its own short transaction, so the live
+    table is never locked for longer than one batch takes.
+
+    Args:
+        db: Database session
+        older_than_days: Minimum age in days, measured from the end date (or the
+            start date when no end date is set). Defaults to the configured value.
+        batch_size: Number of rows moved per transaction. Defaults to the
+            configured value.
+        max_batches: Optional limit on the number of batches to run
+        cache_db: Session on the database holding the result cache generation,
+            the primary database when ``db`` is a shard. Defaults to ``db``.
+
+    Returns:
+        Number of medication requests archived
+    """
+    if older_than_days is None:
+        older_than_days = settings.archive_after_days
+    if batch_size is None:
+        batch_size = settings.archive_batch_size
+    cutoff = archive_cutoff(older_than_days)
+
+    live_columns = [getattr(MedicationRequest, name) for name in ARCHIVED_COLUMNS]
+    archived = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = (
+            db.execute(
+                select(MedicationRequest.id)
+                .where(
+                    MedicationRequest.status.in_(CLOSED_STATUSES),
+                    func.coalesce(
+                        MedicationRequest.end_date, MedicationRequest.start_date
+                    )
+                    < cutoff,
+                )
+                .order_by(MedicationRequest.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            .scalars()
+            .all()
+        )
+        if not ids:
+            break
+
+        db.execute(
+            insert(MedicationRequestArchive).from_select(
+                ARCHIVED_COLUMNS,
+                select(*live_columns).where(MedicationRequest.id.in_(ids)),
+            )
+        )
+        db.execute(delete(MedicationRequest).where(MedicationRequest.id.in_(ids)))
+        record_removed(db, ids)
+        db.commit()
+        result_cache.bump(cache_db or db)
+
+        archived += len(ids)
+        batches += 1
+    return archived
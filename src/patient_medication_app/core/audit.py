@@ -0,0 +1,309 @@
+"""Audit trail of medication request creates and updates.
+
+Writes only append a small snapshot row to ``medication_request_audit_outbox``
+inside their own transaction, so the change and its audit entry commit or roll
+back together at the cost of a single INSERT. A background drainer then moves
+outbox entries in batches to the append-only ``medication_request_audit``
+table, working out the before/after diff of each change against the previous
+snapshot of the same request. On PostgreSQL the audit table is partitioned by
+month; the drainer creates partitions as it reaches new months.
+
+The audit log therefore lags the live table by up to one drain interval.
+When sharding is on, requests created on a shard are audited in the outbox of
+that shard, and the drainer moves them to the audit table of the same shard.
+"""
+
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Iterable, Mapping, Optional
+
+from sqlalchemy import and_, delete, exists, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.leases import LeasedJob
+from patient_medication_app.core.models import (
+    MedicationRequest,
+    MedicationRequestAudit,
+    MedicationRequestAuditOutbox,
+    MedicationRequestColumns,
+)
+from patient_medication_app.database.sharding import ShardSet
+from patient_medication_app.settings import settings
+
+SNAPSHOT_COLUMNS = ["id", *MedicationRequestColumns.__annotations__]
+
+# Database URL and month of the PostgreSQL partitions known to exist
+_partitions: set[tuple[str, int, int]] = set()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _json_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def _snapshot(row: Mapping[Any, Any]) -> dict[str, Any]:
+    return {name: _json_value(row[name]) for name in SNAPSHOT_COLUMNS}
+
+
+def _outbox_entry(row: Mapping[Any, Any], action: str, actor: str) -> dict[str, Any]:
+    return {
+        "medication_request_id": row["id"],
+        "action": action,
+        "actor": actor,
+        "changed_at": _utcnow(),
+        "snapshot": _snapshot(row),
+    }
+
+
+def record_change(db: Session, row: Mapping[Any, Any], action: str, actor: str) -> None:
+    """Queue the audit entry of a change, given the request as returned after it."""
+    if settings.audit_enabled:
+        db.execute(
+            insert(MedicationRequestAuditOutbox).values(
+                **_outbox_entry(row, action, actor)
+            )
+        )
+
+
+def _record_rows(db: Session, statement, action: str, actor: str) -> None:
+    entries = [
+        _outbox_entry(row, action, actor) for row in db.execute(statement).mappings()
+    ]
+    if entries:
+        db.execute(insert(MedicationRequestAuditOutbox), entries)
+
+
+def record_changes(db: Session, ids: Iterable[int], action: str, actor: str) -> None:
+    """Queue audit entries for requests changed by a bulk UPDATE."""
+    if settings.audit_enabled:
+        _record_rows(
+            db,
+            select(MedicationRequest.__table__).where(
+                MedicationRequest.id.in_(list(ids))
+            ),
+            action,
+            actor,
+        )
+
+
+def record_created_after(db: Session, watermark: int, actor: str) -> None:
+    """Queue create entries for requests bulk inserted above ``watermark``."""
+    if settings.audit_enabled:
+        queued = exists().where(
+            MedicationRequestAuditOutbox.medication_request_id == MedicationRequest.id
+        )
+        audited = exists().where(
+            MedicationRequestAudit.medication_request_id == MedicationRequest.id
+        )
+        _record_rows(
+            db,
+            select(MedicationRequest.__table__).where(
+                MedicationRequest.id > watermark, ~queued, ~audited
+            ),
+            "create",
+            actor,
+        )
+
+
+def _changes(
+    before: Optional[dict[str, Any]], after: dict[str, Any]
+) -> dict[str, dict[str, Any]]:
+    """Before/after values of the fields that differ, all of them without before."""
+    return {
+        name: {"before": None if before is None else before.get(name), "after": value}
+        for name, value in after.items()
+        if name != "id" and (before is None or before.get(name) != value)
+    }
+
+
+def _latest_snapshots(db: Session, request_ids: set[int]) -> dict[int, dict]:
+    """Snapshot of the latest audited version of each request."""
+    latest = (
+        select(
+            MedicationRequestAudit.medication_request_id,
+            func.max(MedicationRequestAudit.version).label("version"),
+        )
+        .where(MedicationRequestAudit.medication_request_id.in_(request_ids))
+        .group_by(MedicationRequestAudit.medication_request_id)
+        .subquery()
+    )
+    return dict(
+        db.execute(
+            select(
+                MedicationRequestAudit.medication_request_id,
+                MedicationRequestAudit.snapshot,
+            ).join(
+                latest,
+                and_(
+                    MedicationRequestAudit.medication_request_id
+                    == latest.c.medication_request_id,
+                    MedicationRequestAudit.version == latest.c.version,
+                ),
+            )
+        ).all()
+    )
+
+
+def _ensure_partitions(db: Session, months: set[tuple[int, int]]) -> None:
+    """Create the monthly PostgreSQL partitions of the audit table."""
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    database = str(bind.engine.url)
+    for year, month in sorted(months):
+        if (database, year, month) in _partitions:
+            continue
+        start = date(year, month, 1)
+        end = date(year + month // 12, month % 12 + 1, 1)
+        db.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS "
+                f"{MedicationRequestAudit.__tablename__}_y{year}m{month:02d} "
+                f"PARTITION OF {MedicationRequestAudit.__tablename__} "
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            )
+        )
+        _partitions.add((database, year, month))
+
+
+def drain_audit_outbox(
+    db: Session, batch_size: int = 1000, max_batches: Optional[int] = None
+) -> int:
+    """
+    Move outbox entries to the audit log, oldest first.
+
+    Args:
+        db: Database session
+        batch_size: Number of entries moved per transaction
+        max_batches: Optional limit on the number of batches to run
+
+    Returns:
+        Number of entries moved
+    """
+    drained = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        entries = (
+            db.execute(
+                select(MedicationRequestAuditOutbox)
+                .order_by(MedicationRequestAuditOutbox.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            .scalars()
+            .all()
+        )
+        if not entries:
+            break
+
+        previous = _latest_snapshots(
+            db, {entry.medication_request_id for entry in entries}
+        )
+        rows = []
+        for entry in entries:
+            before = previous.get(entry.medication_request_id)
+            rows.append(
+                {
+                    "id": entry.id,
+                    "changed_at": entry.changed_at,
+                    "medication_request_id": entry.medication_request_id,
+                    "version": entry.snapshot["version"],
+                    "action": entry.action,
+                    "actor": entry.actor,
+                    "changes": _changes(
+                        None if entry.action == "create" else before, entry.snapshot
+                    ),
+                    "snapshot": entry.snapshot,
+                }
+            )
+            previous[entry.medication_request_id] = entry.snapshot
+
+        _ensure_partitions(
+            db, {(entry.changed_at.year, entry.changed_at.month) for entry in entries}
+        )
+        db.execute(insert(MedicationRequestAudit), rows)
+        db.execute(
+            delete(MedicationRequestAuditOutbox).where(
+                MedicationRequestAuditOutbox.id.in_([entry.id for entry in entries])
+            )
+        )
+        db.commit()
+
+        drained += len(entries)
+        batches += 1
+    return drained
+
+
+def audit_history(
+    db: Session, medication_request_id: int
+) -> list[MedicationRequestAudit]:
+    """Audit log entries of one request, oldest first."""
+    return list(
+        db.execute(
+            select(MedicationRequestAudit)
+            .where(
+                MedicationRequestAudit.medication_request_id == medication_request_id
+            )
+            .order_by(MedicationRequestAudit.version, MedicationRequestAudit.id)
+        ).scalars()
+    )
+
+
+class AuditDrainer(LeasedJob):
+    """Periodically drains the audit outboxes while holding the lease.
+
+    The outbox of the primary database is drained, and with ``shards`` those
+    of every shard too, in parallel.
+    """
+
+    lease_name = "audit_drain"
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        interval: float = 5.0,
+        lease_ttl: float = 30.0,
+        batch_size: int = 1000,
+        max_batches: int = 50,
+        shards: Optional[ShardSet] = None,
+    ):
+        super().__init__(session_factory, interval, lease_ttl)
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.shards = shards
+        self.backlog: Optional[int] = None
+        self.lag_seconds: Optional[float] = None
+
+    def _drain(self, db: Session) -> tuple[int, int, Optional[datetime]]:
+        drained = drain_audit_outbox(
+            db, batch_size=self.batch_size, max_batches=self.max_batches
+        )
+        backlog, oldest = db.execute(
+            select(
+                func.count(MedicationRequestAuditOutbox.id),
+                func.min(MedicationRequestAuditOutbox.changed_at),
+            )
+        ).one()
+        return drained, backlog, oldest
+
+    def work(self, db: Session) -> int:
+        results = [self._drain(db)]
+        if self.shards is not None:
+            results += self.shards.scatter(self._drain)
+        self.backlog = sum(backlog for _, backlog, _ in results)
+        oldest = min(
+            (oldest for _, _, oldest in results if oldest is not None), default=None
+        )
+        self.lag_seconds = (
+            0.0 if oldest is None else (_utcnow() - oldest).total_seconds()
+        )
+        return sum(drained for drained, _, _ in results)
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            **super().metrics(),
+            "backlog": self.backlog,
+            "lag_seconds": self.lag_seconds,
+        }
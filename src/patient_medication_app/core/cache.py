@@ -0,0 +1,248 @@
+"""Result cache for serialized list responses.
+
+Entries are keyed on a generation counter plus the normalized filter set.
+Every write to medication requests bumps the generation after committing, so
+entries cached before the write can no longer be looked up and simply age out.
+
+Two backends are available: an in-process LRU bounded by total bytes, and a
+Redis-compatible server (the ``redis`` package is an optional dependency).
+The Redis backend keeps the generation next to the entries. The in-process
+cache keeps its generation in the ``cache_generation`` row, which every API
+worker, CLI command and background job bumps, and reads it before each
+lookup, so a write made by any process invalidates the entries of all of
+them. Entries of either backend also expire after ``result_cache_ttl``
+seconds, which bounds how long writes that bypass the application are hidden.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.models import CacheGeneration
+from patient_medication_app.metrics import register_metrics
+from patient_medication_app.settings import settings
+
+
+class ResultCache:
+    """Interface of the result cache backends; this base class caches nothing."""
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self, db: Session) -> int:
+        return 0
+
+    def bump(self, db: Session) -> None:
+        """Invalidate every cached entry by moving to the next generation."""
+
+    def key(self, db: Session, namespace: str, filters: Hashable) -> str:
+        """Build the cache key for ``filters`` in the current generation."""
+        return f"{namespace}:{self.generation(db)}:{filters!r}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: bytes) -> None:
+        pass
+
+    def clear(self) -> None:
+        """Drop every entry."""
+
+    def metrics(self) -> dict[str, Any]:
+        return {"backend": "none", "hits": self.hits, "misses": self.misses}
+
+
+def shared_generation(db: Session, name: str) -> int:
+    """Current value of the generation row ``name``, 0 before its first bump."""
+    generation = db.scalar(
+        select(CacheGeneration.generation).where(CacheGeneration.name == name)
+    )
+    return generation or 0
+
+
+def bump_shared_generation(db: Session, name: str) -> int:
+    """
+    Increment the generation row ``name``.
+
+    Args:
+        db: Database session, committed on return
+        name: Name of the cache
+
+    Returns:
+        The new generation
+    """
+    while True:
+        generation = db.scalar(
+            update(CacheGeneration)
+            .where(CacheGeneration.name == name)
+            .values(generation=CacheGeneration.generation + 1)
+            .returning(CacheGeneration.generation)
+        )
+        if generation is not None:
+            break
+        try:
+            db.execute(insert(CacheGeneration).values(name=name, generation=1))
+        except IntegrityError:
+            # Created by a concurrent bump, increment it instead
+            db.rollback()
+            continue
+        generation = 1
+        break
+    db.commit()
+    return generation
+
+
+class MemoryResultCache(ResultCache):
+    """In-process LRU cache bounded by the total size of the cached values."""
+
+    GENERATION_NAME = "result_cache"
+
+    def __init__(self, max_bytes: int, ttl: float) -> None:
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evictions = 0
+        self._generation = 0
+        self._size = 0
+        # Key -> (monotonic expiry time, value)
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def generation(self, db: Session) -> int:
+        generation = shared_generation(db, self.GENERATION_NAME)
+        self._move_to(generation)
+        return generation
+
+    def bump(self, db: Session) -> None:
+        self._move_to(bump_shared_generation(db, self.GENERATION_NAME))
+
+    def _move_to(self, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation:
+                self._generation = generation
+                # Entries from other generations can never be hit again
+                self._entries.clear()
+                self._size = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._size -= len(self._entries.pop(key)[1])
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if not key.startswith(self._key_prefix(key)):
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous[1])
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def _key_prefix(self, key: str) -> str:
+        # Refuse values computed under a generation that has since been bumped
+        namespace = key.split(":", 1)[0]
+        return f"{namespace}:{self._generation}:"
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            **super().metrics(),
+            "backend": "memory",
+            "generation": self._generation,
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "evictions": self.evictions,
+        }
+
+
+class RedisResultCache(ResultCache):
+    """Cache stored in a Redis-compatible server, shared by all workers."""
+
+    GENERATION_KEY = "patient_medication:cache_generation"
+
+    def __init__(self, url: str, ttl: int) -> None:
+        super().__init__()
+        import redis
+
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url)
+
+    def generation(self, db: Session) -> int:
+        return self._generation()
+
+    def _generation(self) -> int:
+        return int(self._client.get(self.GENERATION_KEY) or 0)
+
+    def bump(self, db: Session) -> None:
+        self._client.incr(self.GENERATION_KEY)
+
+    def key(self, db: Session, namespace: str, filters: Hashable) -> str:
+        return f"patient_medication:{super().key(db, namespace, filters)}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self._client.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes) -> None:
+        # Old generations are never read again and expire through the TTL
+        self._client.set(key, value, ex=self.ttl)
+
+    def clear(self) -> None:
+        self._client.incr(self.GENERATION_KEY)
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            **super().metrics(),
+            "backend": "redis",
+            "generation": self._generation(),
+            "ttl": self.ttl,
+        }
+
+
+def build_result_cache() -> ResultCache:
+    """Create the cache backend selected in settings."""
+    if settings.result_cache_backend == "memory":
+        return MemoryResultCache(
+            settings.result_cache_max_bytes, settings.result_cache_ttl
+        )
+    if settings.result_cache_backend == "redis":
+        if settings.redis_url is None:
+            raise ValueError("Redis URL must not be None for the redis cache backend")
+        return RedisResultCache(settings.redis_url, settings.result_cache_ttl)
+    return ResultCache()
+
+
+result_cache = build_result_cache()
+register_metrics("result_cache", result_cache.metrics)
@@ -0,0 +1,61 @@
+"""Single-flight coalescing of identical concurrent work.
+
+While a call for a key is running, further calls for the same key wait for it
+and share its result instead of repeating the work. The work runs in a task
+of its own, so a caller that is cancelled, e.g. by a client disconnecting,
+stops waiting without cancelling it for the others.
+"""
+
+import asyncio
+from functools import partial
+from typing import Any, Callable, Generic, Hashable, TypeVar
+
+from starlette.concurrency import run_in_threadpool
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """Coalesce concurrent calls with the same key into one execution."""
+
+    def __init__(self) -> None:
+        self._in_flight: dict[Hashable, asyncio.Task[T]] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """
+        Run the blocking ``fn`` in the threadpool, or join the call in flight.
+
+        Args:
+            key: Identifies equivalent calls, e.g. a normalized filter set
+            fn: Blocking function producing the result. It may outlive the
+                caller, so it must not use resources the caller releases,
+                such as a request-scoped session
+
+        Returns:
+            The result of ``fn``, shared by every caller that joined the flight
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(run_in_threadpool(fn))
+            task.add_done_callback(partial(self._landed, key))
+            self._in_flight[key] = task
+            self.executed += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _landed(self, key: Hashable, task: asyncio.Task[T]) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every caller was cancelled
+            task.exception()
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "in_flight": len(self._in_flight),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,91 @@
+"""Batched loading of the objects medication requests reference.
+
+Responses can nest the patient, clinician and medication of each request
+(``expand=``). They are loaded per page rather than per row: each expanded
+relation costs one ``SELECT ... WHERE key IN (...)`` over the distinct
+references of the page, whatever its size, and the loaded objects are shared
+by the rows referencing them.
+"""
+
+from typing import Any, Iterable
+
+from sqlalchemy import FromClause, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import KeyedColumnElement
+
+from patient_medication_app.core.models import Clinician, Medication, Patient
+
+# Keys per IN query; larger pages are loaded in several queries
+EXPAND_BATCH_SIZE = 1000
+
+# Relation name -> (table, key column, referencing column of the request)
+RELATIONS: dict[str, tuple[FromClause, KeyedColumnElement[Any], str]] = {
+    "patient": (Patient.__table__, Patient.__table__.c.id, "patient_reference"),
+    "clinician": (
+        Clinician.__table__,
+        Clinician.__table__.c.registration_id,
+        "clinician_reference",
+    ),
+    "medication": (
+        Medication.__table__,
+        Medication.__table__.c.code,
+        "medication_reference",
+    ),
+}
+
+
+class UnknownExpansionError(ValueError):
+    """Raised for an expand= value that is not a relation of requests."""
+
+
+def parse_expand(expand: str | None) -> tuple[str, ...]:
+    """
+    Parse a comma-separated ``expand`` value.
+
+    Returns:
+        The distinct relation names, sorted
+
+    Raises:
+        UnknownExpansionError: If a name is not in ``RELATIONS``
+    """
+    names = {name.strip() for name in (expand or "").split(",") if name.strip()}
+    unknown = sorted(names - RELATIONS.keys())
+    if unknown:
+        raise UnknownExpansionError(
+            f"Cannot expand {', '.join(unknown)}; "
+            f"expandable relations are {', '.join(RELATIONS)}"
+        )
+    return tuple(sorted(names))
+
+
+def _load(db: Session, relation: str, keys: set[Any]) -> dict[Any, dict[str, Any]]:
+    table, key, _ = RELATIONS[relation]
+    loaded: dict[Any, dict[str, Any]] = {}
+    ordered = sorted(keys)
+    for start in range(0, len(ordered), EXPAND_BATCH_SIZE):
+        batch = ordered[start : start + EXPAND_BATCH_SIZE]
+        for row in db.execute(select(table).where(key.in_(batch))).mappings():
+            loaded[row[key.name]] = dict(row)
+    return loaded
+
+
+def expand_rows(
+    db: Session, rows: list[dict[str, Any]], relations: Iterable[str]
+) -> list[dict[str, Any]]:
+    """
+    Nest the related objects of ``relations`` into the request rows in place.
+
+    Args:
+        db: Database session
+        rows: Medication request rows, as dicts with the reference columns
+        relations: Names from ``RELATIONS`` to load
+
+    Returns:
+        ``rows``, each with one key per relation holding the related object
+    """
+    for relation in relations:
+        reference = RELATIONS[relation][2]
+        loaded = _load(db, relation, {row[reference] for row in rows})
+        for row in rows:
+            row[relation] = loaded.get(row[reference])
+    return rows
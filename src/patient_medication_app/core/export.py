@@ -0,0 +1,200 @@
+"""Columnar export of medication requests for analytics.
+
+Rows are streamed from a server-side cursor and converted into Arrow record
+batches, which are then written as Parquet or as an Arrow IPC stream. pyarrow is
+an optional dependency, installed with the ``analytics`` extra.
+"""
+
+import io
+from datetime import date
+from typing import Any, Callable, Iterable, Iterator, Literal, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.models import Clinician, Medication, MedicationRequest
+from patient_medication_app.core.queries import (
+    MedicationRequestFilters,
+    medication_request_filters,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depends on the installed extras
+    pa = None
+    pq = None
+
+ExportFormat = Literal["parquet", "arrow"]
+
+MEDIA_TYPES: dict[str, str] = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+
+class ExportUnavailableError(RuntimeError):
+    """Raised when pyarrow is not installed."""
+
+
+def export_schema() -> "pa.Schema":
+    """Return the Arrow schema of exported medication requests."""
+    if pa is None:
+        raise ExportUnavailableError(
+            "pyarrow is required for exports, install the 'analytics' extra"
+        )
+    status_type = pa.dictionary(pa.int8(), pa.string())
+    return pa.schema(
+        [
+            pa.field("id", pa.int64(), nullable=False),
+            pa.field("patient_reference", pa.int64(), nullable=False),
+            pa.field("clinician_reference", pa.string(), nullable=False),
+            pa.field("medication_reference", pa.string(), nullable=False),
+            pa.field("medication_code_name", pa.string(), nullable=False),
+            pa.field("clinician_first_name", pa.string(), nullable=False),
+            pa.field("clinician_last_name", pa.string(), nullable=False),
+            pa.field("reason", pa.string(), nullable=False),
+            pa.field("prescribed_date", pa.date32(), nullable=False),
+            pa.field("start_date", pa.date32(), nullable=False),
+            pa.field("end_date", pa.date32()),
+            pa.field("frequency", pa.string(), nullable=False),
+            pa.field("status", status_type, nullable=False),
+        ]
+    )
+
+
+def _export_statement(
+    statuses: Iterable[str],
+    prescribed_from: Optional[date],
+    prescribed_to: Optional[date],
+):
+    return (
+        select(
+            MedicationRequest.id,
+            MedicationRequest.patient_reference,
+            MedicationRequest.clinician_reference,
+            MedicationRequest.medication_reference,
+            Medication.code_name.label("medication_code_name"),
+            Clinician.first_name.label("clinician_first_name"),
+            Clinician.last_name.label("clinician_last_name"),
+            MedicationRequest.reason,
+            MedicationRequest.prescribed_date,
+            MedicationRequest.start_date,
+            MedicationRequest.end_date,
+            MedicationRequest.frequency,
+            MedicationRequest.status,
+        )
+        .join(Medication, MedicationRequest.medication_reference == Medication.code)
+        .join(
+            Clinician,
+            MedicationRequest.clinician_reference == Clinician.registration_id,
+        )
+        .where(
+            *medication_request_filters(
+                MedicationRequest,
+                MedicationRequestFilters(
+                    statuses=tuple(statuses),
+                    prescribed_from=prescribed_from,
+                    prescribed_to=prescribed_to,
+                ),
+            )
+        )
+        .order_by(MedicationRequest.id)
+    )
+
+
+def iter_record_batches(
+    db: Session,
+    statuses: Iterable[str] = (),
+    prescribed_from: Optional[date] = None,
+    prescribed_to: Optional[date] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator["pa.RecordBatch"]:
+    """
+    Yield the filtered medication requests as Arrow record batches.
+
+    Rows are fetched from a server-side cursor ``chunk_size`` at a time, so
+    memory use is bounded by the chunk size rather than the result size.
+    ``statuses`` matches any of the given statuses, like the list endpoint.
+    """
+    schema = export_schema()
+    result = db.execute(
+        _export_statement(statuses, prescribed_from, prescribed_to).execution_options(
+            stream_results=True, yield_per=chunk_size
+        )
+    )
+    for rows in result.partitions():
+        columns = list(zip(*rows))
+        yield pa.RecordBatch.from_arrays(
+            [
+                pa.array(values, type=field.type)
+                for values, field in zip(columns, schema)
+            ],
+            schema=schema,
+        )
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object collecting bytes until they are drained."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_export(
+    batches: Iterator["pa.RecordBatch"], export_format: ExportFormat
+) -> Iterator[bytes]:
+    """Serialize record batches to Parquet or Arrow IPC, yielding bytes as written."""
+    schema = export_schema()
+    sink = _ChunkSink()
+    writer: Any
+    if export_format == "parquet":
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    else:
+        writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+
+    for batch in batches:
+        writer.write_batch(batch)
+        data = sink.drain()
+        if data:
+            yield data
+
+    writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def export_stream(
+    session_factory: Callable[[], Session],
+    export_format: ExportFormat,
+    statuses: Iterable[str] = (),
+    prescribed_from: Optional[date] = None,
+    prescribed_to: Optional[date] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """
+    Export the filtered medication requests in a session of the stream's own.
+
+    The session, and the server-side cursor in it, is opened when the first
+    bytes are requested and closed when the stream ends or is abandoned.
+    """
+    with session_factory() as db:
+        batches = iter_record_batches(
+            db, statuses, prescribed_from, prescribed_to, chunk_size
+        )
+        yield from stream_export(batches, export_format)
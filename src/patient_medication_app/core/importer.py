@@ -0,0 +1,280 @@
+"""Streaming bulk import of medication requests from CSV or NDJSON files.
+
+Rows are parsed lazily, validated in fixed-size chunks against
+``MedicationRequestCreate`` and checked against the reference tables with one
+``IN`` lookup per table per chunk. Valid rows are loaded with ``COPY`` on
+PostgreSQL and batched inserts elsewhere, so memory use depends on the chunk
+size rather than the file size.
+"""
+
+import codecs
+import csv
+import io
+from itertools import islice
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    Literal,
+    Optional,
+    Union,
+)
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.audit import record_created_after
+from patient_medication_app.core.cache import result_cache
+from patient_medication_app.core.models import (
+    Clinician,
+    Medication,
+    MedicationRequest,
+    Patient,
+)
+from patient_medication_app.core.read_model import id_watermark, record_inserted_after
+from patient_medication_app.schemas.medication_request import (
+    MedicationRequestCreate,
+    MedicationRequestImportError,
+    MedicationRequestImportReport,
+)
+from patient_medication_app.settings import settings
+
+ImportFormat = Literal["csv", "ndjson"]
+
+# A parsed CSV row, or a raw NDJSON line left for pydantic to parse
+ImportRow = Union[dict[str, Any], str]
+
+DEFAULT_CHUNK_SIZE = 5_000
+DEFAULT_MAX_ERRORS = 1_000
+
+# Column order used for COPY and batched inserts
+IMPORT_COLUMNS = list(MedicationRequestCreate.model_fields)
+
+
+class ImportFileError(ValueError):
+    """Raised when an import file is not UTF-8 text or not valid CSV.
+
+    ``report`` holds the counts of the chunks loaded before the error, which
+    stay committed.
+    """
+
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+        self.report = MedicationRequestImportReport()
+
+
+def iter_rows(stream: BinaryIO, import_format: ImportFormat) -> Iterator[ImportRow]:
+    """
+    Lazily split an uploaded file into one item per data row.
+
+    Empty CSV cells are treated as missing values so optional fields such as
+    ``end_date`` can be left blank. NDJSON lines are yielded unparsed so that
+    malformed JSON is reported as a row error rather than aborting the import.
+
+    Raises:
+        ImportFileError: If the file cannot be decoded or split into rows
+    """
+    text = codecs.getreader("utf-8-sig")(stream)
+    try:
+        if import_format == "csv":
+            for row in csv.DictReader(text):
+                yield {key: value for key, value in row.items() if value != ""}
+        else:
+            for line in text:
+                if line.strip():
+                    yield line
+    except UnicodeDecodeError as e:
+        raise ImportFileError(f"File is not UTF-8 encoded: {e}") from e
+    except csv.Error as e:
+        raise ImportFileError(f"File is not valid CSV: {e}") from e
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}"
+        for e in error.errors()
+    )
+
+
+def _missing_references(
+    db: Session, requests: list[MedicationRequestCreate]
+) -> tuple[set[int], set[str], set[str]]:
+    """Return the patient ids, clinician and medication codes that do not exist."""
+    patient_ids = {r.patient_reference for r in requests}
+    clinician_ids = {r.clinician_reference for r in requests}
+    medication_codes = {r.medication_reference for r in requests}
+
+    found_patients = set(
+        db.execute(select(Patient.id).where(Patient.id.in_(patient_ids))).scalars()
+    )
+    found_clinicians = set(
+        db.execute(
+            select(Clinician.registration_id).where(
+                Clinician.registration_id.in_(clinician_ids)
+            )
+        ).scalars()
+    )
+    found_medications = set(
+        db.execute(
+            select(Medication.code).where(Medication.code.in_(medication_codes))
+        ).scalars()
+    )
+    return (
+        patient_ids - found_patients,
+        clinician_ids - found_clinicians,
+        medication_codes - found_medications,
+    )
+
+
+def _copy_field(value: Any) -> str:
+    # COPY reads an unquoted empty field as NULL and a quoted one as empty text,
+    # so every value is quoted and only NULL is left empty
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy_rows(db: Session, rows: list[dict[str, Any]]) -> None:
+    """Load rows with PostgreSQL ``COPY ... FROM STDIN``."""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(_copy_field(row[column]) for column in IMPORT_COLUMNS))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    driver_connection = db.connection().connection.driver_connection
+    if driver_connection is None:
+        raise RuntimeError("The database connection has been closed")
+    cursor = driver_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {MedicationRequest.__tablename__} ({', '.join(IMPORT_COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def _load_rows(db: Session, rows: list[dict[str, Any]]) -> None:
+    if not rows:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        _copy_rows(db, rows)
+    else:
+        db.execute(insert(MedicationRequest), rows)
+
+
+def _next_chunk(
+    numbered: Iterator[tuple[int, ImportRow]],
+    chunk_size: int,
+    report: MedicationRequestImportReport,
+) -> list[tuple[int, ImportRow]]:
+    try:
+        return list(islice(numbered, chunk_size))
+    except ImportFileError as e:
+        e.report = report
+        raise
+
+
+def import_medication_requests(
+    db: Session,
+    rows: Iterable[ImportRow],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_errors: int = DEFAULT_MAX_ERRORS,
+    progress: Optional[Callable[[MedicationRequestImportReport], None]] = None,
+    actor: str = "system:import",
+) -> MedicationRequestImportReport:
+    """
+    Validate and load medication requests chunk by chunk.
+
+    Each chunk is committed on its own, so a failure part way through a large
+    file keeps the chunks that were already loaded.
+
+    Args:
+        db: Database session
+        rows: Parsed rows, e.g. from ``iter_rows``
+        chunk_size: Number of rows validated and loaded per transaction
+        max_errors: Maximum number of row errors kept in the report
+        progress: Optional callback invoked with the report after each chunk
+        actor: Who is recorded in the audit log as creating the requests
+
+    Returns:
+        MedicationRequestImportReport: Counts and per-row errors
+
+    Raises:
+        ImportFileError: If ``rows`` cannot be read to the end, with the
+            report of the rows loaded until then
+    """
+    report = MedicationRequestImportReport()
+
+    def reject(row_number: int, error: str) -> None:
+        report.rows_failed += 1
+        if len(report.errors) < max_errors:
+            report.errors.append(
+                MedicationRequestImportError(row=row_number, error=error)
+            )
+
+    numbered = enumerate(rows, start=1)
+    while chunk := _next_chunk(numbered, chunk_size, report):
+        report.rows_read += len(chunk)
+
+        valid: list[tuple[int, MedicationRequestCreate]] = []
+        for row_number, row in chunk:
+            try:
+                request = (
+                    MedicationRequestCreate.model_validate_json(row)
+                    if isinstance(row, str)
+                    else MedicationRequestCreate.model_validate(row)
+                )
+            except ValidationError as e:
+                reject(row_number, _format_validation_error(e))
+            else:
+                valid.append((row_number, request))
+
+        missing_patients, missing_clinicians, missing_medications = (
+            _missing_references(db, [request for _, request in valid])
+            if valid
+            else (set(), set(), set())
+        )
+
+        to_load = []
+        for row_number, request in valid:
+            if request.patient_reference in missing_patients:
+                reject(
+                    row_number,
+                    f"Patient with id {request.patient_reference} not found",
+                )
+            elif request.clinician_reference in missing_clinicians:
+                reject(
+                    row_number,
+                    f"Clinician with registration ID {request.clinician_reference} not found",
+                )
+            elif request.medication_reference in missing_medications:
+                reject(
+                    row_number,
+                    f"Medication with code {request.medication_reference} not found",
+                )
+            else:
+                to_load.append(request.model_dump())
+
+        watermark = (
+            id_watermark(db)
+            if settings.read_model_enabled or settings.audit_enabled
+            else 0
+        )
+        _load_rows(db, to_load)
+        record_inserted_after(db, watermark)
+        record_created_after(db, watermark, actor)
+        db.commit()
+        if to_load:
+            result_cache.bump(db)
+        report.rows_imported += len(to_load)
+
+        if progress is not None:
+            progress(report)
+
+    return report
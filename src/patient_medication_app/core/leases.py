@@ -0,0 +1,176 @@
+"""Lease rows electing a single worker for a background job.
+
+Every worker process runs the same background loops; before doing any work a
+loop takes the job's lease row. Only one owner can hold an unexpired lease, so
+exactly one worker runs the job at a time, and when it dies the lease expires
+and another worker takes over. Leases are plain rows rather than PostgreSQL
+advisory locks so the same code runs on SQLite. Expiry uses the workers'
+clocks, so the TTL should be well above any clock skew between them.
+"""
+
+import asyncio
+import logging
+import os
+import secrets
+import socket
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional, cast
+
+from sqlalchemy import CursorResult, delete, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from patient_medication_app.core.models import SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def acquire_lease(db: Session, name: str, owner: str, ttl: float) -> bool:
+    """
+    Take or renew the lease ``name`` for ``ttl`` seconds.
+
+    Args:
+        db: Database session, committed on return
+        name: Name of the job
+        owner: Unique id of the calling worker
+        ttl: Seconds until the lease expires unless renewed
+
+    Returns:
+        Whether ``owner`` now holds the lease
+    """
+    now = _utcnow()
+    expires_at = now + timedelta(seconds=ttl)
+    result = db.execute(
+        update(SchedulerLease)
+        .where(
+            SchedulerLease.name == name,
+            or_(SchedulerLease.owner == owner, SchedulerLease.expires_at < now),
+        )
+        .values(owner=owner, expires_at=expires_at)
+    )
+    # Session.execute is typed as returning a Result, which has no rowcount
+    taken = cast(CursorResult, result).rowcount
+    if not taken:
+        try:
+            db.execute(
+                insert(SchedulerLease).values(
+                    name=name, owner=owner, expires_at=expires_at
+                )
+            )
+        except IntegrityError:
+            # Held by another worker
+            db.rollback()
+            return False
+    db.commit()
+    return True
+
+
+def release_lease(db: Session, name: str, owner: str) -> None:
+    """Give up the lease ``name`` if ``owner`` holds it."""
+    db.execute(
+        delete(SchedulerLease).where(
+            SchedulerLease.name == name, SchedulerLease.owner == owner
+        )
+    )
+    db.commit()
+
+
+class LeasedJob(ABC):
+    """
+    Background loop whose work is done by whichever worker holds its lease.
+
+    Subclasses set ``lease_name`` and implement ``work``.
+    """
+
+    lease_name: str
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        interval: float = 60.0,
+        lease_ttl: float = 180.0,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.lease_ttl = lease_ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+        self.runs = 0
+        self.skipped = 0
+        self.errors = 0
+        self.processed = 0
+        self.last_run_at: Optional[float] = None
+        self.last_run_seconds: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @abstractmethod
+    def work(self, db: Session) -> int:
+        """Do one round of work and return the number of rows processed."""
+
+    def run_once(self) -> int:
+        """
+        Do one round of work if this worker holds the lease.
+
+        Returns:
+            Number of rows processed
+        """
+        with self.session_factory() as db:
+            if not acquire_lease(db, self.lease_name, self.owner, self.lease_ttl):
+                self.skipped += 1
+                return 0
+            started = time.monotonic()
+            processed = self.work(db)
+
+        self.runs += 1
+        self.processed += processed
+        self.last_run_at = time.time()
+        self.last_run_seconds = time.monotonic() - started
+        return processed
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await run_in_threadpool(self.run_once)
+            except Exception:
+                self.errors += 1
+                logger.exception("Background job %s failed", self.lease_name)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start the background loop on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background loop and hand the lease over."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        def release() -> None:
+            with self.session_factory() as db:
+                release_lease(db, self.lease_name, self.owner)
+
+        await run_in_threadpool(release)
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "processed": self.processed,
+            "last_run_at": self.last_run_at,
+            "last_run_seconds": self.last_run_seconds,
+        }
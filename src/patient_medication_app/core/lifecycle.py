@@ -0,0 +1,140 @@
+"""Background completion of medication requests past their end date.
+
+Active requests whose end date has passed are moved to ``completed`` in small
+batches, each its own short transaction, so the active set (and the hot
+``status=active`` list query) only holds requests that are actually running.
+The scheduler runs in every worker process but only the holder of the
+``lifecycle`` lease does any work. Each batch bumps the result cache's shared
+generation, which invalidates the cached lists of every worker, not only the
+lease holder's. When sharding is on, the requests of every shard are expired
+too, one shard after the other.
+"""
+
+from datetime import date
+from typing import Any, Callable, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.audit import record_changes
+from patient_medication_app.core.cache import result_cache
+from patient_medication_app.core.leases import LeasedJob
+from patient_medication_app.core.models import MedicationRequest
+from patient_medication_app.core.read_model import record_refreshed
+from patient_medication_app.database.sharding import ShardSet
+
+
+def _expired_conditions(today: date) -> list:
+    return [MedicationRequest.status == "active", MedicationRequest.end_date < today]
+
+
+def expire_requests(
+    db: Session,
+    batch_size: int = 500,
+    max_batches: Optional[int] = None,
+    today: Optional[date] = None,
+    cache_db: Optional[Session] = None,
+) -> int:
+    """
+    Complete active medication requests whose end date is before today.
+
+    Args:
+        db: Database session
+        batch_size: Number of rows updated per transaction
+        max_batches: Optional limit on the number of batches to run
+        today: The current date, defaults to today
+        cache_db: Session on the database holding the result cache generation,
+            the primary database when ``db`` is a shard. Defaults to ``db``.
+
+    Returns:
+        Number of medication requests completed
+    """
+    today = today or date.today()
+    completed = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = (
+            db.execute(
+                select(MedicationRequest.id)
+                .where(*_expired_conditions(today))
+                .order_by(MedicationRequest.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            .scalars()
+            .all()
+        )
+        if not ids:
+            break
+
+        db.execute(
+            update(MedicationRequest)
+            .where(MedicationRequest.id.in_(ids))
+            .values(status="completed", version=MedicationRequest.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        record_refreshed(db, ids)
+        record_changes(db, ids, "expire", "system:lifecycle")
+        db.commit()
+        result_cache.bump(cache_db or db)
+
+        completed += len(ids)
+        batches += 1
+    return completed
+
+
+def expiry_lag_days(db: Session, today: Optional[date] = None) -> int:
+    """Days since the end date of the oldest expired request still active."""
+    today = today or date.today()
+    oldest = db.scalar(
+        select(func.min(MedicationRequest.end_date)).where(*_expired_conditions(today))
+    )
+    return 0 if oldest is None else (today - oldest).days
+
+
+class LifecycleScheduler(LeasedJob):
+    """Periodically completes expired requests while holding the lease.
+
+    The requests of the primary database are expired, and with ``shards``
+    those of every shard too.
+    """
+
+    lease_name = "lifecycle"
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        interval: float = 60.0,
+        lease_ttl: float = 180.0,
+        batch_size: int = 500,
+        max_batches: int = 20,
+        shards: Optional[ShardSet] = None,
+    ):
+        super().__init__(session_factory, interval, lease_ttl)
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.shards = shards
+        self.lag_days: Optional[int] = None
+
+    def _expire(self, db: Session, cache_db: Session) -> tuple[int, int]:
+        completed = expire_requests(
+            db,
+            batch_size=self.batch_size,
+            max_batches=self.max_batches,
+            cache_db=cache_db,
+        )
+        return completed, expiry_lag_days(db)
+
+    def work(self, db: Session) -> int:
+        results = [self._expire(db, db)]
+        if self.shards is not None:
+            # Not in parallel: every batch bumps the cache generation through
+            # the primary session
+            for name in self.shards.names:
+                with self.shards.session(name) as shard_db:
+                    results.append(self._expire(shard_db, db))
+        self.lag_days = max(lag_days for _, lag_days in results)
+        return sum(completed for completed, _ in results)
+
+    def metrics(self) -> dict[str, Any]:
+        return {**super().metrics(), "lag_days": self.lag_days}
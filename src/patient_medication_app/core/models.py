@@ -1,7 +1,19 @@
-from datetime import date
+from datetime import date, datetime
 from typing import Literal, Optional
 
-from sqlalchemy import Date, Enum, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    JSON,
+    Date,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    func,
+    text,
+)
 from sqlalchemy.orm import Mapped, mapped_column
 
 from patient_medication_app.database import Base
@@ -55,12 +67,9 @@ class Medication(Base):
     )
 
 
-class MedicationRequest(Base):
-    """Medication request model for the patient medication system."""
-
-    __tablename__ = "medication_request"
+class MedicationRequestColumns:
+    """Columns shared by the live and archived medication request tables."""
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     patient_reference: Mapped[int] = mapped_column(
         Integer, ForeignKey("patient.id"), nullable=False
     )
@@ -87,3 +96,193 @@ class MedicationRequest(Base):
         ),
         nullable=False,
     )
+    # Incremented on every update, used for optimistic concurrency control
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default="1"
+    )
+
+
+def list_filter_indexes(table: str) -> tuple[Index, ...]:
+    """
+    Indexes backing the list filters of a medication request table.
+
+    Each filter column leads one index. The trailing prescribed_date lets an
+    equality filter also read its rows newest prescription first, the order
+    of the list, without sorting them.
+    """
+    return (
+        Index(f"ix_{table}_status_prescribed_date", "status", "prescribed_date"),
+        Index(
+            f"ix_{table}_patient_prescribed_date",
+            "patient_reference",
+            "prescribed_date",
+        ),
+        Index(
+            f"ix_{table}_clinician_prescribed_date",
+            "clinician_reference",
+            "prescribed_date",
+        ),
+        Index(
+            f"ix_{table}_medication_prescribed_date",
+            "medication_reference",
+            "prescribed_date",
+        ),
+        Index(f"ix_{table}_prescribed_date", "prescribed_date"),
+        Index(f"ix_{table}_start_date", "start_date"),
+        Index(f"ix_{table}_end_date", "end_date"),
+    )
+
+
+class MedicationRequest(MedicationRequestColumns, Base):
+    """Medication request model for the patient medication system."""
+
+    __tablename__ = "medication_request"
+    __table_args__ = (
+        # Backs the duplicate therapy check on active requests
+        Index(
+            "ix_medication_request_active_overlap",
+            "patient_reference",
+            "medication_reference",
+            "start_date",
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'"),
+        ),
+        # Finds active requests past their end date for the lifecycle job
+        Index(
+            "ix_medication_request_active_end_date",
+            "end_date",
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'"),
+        ),
+        *list_filter_indexes("medication_request"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+
+
+class MedicationRequestArchive(MedicationRequestColumns, Base):
+    """Closed medication requests moved out of the live table by the archive job."""
+
+    __tablename__ = "medication_request_archive"
+    # The archive is searched with the same filters when include_archived is set
+    __table_args__ = list_filter_indexes("medication_request_archive")
+
+    # Keeps the id the request had in the live table
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, server_default=func.now()
+    )
+
+
+class MedicationRequestListing(MedicationRequestColumns, Base):
+    """Denormalized read model of live medication requests.
+
+    Carries the medication and clinician names alongside the request so list
+    reads need no joins. Maintained by ``core.read_model``.
+    """
+
+    __tablename__ = "medication_request_listing"
+    __table_args__ = list_filter_indexes("medication_request_listing")
+
+    # Same id as the request in the live table
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    medication_code_name: Mapped[str] = mapped_column(String(100), nullable=False)
+    clinician_first_name: Mapped[str] = mapped_column(String(50), nullable=False)
+    clinician_last_name: Mapped[str] = mapped_column(String(50), nullable=False)
+
+
+class SchedulerLease(Base):
+    """Lease row electing the one worker that runs a background job."""
+
+    __tablename__ = "scheduler_lease"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    owner: Mapped[str] = mapped_column(String(100), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class CacheGeneration(Base):
+    """Generation of a result cache, shared by every process that writes.
+
+    Maintained by ``core.cache``.
+    """
+
+    __tablename__ = "cache_generation"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    generation: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class MedicationRequestDirectory(Base):
+    """Id and patient of every medication request created while sharded.
+
+    Kept on the primary database: ids are allocated here so they are unique
+    across the shards, and looked up to route a request by id to the shard of
+    its patient. Maintained by ``database.sharding``.
+    """
+
+    __tablename__ = "medication_request_directory"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    patient_reference: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class MedicationRequestAuditOutbox(Base):
+    """Medication request changes waiting to be moved to the audit log.
+
+    Written in the same transaction as the change itself and drained by
+    ``core.audit``.
+    """
+
+    __tablename__ = "medication_request_audit_outbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    medication_request_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    action: Mapped[str] = mapped_column(String(20), nullable=False)
+    actor: Mapped[str] = mapped_column(String(100), nullable=False)
+    changed_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    # The request as it was after the change
+    snapshot: Mapped[dict] = mapped_column(JSON, nullable=False)
+
+
+class MedicationRequestAudit(Base):
+    """Append-only audit log of medication request changes.
+
+    Partitioned by month of the change on PostgreSQL.
+    """
+
+    __tablename__ = "medication_request_audit"
+    __table_args__ = (
+        Index(
+            "ix_medication_request_audit_request_version",
+            "medication_request_id",
+            "version",
+        ),
+        {"postgresql_partition_by": "RANGE (changed_at)"},
+    )
+
+    # Keeps the id of the outbox entry
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    changed_at: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    medication_request_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    action: Mapped[str] = mapped_column(String(20), nullable=False)
+    actor: Mapped[str] = mapped_column(String(100), nullable=False)
+    # Changed fields as {"field": {"before": ..., "after": ...}}; before is
+    # null for creates and for requests changed before auditing began
+    changes: Mapped[dict] = mapped_column(JSON, nullable=False)
+    snapshot: Mapped[dict] = mapped_column(JSON, nullable=False)
+
+
+class MigrationCheckpoint(Base):
+    """Progress of a resumable backfill run by a migration.
+
+    Maintained by ``database.online_migrations.Backfill``.
+    """
+
+    __tablename__ = "migration_checkpoint"
+
+    name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    # Primary key of the last row of the last batch done
+    last_key: Mapped[int] = mapped_column(Integer, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
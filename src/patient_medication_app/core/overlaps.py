@@ -0,0 +1,108 @@
+"""Detection of duplicate therapy: overlapping active requests.
+
+Two active requests for the same patient and medication overlap when their
+``start_date``..``end_date`` intervals intersect (a missing end date means the
+request is open-ended). Both the check on create and the audit use the partial
+index ``ix_medication_request_active_overlap`` on (patient_reference,
+medication_reference, start_date) for active requests, so the create check
+is one index probe.
+
+Nothing in the schema prevents overlaps, so a check that rejects them first
+locks the patient with ``lock_patient``: concurrent creates for one patient
+then run their checks one after the other.
+"""
+
+from datetime import date
+from typing import NamedTuple, Optional
+
+from sqlalchemy import ColumnElement, or_, select
+from sqlalchemy.orm import Session, aliased
+
+from patient_medication_app.core.models import MedicationRequest, Patient
+
+
+class Overlap(NamedTuple):
+    """A pair of overlapping active requests found by the audit."""
+
+    patient_reference: int
+    medication_reference: str
+    first_id: int
+    second_id: int
+
+
+def _overlap_conditions(
+    start_date: date, end_date: Optional[date]
+) -> list[ColumnElement[bool]]:
+    """Conditions for a request's interval intersecting start_date..end_date."""
+    conditions = [
+        or_(
+            MedicationRequest.end_date.is_(None),
+            MedicationRequest.end_date >= start_date,
+        )
+    ]
+    if end_date is not None:
+        conditions.append(MedicationRequest.start_date <= end_date)
+    return conditions
+
+
+def lock_patient(db: Session, patient_reference: int) -> None:
+    """
+    Lock the patient row until the transaction ends, with SELECT ... FOR UPDATE.
+
+    A concurrent transaction locking the same patient waits for this one to
+    commit, and its overlap check then sees the request created here. On
+    SQLite the statement takes the database write lock instead.
+    """
+    db.execute(
+        select(Patient.id).where(Patient.id == patient_reference).with_for_update()
+    )
+
+
+def find_overlapping_requests(
+    db: Session,
+    patient_reference: int,
+    medication_reference: str,
+    start_date: date,
+    end_date: Optional[date],
+) -> list[int]:
+    """Return the ids of active requests overlapping the given interval."""
+    return list(
+        db.execute(
+            select(MedicationRequest.id)
+            .where(
+                MedicationRequest.patient_reference == patient_reference,
+                MedicationRequest.medication_reference == medication_reference,
+                MedicationRequest.status == "active",
+                *_overlap_conditions(start_date, end_date),
+            )
+            .order_by(MedicationRequest.id)
+        ).scalars()
+    )
+
+
+def audit_overlapping_requests(db: Session) -> list[Overlap]:
+    """Find every pair of overlapping active requests already stored."""
+    first = aliased(MedicationRequest)
+    second = aliased(MedicationRequest)
+    statement = (
+        select(
+            first.patient_reference,
+            first.medication_reference,
+            first.id,
+            second.id,
+        )
+        .join(
+            second,
+            (second.patient_reference == first.patient_reference)
+            & (second.medication_reference == first.medication_reference)
+            & (second.status == "active")
+            & (second.id > first.id),
+        )
+        .where(
+            first.status == "active",
+            or_(second.end_date.is_(None), second.end_date >= first.start_date),
+            or_(first.end_date.is_(None), second.start_date <= first.end_date),
+        )
+        .order_by(first.patient_reference, first.id, second.id)
+    )
+    return [Overlap(*row) for row in db.execute(statement)]
@@ -0,0 +1,132 @@
+"""Query building blocks shared by the API routers and batch jobs."""
+
+from datetime import date
+from typing import NamedTuple, Optional
+
+from sqlalchemy import ColumnElement, Select, func, select
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.models import MedicationRequestColumns
+
+
+class MedicationRequestFilters(NamedTuple):
+    """Filters of the medication request list; unset filters match everything."""
+
+    statuses: tuple[str, ...] = ()
+    prescribed_from: Optional[date] = None
+    prescribed_to: Optional[date] = None
+    patient_reference: Optional[int] = None
+    clinician_reference: Optional[str] = None
+    medication_reference: Optional[str] = None
+    start_from: Optional[date] = None
+    start_to: Optional[date] = None
+    end_from: Optional[date] = None
+    end_to: Optional[date] = None
+
+
+def medication_request_filters(
+    model: type[MedicationRequestColumns],
+    filters: MedicationRequestFilters,
+) -> list[ColumnElement[bool]]:
+    """
+    Build the WHERE conditions for the medication request list filters.
+
+    Every filter is backed by an index on the live, archive and listing
+    tables, see ``list_filter_indexes``.
+
+    Args:
+        model: The live, archive or listing medication request model
+        filters: The filters to apply
+
+    Returns:
+        List of conditions to AND together
+    """
+    conditions: list[ColumnElement[bool]] = []
+
+    if filters.statuses:
+        conditions.append(model.status.in_(filters.statuses))
+
+    if filters.prescribed_from:
+        conditions.append(model.prescribed_date >= filters.prescribed_from)
+
+    if filters.prescribed_to:
+        conditions.append(model.prescribed_date <= filters.prescribed_to)
+
+    if filters.patient_reference is not None:
+        conditions.append(model.patient_reference == filters.patient_reference)
+
+    if filters.clinician_reference is not None:
+        conditions.append(model.clinician_reference == filters.clinician_reference)
+
+    if filters.medication_reference is not None:
+        conditions.append(model.medication_reference == filters.medication_reference)
+
+    if filters.start_from:
+        conditions.append(model.start_date >= filters.start_from)
+
+    if filters.start_to:
+        conditions.append(model.start_date <= filters.start_to)
+
+    if filters.end_from:
+        conditions.append(model.end_date >= filters.end_from)
+
+    if filters.end_to:
+        conditions.append(model.end_date <= filters.end_to)
+
+    return conditions
+
+
+def planner_row_estimate(db: Session, statement: Select) -> Optional[int]:
+    """
+    The number of rows the query planner expects ``statement`` to return.
+
+    Only PostgreSQL exposes its estimate, which comes from the table
+    statistics kept by ANALYZE and costs no scan. Returns None elsewhere.
+    """
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return None
+    # Expanding IN parameters are otherwise left as placeholders that only
+    # statement execution fills in
+    compiled = statement.compile(
+        dialect=bind.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    plan = (
+        db.connection()
+        .exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params)
+        .scalar()
+    )
+    if plan is None:
+        return None
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_medication_requests(
+    db: Session,
+    model: type[MedicationRequestColumns],
+    filters: MedicationRequestFilters,
+    estimate_above: Optional[int] = None,
+) -> tuple[int, bool]:
+    """
+    Count the medication requests matching ``filters``.
+
+    Args:
+        db: Database session
+        model: The live, archive or listing medication request model
+        filters: The filters to apply
+        estimate_above: When given, return the planner's estimate instead of
+            counting if it expects at least this many rows. Small results
+            are still counted exactly, as a full count of them is cheap.
+
+    Returns:
+        The count, and whether it is an estimate
+    """
+    conditions = medication_request_filters(model, filters)
+    if estimate_above is not None:
+        estimate = planner_row_estimate(db, select(model).where(*conditions))
+        if estimate is not None and estimate >= estimate_above:
+            return estimate, True
+    count = db.execute(
+        select(func.count()).select_from(model).where(*conditions)
+    ).scalar_one()
+    return count, False
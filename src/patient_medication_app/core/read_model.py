@@ -0,0 +1,257 @@
+"""Maintenance of the denormalized medication request listing table.
+
+``medication_request_listing`` mirrors the live ``medication_request`` table
+with the medication and clinician names copied in, so list reads need no joins.
+When ``settings.read_model_enabled`` is on, every write path keeps it in step
+inside the writing transaction:
+
+* creates and updates copy the row returned by their INSERT/UPDATE ... RETURNING
+* bulk status changes re-copy the changed ids
+* bulk imports copy the rows above the id watermark taken before the import
+* archiving deletes the archived ids
+* renames of medications and clinicians made through the ORM are propagated
+  when the session flushes
+
+Changes made outside these paths (e.g. raw SQL) can be found with
+``check_read_model`` and repaired with ``rebuild_read_model``.
+"""
+
+from typing import Any, Iterable, Mapping, Optional
+
+from sqlalchemy import (
+    Select,
+    delete,
+    event,
+    exists,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.models import (
+    Clinician,
+    Medication,
+    MedicationRequest,
+    MedicationRequestColumns,
+    MedicationRequestListing,
+)
+from patient_medication_app.settings import settings
+
+REQUEST_COLUMNS = ["id", *MedicationRequestColumns.__annotations__]
+NAME_COLUMNS = ["medication_code_name", "clinician_first_name", "clinician_last_name"]
+LISTING_COLUMNS = [*REQUEST_COLUMNS, *NAME_COLUMNS]
+
+
+def _source_select() -> Select:
+    """Select the listing columns from the normalized tables."""
+    return (
+        select(
+            *(getattr(MedicationRequest, name) for name in REQUEST_COLUMNS),
+            Medication.code_name.label("medication_code_name"),
+            Clinician.first_name.label("clinician_first_name"),
+            Clinician.last_name.label("clinician_last_name"),
+        )
+        .join(Medication, MedicationRequest.medication_reference == Medication.code)
+        .join(
+            Clinician,
+            MedicationRequest.clinician_reference == Clinician.registration_id,
+        )
+    )
+
+
+def _listing_values(row: Mapping[Any, Any]) -> dict[str, Any]:
+    return {name: row[name] for name in LISTING_COLUMNS}
+
+
+def record_created(db: Session, row: Mapping[Any, Any]) -> None:
+    """Add a created request, as returned with its names, to the listing."""
+    if settings.read_model_enabled:
+        db.execute(insert(MedicationRequestListing).values(**_listing_values(row)))
+
+
+def record_updated(db: Session, row: Mapping[Any, Any]) -> None:
+    """Copy an updated request, as returned with its names, to the listing."""
+    if settings.read_model_enabled:
+        values = _listing_values(row)
+        db.execute(
+            update(MedicationRequestListing)
+            .where(MedicationRequestListing.id == values.pop("id"))
+            .values(**values)
+        )
+
+
+def record_removed(db: Session, ids: Iterable[int]) -> None:
+    """Remove requests that left the live table from the listing."""
+    if settings.read_model_enabled:
+        db.execute(
+            delete(MedicationRequestListing).where(
+                MedicationRequestListing.id.in_(list(ids))
+            )
+        )
+
+
+def record_refreshed(db: Session, ids: Iterable[int]) -> None:
+    """Re-copy requests changed by a bulk UPDATE into the listing."""
+    if settings.read_model_enabled:
+        ids = list(ids)
+        db.execute(
+            delete(MedicationRequestListing).where(MedicationRequestListing.id.in_(ids))
+        )
+        db.execute(
+            insert(MedicationRequestListing).from_select(
+                LISTING_COLUMNS, _source_select().where(MedicationRequest.id.in_(ids))
+            )
+        )
+
+
+def id_watermark(db: Session) -> int:
+    """Return the highest live request id, to pass to ``record_inserted_after``."""
+    return db.execute(
+        select(func.coalesce(func.max(MedicationRequest.id), 0))
+    ).scalar_one()
+
+
+def record_inserted_after(db: Session, watermark: int) -> None:
+    """Copy requests inserted above ``watermark`` that are not yet listed."""
+    if settings.read_model_enabled:
+        db.execute(
+            insert(MedicationRequestListing).from_select(
+                LISTING_COLUMNS,
+                _source_select().where(
+                    MedicationRequest.id > watermark,
+                    ~exists().where(
+                        MedicationRequestListing.id == MedicationRequest.id
+                    ),
+                ),
+            )
+        )
+
+
+def _changed_value(instance: Any, attribute: str) -> Optional[Any]:
+    history = inspect(instance).attrs[attribute].history
+    return history.added[0] if history.has_changes() and history.added else None
+
+
+@event.listens_for(Session, "after_flush")
+def _propagate_renames(session: Session, flush_context) -> None:
+    """Copy medication and clinician name changes into the listing."""
+    if not settings.read_model_enabled:
+        return
+    connection = session.connection()
+    for instance in session.dirty:
+        if isinstance(instance, Medication):
+            code_name = _changed_value(instance, "code_name")
+            if code_name is not None:
+                connection.execute(
+                    update(MedicationRequestListing)
+                    .where(
+                        MedicationRequestListing.medication_reference == instance.code
+                    )
+                    .values(medication_code_name=code_name)
+                )
+        elif isinstance(instance, Clinician):
+            names = {
+                listing_column: value
+                for listing_column, attribute in (
+                    ("clinician_first_name", "first_name"),
+                    ("clinician_last_name", "last_name"),
+                )
+                if (value := _changed_value(instance, attribute)) is not None
+            }
+            if names:
+                connection.execute(
+                    update(MedicationRequestListing)
+                    .where(
+                        MedicationRequestListing.clinician_reference
+                        == instance.registration_id
+                    )
+                    .values(**names)
+                )
+
+
+def check_read_model(db: Session) -> dict[str, int]:
+    """
+    Compare the listing with the normalized tables.
+
+    Returns:
+        Counts of live requests missing from the listing, listed requests no
+        longer in the live table, and listed requests whose values differ
+    """
+    source = _source_select().subquery()
+    listing = MedicationRequestListing
+
+    missing = db.execute(
+        select(func.count())
+        .select_from(source)
+        .where(~exists().where(listing.id == source.c.id))
+    ).scalar_one()
+    orphaned = db.execute(
+        select(func.count())
+        .select_from(listing)
+        .where(~exists().where(MedicationRequest.id == listing.id))
+    ).scalar_one()
+    stale = db.execute(
+        select(func.count())
+        .select_from(listing)
+        .join(source, source.c.id == listing.id)
+        .where(
+            or_(
+                *(
+                    getattr(listing, name).is_distinct_from(source.c[name])
+                    for name in LISTING_COLUMNS
+                    if name != "id"
+                )
+            )
+        )
+    ).scalar_one()
+    return {"missing": missing, "orphaned": orphaned, "stale": stale}
+
+
+def rebuild_read_model(db: Session, batch_size: int = 10_000) -> int:
+    """
+    Rebuild the listing from the normalized tables.
+
+    Each batch of ids is deleted and re-copied in its own transaction.
+
+    Returns:
+        Number of listing rows written
+    """
+    db.execute(
+        delete(MedicationRequestListing).where(
+            ~exists().where(MedicationRequest.id == MedicationRequestListing.id)
+        )
+    )
+    db.commit()
+
+    written = 0
+    last_id = 0
+    while True:
+        ids = (
+            db.execute(
+                select(MedicationRequest.id)
+                .where(MedicationRequest.id > last_id)
+                .order_by(MedicationRequest.id)
+                .limit(batch_size)
+            )
+            .scalars()
+            .all()
+        )
+        if not ids:
+            break
+        db.execute(
+            delete(MedicationRequestListing).where(MedicationRequestListing.id.in_(ids))
+        )
+        db.execute(
+            insert(MedicationRequestListing).from_select(
+                LISTING_COLUMNS,
+                _source_select().where(MedicationRequest.id.in_(ids)),
+            )
+        )
+        db.commit()
+        written += len(ids)
+        last_id = ids[-1]
+    return written
@@ -0,0 +1,368 @@
+"""In-memory type-ahead index over the medication catalogue.
+
+Suggestions are served from process memory so keystroke traffic never reaches
+the database. Two structures are kept per medication:
+
+* sorted lists of terms (codes, full names and the later words of names)
+  searched with ``bisect`` for prefix matches, and
+* a vocabulary of the distinct words in names, with an inverted index of
+  their trigrams, for fuzzy matches: each query word is matched to the
+  vocabulary words whose trigram similarity (as in pg_trgm) reaches
+  ``MIN_SIMILARITY``, so typos still find the medication. As a query word is
+  usually still being typed, it is also compared by edit distance with the
+  prefix of the same length of longer words starting with the same two
+  letters. Numbers only match exactly, and a fuzzy match has to match every
+  query word.
+
+The index is loaded on startup and then kept current by session events:
+medications inserted, renamed or deleted through the ORM in this process are
+applied when their transaction commits. Changes made with raw SQL or by other
+processes (migrations, seed scripts, ``shards sync-reference``) are picked up
+by reloading the index once it is older than ``max_age`` seconds.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Any, Iterable, NamedTuple, Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.models import Medication
+from patient_medication_app.metrics import register_metrics
+from patient_medication_app.settings import settings
+
+# Scores of the match kinds; fuzzy matches score below every prefix match
+EXACT_CODE = 1.0
+CODE_PREFIX = 0.9
+NAME_PREFIX = 0.8
+WORD_PREFIX = 0.7
+FUZZY_WEIGHT = 0.6
+
+# Minimum trigram similarity of a query word and a vocabulary word
+MIN_SIMILARITY = 0.3
+
+# Query words of this length or longer are also compared with the prefixes of
+# longer words, with up to one edit per four characters
+MIN_PREFIX_LENGTH = 4
+MIN_PREFIX_SIMILARITY = 0.75
+
+# Fuzzy candidates scored per query; more only happens for typos of words
+# shared by a large part of the catalogue
+MAX_FUZZY_CANDIDATES = 200
+
+# Match kinds with a prefix term list, best first
+PREFIX_KINDS = (CODE_PREFIX, NAME_PREFIX, WORD_PREFIX)
+
+_CHANGES_KEY = "medication_index_changes"
+
+
+class Suggestion(NamedTuple):
+    code: str
+    code_name: str
+    score: float
+
+
+def normalize(text: str) -> str:
+    """Lower-case ``text`` and reduce it to words separated by single spaces."""
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def trigrams(word: str) -> set[str]:
+    """Trigrams of a normalized word, padded like pg_trgm."""
+    padded = f"  {word} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _fuzzy(word: str) -> bool:
+    """Whether ``word`` is matched fuzzily, rather than only exactly."""
+    return not word.isdigit()
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Edits (insertions, deletions, substitutions, transpositions) from a to b."""
+    # Optimal string alignment, keeping the last two rows of the table
+    two_back: list[int] = []
+    before = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            row[j] = min(
+                before[j] + 1,
+                row[j - 1] + 1,
+                before[j - 1] + (a[i - 1] != b[j - 1]),
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], two_back[j - 2] + 1)
+        two_back, before = before, row
+    return before[-1]
+
+
+def prefix_similarity(word: str, candidate: str) -> float:
+    """Similarity of ``word`` and the prefix of ``candidate`` of the same length."""
+    if len(word) < MIN_PREFIX_LENGTH or len(candidate) <= len(word):
+        return 0.0
+    similarity = 1 - edit_distance(word, candidate[: len(word)]) / len(word)
+    return similarity if similarity >= MIN_PREFIX_SIMILARITY else 0.0
+
+
+class MedicationIndex:
+    """Prefix and trigram index of medication codes and names."""
+
+    def __init__(self, max_age: Optional[float] = None) -> None:
+        self._lock = threading.Lock()
+        self.max_age = max_age
+        self.loaded = False
+        self._loaded_at = 0.0
+        self.queries = 0
+        self._clear()
+
+    def _clear(self) -> None:
+        self._names: dict[str, str] = {}
+        self._codes: dict[str, str] = {}
+        # Vocabulary word -> codes using it, and trigram -> vocabulary words
+        self._words: dict[str, set[str]] = {}
+        self._word_trigrams: dict[str, set[str]] = {}
+        self._postings: dict[str, set[str]] = {}
+        # (term, code) per match kind, sorted for prefix search
+        self._terms: dict[float, list[tuple[str, str]]] = {
+            kind: [] for kind in PREFIX_KINDS
+        }
+
+    def _terms_of(self, code: str, code_name: str) -> list[tuple[float, str]]:
+        name = normalize(code_name)
+        terms = [(CODE_PREFIX, normalize(code)), (NAME_PREFIX, name)]
+        terms.extend((WORD_PREFIX, word) for word in name.split()[1:])
+        return terms
+
+    def _add(self, code: str, code_name: str) -> None:
+        self._names[code] = code_name
+        self._codes[normalize(code)] = code
+        for kind, term in self._terms_of(code, code_name):
+            insort(self._terms[kind], (term, code))
+        for word in set(normalize(code_name).split()):
+            if word not in self._words:
+                self._words[word] = set()
+                self._word_trigrams[word] = trigrams(word) if _fuzzy(word) else set()
+                for gram in self._word_trigrams[word]:
+                    self._postings.setdefault(gram, set()).add(word)
+            self._words[word].add(code)
+
+    def _remove(self, code: str) -> None:
+        code_name = self._names.pop(code, None)
+        if code_name is None:
+            return
+        self._codes.pop(normalize(code), None)
+        for kind, term in self._terms_of(code, code_name):
+            terms = self._terms[kind]
+            index = bisect_left(terms, (term, code))
+            if index < len(terms) and terms[index] == (term, code):
+                del terms[index]
+        for word in set(normalize(code_name).split()):
+            codes = self._words[word]
+            codes.discard(code)
+            if codes:
+                continue
+            del self._words[word]
+            for gram in self._word_trigrams.pop(word):
+                postings = self._postings[gram]
+                postings.discard(word)
+                if not postings:
+                    del self._postings[gram]
+
+    def load(self, db: Session) -> None:
+        """Rebuild the index from the medication table."""
+        self._loaded_at = time.monotonic()
+        rows = db.execute(select(Medication.code, Medication.code_name)).all()
+        with self._lock:
+            self._clear()
+            for code, code_name in rows:
+                self._add(code, code_name)
+            self.loaded = True
+
+    def stale(self) -> bool:
+        """Whether the index is not loaded, or older than ``max_age``."""
+        return not self.loaded or (
+            self.max_age is not None
+            and time.monotonic() - self._loaded_at > self.max_age
+        )
+
+    def ensure_loaded(self, db: Session) -> None:
+        """Load the index unless it already is, and reload it once stale."""
+        if self.stale():
+            self.load(db)
+
+    def apply(self, changes: dict[str, Optional[str]]) -> None:
+        """Apply committed changes: a new name per code, or None when deleted."""
+        with self._lock:
+            for code, code_name in changes.items():
+                self._remove(code)
+                if code_name is not None:
+                    self._add(code, code_name)
+
+    def clear(self) -> None:
+        """Empty the index; it is reloaded on the next ``ensure_loaded``."""
+        with self._lock:
+            self._clear()
+            self.loaded = False
+
+    def suggest(self, query: str, limit: int = 10) -> list[Suggestion]:
+        """
+        Rank the medications matching ``query``.
+
+        Args:
+            query: What the user typed so far
+            limit: Maximum number of suggestions
+
+        Returns:
+            Suggestions, best first: exact code, code prefix, name prefix,
+            prefix of a later word in the name, then fuzzy matches. Prefix
+            matches of the same kind are in alphabetical order.
+        """
+        text = normalize(query)
+        if not text:
+            return []
+
+        with self._lock:
+            self.queries += 1
+            scores: dict[str, float] = {}
+            exact = self._codes.get(text)
+            if exact is not None:
+                scores[exact] = EXACT_CODE
+
+            for kind in PREFIX_KINDS:
+                terms = self._terms[kind]
+                index = bisect_left(terms, (text,))
+                while len(scores) < limit and index < len(terms):
+                    term, code = terms[index]
+                    if not term.startswith(text):
+                        break
+                    scores.setdefault(code, kind)
+                    index += 1
+
+            if len(scores) < limit:
+                for code, similarity in self._fuzzy_matches(text):
+                    scores.setdefault(code, FUZZY_WEIGHT * similarity)
+
+            ranked = sorted(scores.items(), key=lambda item: -item[1])
+            return [
+                Suggestion(code, self._names[code], round(score, 3))
+                for code, score in ranked[:limit]
+            ]
+
+    def _similar_words(self, word: str) -> dict[str, float]:
+        """Vocabulary words similar to ``word``, with their similarity."""
+        if not _fuzzy(word):
+            return {word: 1.0} if word in self._words else {}
+        grams = trigrams(word)
+        shared: dict[str, int] = {}
+        for gram in grams:
+            for candidate in self._postings.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        similar = {}
+        for candidate, count in shared.items():
+            similarity = count / (
+                len(grams) + len(self._word_trigrams[candidate]) - count
+            )
+            if similarity >= MIN_SIMILARITY:
+                similar[candidate] = similarity
+        if len(word) >= MIN_PREFIX_LENGTH:
+            # Only words starting with the same two letters, found through
+            # their leading trigram, are compared by prefix
+            for candidate in self._postings.get(f" {word[:2]}", ()):
+                similarity = prefix_similarity(word, candidate)
+                if similarity > similar.get(candidate, 0.0):
+                    similar[candidate] = similarity
+        return similar
+
+    def _fuzzy_matches(self, text: str) -> list[tuple[str, float]]:
+        """Codes matching every word of ``text``, scored by mean similarity."""
+        matched = [self._similar_words(word) for word in text.split()]
+        if not all(matched):
+            return []
+
+        # Walk the medications of the query word matching the fewest, most
+        # similar words first, keeping those matching the other query words
+        matched.sort(key=lambda similar: sum(len(self._words[w]) for w in similar))
+        first, rest = matched[0], matched[1:]
+        seen: set[str] = set()
+        candidates = []
+        for word in sorted(first, key=first.__getitem__, reverse=True):
+            for code in self._words[word]:
+                if code in seen:
+                    continue
+                seen.add(code)
+                if all(
+                    any(code in self._words[w] for w in similar) for similar in rest
+                ):
+                    candidates.append(code)
+                    if len(candidates) == MAX_FUZZY_CANDIDATES:
+                        break
+            if len(candidates) == MAX_FUZZY_CANDIDATES:
+                break
+
+        matches = []
+        for code in candidates:
+            best = [
+                max(
+                    similarity
+                    for word, similarity in similar.items()
+                    if code in self._words[word]
+                )
+                for similar in matched
+            ]
+            matches.append((code, sum(best) / len(best)))
+        return sorted(
+            matches, key=lambda match: (-match[1], len(self._names[match[0]]), match[0])
+        )
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "age": time.monotonic() - self._loaded_at if self.loaded else None,
+            "medications": len(self._names),
+            "queries": self.queries,
+        }
+
+
+medication_index = MedicationIndex(settings.medication_index_max_age)
+register_metrics("medication_index", medication_index.metrics)
+
+
+def _pending_changes(session: Session) -> dict[str, Optional[str]]:
+    return session.info.setdefault(_CHANGES_KEY, {})
+
+
+def _collect(instances: Iterable[Any], changes: dict[str, Optional[str]]) -> None:
+    for instance in instances:
+        if not isinstance(instance, Medication):
+            continue
+        # A changed code removes the medication under its old code
+        for old_code in inspect(instance).attrs["code"].history.deleted:
+            changes[old_code] = None
+        changes[instance.code] = instance.code_name
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_medication_changes(session: Session, flush_context) -> None:
+    """Remember medications written in this transaction until it commits."""
+    changes = _pending_changes(session)
+    _collect(session.new, changes)
+    _collect(session.dirty, changes)
+    for instance in session.deleted:
+        if isinstance(instance, Medication):
+            changes[instance.code] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_medication_changes(session: Session) -> None:
+    changes = session.info.pop(_CHANGES_KEY, None)
+    if changes and medication_index.loaded:
+        medication_index.apply(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_medication_changes(session: Session) -> None:
+    session.info.pop(_CHANGES_KEY, None)
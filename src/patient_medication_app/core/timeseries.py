@@ -0,0 +1,128 @@
+"""Daily counts of active medication requests.
+
+A request is counted on every day of its ``start_date``..``end_date`` interval
+(open-ended when it has no end date). Unless other statuses are asked for,
+cancelled requests are left out, as they never took effect. Counts are computed with a sweep over
+interval start and end events: +1 on the first day, -1 on the day after the
+last, then a cumulative sum along the days, all vectorized with NumPy. NumPy is
+an optional dependency, installed with the ``analytics`` extra.
+"""
+
+from datetime import date
+from typing import Iterable, Literal, Optional
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.models import (
+    MedicationRequest,
+    MedicationRequestArchive,
+)
+from patient_medication_app.core.queries import (
+    MedicationRequestFilters,
+    medication_request_filters,
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the installed extras
+    np = None  # type: ignore[assignment]
+
+TimeSeriesGroupBy = Literal["medication_reference", "status"]
+
+# Statuses counted by default: every request that took effect
+ACTIVE_STATUSES = ("active", "completed", "on-hold")
+
+# Longest range served in one call, about ten years of days
+MAX_TIMESERIES_DAYS = 3660
+
+
+class TimeSeriesUnavailableError(RuntimeError):
+    """Raised when NumPy is not installed."""
+
+
+def active_counts(
+    group_keys: list[str],
+    start_dates: list[date],
+    end_dates: list[Optional[date]],
+    range_start: date,
+    range_end: date,
+) -> tuple[list[str], "np.ndarray"]:
+    """
+    Count the intervals covering each day of ``range_start``..``range_end``.
+
+    Args:
+        group_keys: Group of each interval
+        start_dates: First day of each interval
+        end_dates: Last day of each interval, None for open-ended intervals
+        range_start: First day to count
+        range_end: Last day to count
+
+    Returns:
+        The sorted group labels, and a (groups x days) array of counts
+    """
+    if np is None:
+        raise TimeSeriesUnavailableError(
+            "numpy is required for time series, install the 'analytics' extra"
+        )
+    days = (range_end - range_start).days + 1
+    if not group_keys:
+        return [], np.zeros((0, days), dtype=np.int64)
+
+    labels, group_index = np.unique(np.asarray(group_keys), return_inverse=True)
+    origin = np.datetime64(range_start, "D")
+    starts = (np.asarray(start_dates, dtype="datetime64[D]") - origin).astype(np.int64)
+    ends = np.asarray(end_dates, dtype="datetime64[D]")
+    ends = np.where(np.isnat(ends), np.datetime64(range_end, "D"), ends)
+    ends = (ends - origin).astype(np.int64)
+
+    # Clip to the range and drop intervals falling entirely outside it
+    starts = np.clip(starts, 0, None)
+    ends = np.clip(ends, None, days - 1)
+    inside = starts <= ends
+
+    events = np.zeros((len(labels), days + 1), dtype=np.int64)
+    np.add.at(events, (group_index[inside], starts[inside]), 1)
+    np.add.at(events, (group_index[inside], ends[inside] + 1), -1)
+    return labels.tolist(), np.cumsum(events, axis=1)[:, :days]
+
+
+def medication_request_timeseries(
+    db: Session,
+    range_start: date,
+    range_end: date,
+    group_by: TimeSeriesGroupBy,
+    statuses: Iterable[str] = ACTIVE_STATUSES,
+    include_archived: bool = False,
+) -> tuple[list[str], "np.ndarray"]:
+    """
+    Compute daily active counts per group from the medication requests.
+
+    Only the group, start and end columns of requests overlapping the range are
+    read from the database. ``statuses`` matches any of the given statuses, like
+    the list endpoint; empty counts requests of every status.
+    """
+    filters = MedicationRequestFilters(statuses=tuple(statuses))
+    models: list[type[MedicationRequest] | type[MedicationRequestArchive]] = [
+        MedicationRequest
+    ]
+    if include_archived:
+        models.append(MedicationRequestArchive)
+
+    group_keys: list[str] = []
+    start_dates: list[date] = []
+    end_dates: list[Optional[date]] = []
+    for model in models:
+        statement = select(
+            getattr(model, group_by), model.start_date, model.end_date
+        ).where(
+            model.start_date <= range_end,
+            or_(model.end_date.is_(None), model.end_date >= range_start),
+            *medication_request_filters(model, filters),
+        )
+        for group_key, start_date, end_date in db.execute(statement).tuples():
+            group_keys.append(group_key)
+            start_dates.append(start_date)
+            end_dates.append(end_date)
+
+    return active_counts(group_keys, start_dates, end_dates, range_start, range_end)
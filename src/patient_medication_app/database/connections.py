@@ -1,19 +1,48 @@
 """Database connections for patient medication management."""
 
-from typing import Generator
+from typing import Callable, Generator
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session, sessionmaker
 
+from patient_medication_app.database.sqlite import (
+    SQLiteRoutingSession,
+    create_sqlite_engines,
+    enable_sqlite_foreign_keys,
+    is_sqlite_file_url,
+)
 from patient_medication_app.settings import settings
 
 # Create the database engine
 if settings.database_url is None:
     raise ValueError("Database URL must not be None")
-engine = create_engine(settings.database_url, echo=True)
 
-# Create a configured "Session" class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if is_sqlite_file_url(settings.database_url):
+    # Tuned single-node mode: WAL, one queued writer connection, pooled readers
+    engine, read_engine = create_sqlite_engines(
+        settings.database_url,
+        synchronous=settings.sqlite_synchronous,
+        mmap_size=settings.sqlite_mmap_size,
+        cache_size_kib=settings.sqlite_cache_size_kib,
+        busy_timeout_ms=settings.sqlite_busy_timeout_ms,
+        read_pool_size=settings.sqlite_read_pool_size,
+        write_queue_timeout=settings.sqlite_write_queue_timeout,
+        echo=True,
+    )
+    SessionLocal: sessionmaker[Session] = sessionmaker(
+        class_=SQLiteRoutingSession,
+        autocommit=False,
+        autoflush=False,
+        bind=engine,
+        read_bind=read_engine,
+    )
+else:
+    engine = create_engine(settings.database_url, echo=True)
+    if engine.dialect.name == "sqlite":
+        enable_sqlite_foreign_keys(engine)
+
+    # Create a configured "Session" class
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
 def get_session() -> Generator[Session, None, None]:
@@ -23,3 +52,8 @@ def get_session() -> Generator[Session, None, None]:
         yield session
     finally:
         session.close()
+
+
+def get_session_factory() -> Callable[[], Session]:
+    """Dependency to get the session factory, for streams opening their own."""
+    return SessionLocal
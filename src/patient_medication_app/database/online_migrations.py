@@ -0,0 +1,473 @@
+"""Helpers for Alembic migrations of large tables that must stay online.
+
+Plain ``op.create_index``, ``op.add_column(..., nullable=False)`` or an
+UPDATE of every row lock ``medication_request`` for as long as they take to
+scan it. The helpers here split such changes into steps that only take brief
+locks, on PostgreSQL:
+
+* ``create_index_concurrently`` builds an index with CREATE INDEX
+  CONCURRENTLY, outside the migration transaction, and cleans up the invalid
+  index a failed concurrent build leaves behind so the migration can be rerun.
+* ``Backfill`` updates a table in primary key ranges, committing and pausing
+  between batches, and records its progress in ``migration_checkpoint`` so an
+  interrupted backfill resumes where it stopped. ``Backfill.estimate`` times a
+  few batches in a rolled back transaction to predict the full run.
+* ``add_check_constraint_not_valid``, ``add_foreign_key_not_valid`` and
+  ``validate_constraint`` add constraints without checking existing rows,
+  then check them later under a lock that does not block writes.
+  ``set_not_null`` and ``add_not_null_column`` combine these with a backfill.
+
+On other databases the same calls fall back to the plain operations, so one
+migration serves PostgreSQL and the SQLite test and single-node setups.
+
+Use them from a migration's ``upgrade``::
+
+    def upgrade() -> None:
+        create_index_concurrently(
+            'ix_medication_request_reason', 'medication_request', ['reason']
+        )
+"""
+
+import math
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Iterator, NamedTuple, Optional, Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import Connection, text
+
+from patient_medication_app.core.models import MigrationCheckpoint
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _quote(name: str) -> str:
+    return op.get_bind().dialect.identifier_preparer.quote(name)
+
+
+@contextmanager
+def _outside_transaction() -> Iterator[None]:
+    """Commit the migration transaction and run statements in autocommit."""
+    with op.get_context().autocommit_block():
+        yield
+
+
+def create_index_concurrently(
+    name: str,
+    table: str,
+    columns: Sequence[str],
+    unique: bool = False,
+    where: Optional[str] = None,
+) -> None:
+    """
+    Create an index without blocking writes to the table.
+
+    Args:
+        name: Index name
+        table: Table to index
+        columns: Indexed columns
+        unique: Whether the index is unique
+        where: Optional SQL condition of a partial index
+    """
+    condition = None if where is None else text(where)
+    if not _is_postgresql():
+        op.create_index(
+            name,
+            table,
+            list(columns),
+            unique=unique,
+            if_not_exists=True,
+            sqlite_where=condition,
+        )
+        return
+
+    with _outside_transaction():
+        # A failed concurrent build leaves an invalid index that would make
+        # IF NOT EXISTS skip the rebuild
+        invalid = op.get_bind().scalar(
+            text(
+                "SELECT NOT indisvalid FROM pg_index "
+                "WHERE indexrelid = to_regclass(:name)"
+            ),
+            {"name": name},
+        )
+        if invalid:
+            drop_index_concurrently(name, table)
+        op.create_index(
+            name,
+            table,
+            list(columns),
+            unique=unique,
+            if_not_exists=True,
+            postgresql_concurrently=True,
+            postgresql_where=condition,
+        )
+
+
+def drop_index_concurrently(name: str, table: str) -> None:
+    """Drop an index without blocking reads and writes of the table."""
+    if not _is_postgresql():
+        op.drop_index(name, table_name=table, if_exists=True)
+        return
+    with _outside_transaction():
+        op.drop_index(
+            name, table_name=table, if_exists=True, postgresql_concurrently=True
+        )
+
+
+def add_check_constraint_not_valid(name: str, table: str, condition: str) -> None:
+    """
+    Add a CHECK constraint enforced for new writes only.
+
+    Existing rows are checked by ``validate_constraint``. Elsewhere than on
+    PostgreSQL the constraint is added and checked at once.
+    """
+    if not _is_postgresql():
+        with op.batch_alter_table(table) as batch:
+            batch.create_check_constraint(name, condition)
+        return
+    op.execute(
+        f"ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(name)} "
+        f"CHECK ({condition}) NOT VALID"
+    )
+
+
+def add_foreign_key_not_valid(
+    name: str,
+    table: str,
+    referent_table: str,
+    local_columns: Sequence[str],
+    remote_columns: Sequence[str],
+) -> None:
+    """
+    Add a foreign key enforced for new writes only.
+
+    Existing rows are checked by ``validate_constraint``. Elsewhere than on
+    PostgreSQL the foreign key is added and checked at once.
+    """
+    if not _is_postgresql():
+        with op.batch_alter_table(table) as batch:
+            batch.create_foreign_key(
+                name, referent_table, list(local_columns), list(remote_columns)
+            )
+        return
+    op.execute(
+        f"ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(name)} "
+        f"FOREIGN KEY ({', '.join(map(_quote, local_columns))}) "
+        f"REFERENCES {_quote(referent_table)} "
+        f"({', '.join(map(_quote, remote_columns))}) NOT VALID"
+    )
+
+
+def validate_constraint(name: str, table: str) -> None:
+    """
+    Check the existing rows against a constraint added NOT VALID.
+
+    On PostgreSQL this scans the table under a SHARE UPDATE EXCLUSIVE lock,
+    which lets reads and writes go on, in its own transaction.
+    """
+    if not _is_postgresql():
+        return
+    with _outside_transaction():
+        op.execute(f"ALTER TABLE {_quote(table)} VALIDATE CONSTRAINT {_quote(name)}")
+
+
+def set_not_null(table: str, column: str) -> None:
+    """
+    Make a column NOT NULL without a long exclusive lock.
+
+    On PostgreSQL a NOT VALID ``IS NOT NULL`` check is added and validated
+    first; SET NOT NULL then uses it instead of scanning the table, and the
+    check is dropped. Fails if the column still holds nulls.
+    """
+    if not _is_postgresql():
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column(column, nullable=False)
+        return
+    check = f"ck_{table}_{column}_not_null"
+    add_check_constraint_not_valid(check, table, f"{_quote(column)} IS NOT NULL")
+    validate_constraint(check, table)
+    op.alter_column(table, column, nullable=False)
+    op.drop_constraint(check, table, type_="check")
+
+
+class BackfillEstimate(NamedTuple):
+    """Predicted duration of a backfill, from a sample of its batches."""
+
+    # Rows in the key ranges left to do, whether or not they need updating
+    rows: int
+    batches: int
+    sampled_batches: int
+    seconds_per_batch: float
+    estimated_seconds: float
+
+
+class Backfill:
+    """
+    An UPDATE of every row of a table, run in primary key ranges.
+
+    Each batch updates the rows with a key in the next ``batch_size`` keys
+    and commits, then the backfill pauses for ``pause`` seconds so replicas
+    and other writers keep up. The last key done is stored under ``name`` in
+    ``migration_checkpoint`` with each batch, and a rerun starts after it. A
+    batch interrupted before its checkpoint is written is repeated, so
+    ``assignments`` must be idempotent; ``where`` can skip rows already done.
+
+    Args:
+        name: Unique name of the backfill, for its checkpoint
+        table: Table to update
+        assignments: SQL of the SET clause, e.g. ``"dose_unit = 'mg'"``
+        where: Optional SQL condition of the rows to update
+        key: Integer primary key column the batches range over
+        batch_size: Keys per batch
+        pause: Seconds to sleep between batches
+        lock_timeout: Seconds a batch waits for row locks before failing,
+            on PostgreSQL, rather than queueing other writers behind it
+    """
+
+    def __init__(
+        self,
+        name: str,
+        table: str,
+        assignments: str,
+        where: Optional[str] = None,
+        key: str = "id",
+        batch_size: int = 1000,
+        pause: float = 0.0,
+        lock_timeout: Optional[float] = 5.0,
+    ):
+        self.name = name
+        self.table = table
+        self.assignments = assignments
+        self.where = where
+        self.key = key
+        self.batch_size = batch_size
+        self.pause = pause
+        self.lock_timeout = lock_timeout
+
+    def _next_upper(
+        self, connection: Connection, after: Optional[int]
+    ) -> Optional[int]:
+        """Last key of the batch after ``after``, None when there is none."""
+        keys: sa.Select[tuple[Any]] = (
+            sa.select(sa.column(self.key))
+            .select_from(sa.table(self.table))
+            .order_by(sa.column(self.key))
+            .limit(self.batch_size)
+        )
+        if after is not None:
+            keys = keys.where(sa.column(self.key) > after)
+        return connection.scalar(sa.select(sa.func.max(keys.subquery().c[self.key])))
+
+    def _update(self, connection: Connection, after: Optional[int], upper: int) -> int:
+        key = connection.dialect.identifier_preparer.quote(self.key)
+        conditions = [f"{key} <= :upper"]
+        if after is not None:
+            conditions.append(f"{key} > :after")
+        if self.where:
+            conditions.append(f"({self.where})")
+        table = connection.dialect.identifier_preparer.quote(self.table)
+        result = connection.execute(
+            text(
+                f"UPDATE {table} SET {self.assignments} "
+                f"WHERE {' AND '.join(conditions)}"
+            ),
+            {"after": after, "upper": upper},
+        )
+        return result.rowcount
+
+    def _checkpoint(self, connection: Connection) -> Optional[int]:
+        return connection.scalar(
+            sa.select(MigrationCheckpoint.last_key).where(
+                MigrationCheckpoint.name == self.name
+            )
+        )
+
+    def _save_checkpoint(
+        self, connection: Connection, done: Optional[int], last_key: int
+    ) -> None:
+        values = {
+            "last_key": last_key,
+            "updated_at": datetime.now(timezone.utc).replace(tzinfo=None),
+        }
+        if done is None:
+            connection.execute(
+                sa.insert(MigrationCheckpoint).values(name=self.name, **values)
+            )
+        else:
+            connection.execute(
+                sa.update(MigrationCheckpoint)
+                .where(MigrationCheckpoint.name == self.name)
+                .values(**values)
+            )
+
+    @contextmanager
+    def _lock_timeout(self, connection: Connection) -> Iterator[None]:
+        if self.lock_timeout is None or connection.dialect.name != "postgresql":
+            yield
+            return
+        connection.exec_driver_sql(
+            f"SET lock_timeout = '{int(self.lock_timeout * 1000)}ms'"
+        )
+        try:
+            yield
+        finally:
+            connection.exec_driver_sql("RESET lock_timeout")
+
+    def run(self, connection: Connection, max_batches: Optional[int] = None) -> int:
+        """
+        Run the remaining batches, committing each.
+
+        In a migration, call it through ``backfill``, which runs it outside
+        the migration transaction. A transaction the caller already has open
+        on ``connection`` is never committed: the batches then join it.
+
+        Args:
+            connection: Connection to run on
+            max_batches: Optional limit on the number of batches to run
+
+        Returns:
+            Number of rows updated
+        """
+        updated = 0
+        batches = 0
+        owns_transaction = not connection.in_transaction()
+        with self._lock_timeout(connection):
+            done = self._checkpoint(connection)
+            while max_batches is None or batches < max_batches:
+                upper = self._next_upper(connection, done)
+                if upper is None:
+                    break
+                updated += self._update(connection, done, upper)
+                self._save_checkpoint(connection, done, upper)
+                if owns_transaction:
+                    _commit(connection)
+                done = upper
+                batches += 1
+                if self.pause:
+                    time.sleep(self.pause)
+        return updated
+
+    def estimate(
+        self, connection: Connection, sample_batches: int = 3
+    ) -> BackfillEstimate:
+        """
+        Predict how long the remaining batches take, without changing anything.
+
+        The first ``sample_batches`` batches are run and timed in a
+        transaction that is rolled back. Run it against a copy of production
+        data, e.g. a restored backup, for a meaningful figure.
+        """
+        done = self._checkpoint(connection)
+        keys = sa.select(sa.func.count()).select_from(sa.table(self.table))
+        if done is not None:
+            keys = keys.where(sa.column(self.key) > done)
+        rows = connection.execute(keys).scalar_one()
+        batches = math.ceil(rows / self.batch_size)
+
+        transaction = (
+            connection.begin_nested()
+            if connection.in_transaction()
+            else connection.begin()
+        )
+        sampled = 0
+        started = time.perf_counter()
+        try:
+            after = done
+            while sampled < min(sample_batches, batches):
+                upper = self._next_upper(connection, after)
+                if upper is None:
+                    break
+                self._update(connection, after, upper)
+                after = upper
+                sampled += 1
+            elapsed = time.perf_counter() - started
+        finally:
+            transaction.rollback()
+
+        seconds_per_batch = elapsed / sampled if sampled else 0.0
+        return BackfillEstimate(
+            rows=rows,
+            batches=batches,
+            sampled_batches=sampled,
+            seconds_per_batch=seconds_per_batch,
+            estimated_seconds=batches * (seconds_per_batch + self.pause),
+        )
+
+
+def _commit(connection: Connection) -> None:
+    """Commit a batch, unless the connection already commits every statement."""
+    if connection.get_execution_options().get("isolation_level") != "AUTOCOMMIT":
+        connection.commit()
+
+
+def backfill(
+    name: str,
+    table: str,
+    assignments: str,
+    where: Optional[str] = None,
+    **options: Any,
+) -> int:
+    """
+    Run a ``Backfill`` from a migration, outside its transaction.
+
+    The migration transaction is committed first and each batch commits on
+    its own, on every database, so the operations after the backfill and the
+    version update still commit with the migration.
+
+    ``name`` should be unique to the migration, e.g. its revision and the
+    table, so a rerun of the failed migration resumes the backfill.
+    ``options`` are passed on to ``Backfill``.
+
+    Returns:
+        Number of rows updated
+    """
+    job = Backfill(name, table, assignments, where, **options)
+    with _outside_transaction():
+        return job.run(op.get_bind())
+
+
+def add_not_null_column(
+    table: str,
+    column: sa.Column,
+    value: str,
+    **options: Any,
+) -> None:
+    """
+    Add a NOT NULL column to a large table and fill it for existing rows.
+
+    The column is added nullable, which is instant, with the column's server
+    default, if any, applying to new rows. Existing rows are then backfilled
+    with the SQL expression ``value`` in batches, and the column is made NOT
+    NULL through a validated check. ``options`` are passed on to ``Backfill``.
+    """
+    name = column.name
+    # Only a DefaultClause carries a value to pass on; other server defaults,
+    # e.g. a FetchedValue, are produced by the database itself
+    server_default = column.server_default
+    op.add_column(
+        table,
+        sa.Column(
+            name,
+            column.type,
+            nullable=True,
+            server_default=(
+                sa.DefaultClause(server_default.arg)
+                if isinstance(server_default, sa.DefaultClause)
+                else None
+            ),
+        ),
+    )
+    quoted = _quote(name)
+    backfill(
+        f"add_not_null_column:{table}.{name}",
+        table,
+        f"{quoted} = {value}",
+        f"{quoted} IS NULL",
+        **options,
+    )
+    set_not_null(table, name)
@@ -0,0 +1,336 @@
+"""Patient-keyed sharding of medication requests across several databases.
+
+Each patient, with their medication requests, lives on the shard their id
+hashes to on a consistent-hash ring. The primary database holds the master
+copy of every patient: ``place_patients`` copies each one to its shard, and a
+create for a patient not placed yet copies them in the same transaction.
+Every shard is placed on the ring at many virtual points, so adding or
+removing a shard only moves the patients falling between the changed points
+(about 1/N of them) instead of reshuffling all of them. Medications and
+clinicians are reference data: the primary database holds the master copy and
+``replicate_reference_data`` copies it to every shard, so foreign keys and
+name lookups stay local to one shard.
+
+Medication request ids are allocated in the directory on the primary
+database, so they are unique across the shards. The directory also records
+the patient of each request, which routes work on a request by id to the
+shard of its patient.
+
+Patient-scoped work opens a session on a single shard; unscoped reads run on
+every shard in parallel and merge the sorted partial results.
+"""
+
+import hashlib
+import heapq
+from bisect import bisect
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Mapping, Optional, TypeVar
+
+from sqlalchemy import Engine, create_engine, insert, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from patient_medication_app.core.models import (
+    Clinician,
+    Medication,
+    MedicationRequestDirectory,
+    Patient,
+)
+from patient_medication_app.database.base import Base
+from patient_medication_app.database.sqlite import enable_sqlite_foreign_keys
+from patient_medication_app.settings import settings
+
+T = TypeVar("T")
+
+# Reference tables copied to every shard, in foreign key order
+REFERENCE_MODELS = [Medication, Clinician]
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest())
+
+
+class HashRing:
+    """Consistent-hash ring mapping keys to named nodes."""
+
+    def __init__(self, nodes: Iterable[str] = (), virtual_nodes: int = 64):
+        self.virtual_nodes = virtual_nodes
+        self._points: list[int] = []
+        self._owners: list[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> set[str]:
+        return set(self._owners)
+
+    def add(self, node: str) -> None:
+        """Place ``node`` on the ring at its virtual points."""
+        if node in self._owners:
+            return
+        for replica in range(self.virtual_nodes):
+            point = _hash(f"{node}#{replica}")
+            index = bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str) -> None:
+        """Take ``node`` off the ring; its keys move to the following nodes."""
+        kept = [
+            (point, owner)
+            for point, owner in zip(self._points, self._owners)
+            if owner != node
+        ]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def node_for(self, key: Any) -> str:
+        """Return the node owning ``key``: the first point clockwise of its hash."""
+        if not self._points:
+            raise LookupError("The hash ring has no nodes")
+        index = bisect(self._points, _hash(str(key))) % len(self._points)
+        return self._owners[index]
+
+
+class ShardSet:
+    """Engines and sessions for a set of named shard databases."""
+
+    def __init__(self, urls: Mapping[str, str], virtual_nodes: int = 64):
+        if not urls:
+            raise ValueError("At least one shard database URL is required")
+        self.ring = HashRing(urls, virtual_nodes)
+        self.engines: dict[str, Engine] = {}
+        self._sessionmakers: dict[str, sessionmaker[Session]] = {}
+        for name, url in urls.items():
+            engine = create_engine(url)
+            if engine.dialect.name == "sqlite":
+                enable_sqlite_foreign_keys(engine)
+            self.engines[name] = engine
+            self._sessionmakers[name] = sessionmaker(
+                autocommit=False, autoflush=False, bind=engine
+            )
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(urls), thread_name_prefix="shard"
+        )
+
+    @property
+    def names(self) -> list[str]:
+        return list(self.engines)
+
+    def shard_for(self, patient_reference: int) -> str:
+        """Name of the shard holding ``patient_reference``."""
+        return self.ring.node_for(patient_reference)
+
+    def session(self, name: str) -> Session:
+        """Open a session on the named shard."""
+        return self._sessionmakers[name]()
+
+    def session_for_patient(self, patient_reference: int) -> Session:
+        """Open a session on the shard holding ``patient_reference``."""
+        return self.session(self.shard_for(patient_reference))
+
+    def create_all(self) -> None:
+        """Create the schema on every shard (for local and test setups)."""
+        for engine in self.engines.values():
+            Base.metadata.create_all(bind=engine)
+
+    def scatter(
+        self, fn: Callable[[Session], T], names: Optional[Iterable[str]] = None
+    ) -> list[T]:
+        """
+        Run ``fn`` with a session on each shard in parallel.
+
+        Args:
+            fn: Called once per shard with a session that is closed afterwards
+            names: Shards to run on, all of them when omitted
+
+        Returns:
+            The results, in shard order
+        """
+
+        def run(name: str) -> T:
+            with self.session(name) as db:
+                return fn(db)
+
+        return list(self._executor.map(run, self.names if names is None else names))
+
+    def gather_sorted(
+        self,
+        fn: Callable[[Session], list[T]],
+        key: Callable[[T], Any],
+        reverse: bool = False,
+        names: Optional[Iterable[str]] = None,
+    ) -> list[T]:
+        """
+        Scatter ``fn``, which returns rows sorted by ``key``, and merge the rows.
+
+        Returns:
+            The rows of all shards in ``key`` order
+        """
+        return list(heapq.merge(*self.scatter(fn, names), key=key, reverse=reverse))
+
+    def dispose(self) -> None:
+        self._executor.shutdown(wait=False)
+        for engine in self.engines.values():
+            engine.dispose()
+
+
+def replicate_reference_data(source: Session, shards: ShardSet) -> dict[str, int]:
+    """
+    Copy medications and clinicians from ``source`` to every shard.
+
+    Rows are upserted by primary key, so existing rows are updated in place
+    (and their names propagated to the listing table) and new ones inserted.
+
+    Returns:
+        Number of rows copied per model, to each shard
+    """
+    rows = {
+        model: [
+            {
+                column.key: getattr(instance, column.key)
+                for column in model.__mapper__.columns
+            }
+            for instance in source.execute(select(model)).scalars()
+        ]
+        for model in REFERENCE_MODELS
+    }
+
+    def copy(db: Session) -> None:
+        for model, values in rows.items():
+            for row in values:
+                db.merge(model(**row))
+        db.commit()
+
+    shards.scatter(copy)
+    return {model.__tablename__: len(values) for model, values in rows.items()}
+
+
+def _patient_row(patient: Patient) -> dict[str, Any]:
+    return {
+        column.key: getattr(patient, column.key)
+        for column in Patient.__mapper__.columns
+    }
+
+
+def place_patients(source: Session, shards: ShardSet) -> dict[str, int]:
+    """
+    Copy every patient from ``source`` to the shard their id hashes to.
+
+    Rows are upserted by primary key, like the reference data.
+
+    Returns:
+        Number of patients copied to each shard
+    """
+    placed: dict[str, list[dict[str, Any]]] = {name: [] for name in shards.names}
+    for patient in source.execute(select(Patient)).scalars():
+        placed[shards.shard_for(patient.id)].append(_patient_row(patient))
+
+    for name, rows in placed.items():
+        with shards.session(name) as db:
+            for row in rows:
+                db.merge(Patient(**row))
+            db.commit()
+    return {name: len(rows) for name, rows in placed.items()}
+
+
+def ensure_patient_placed(
+    source: Session, shard_db: Session, patient_reference: int
+) -> None:
+    """
+    Copy one patient from ``source`` to its shard unless already there.
+
+    The copy joins the shard session's transaction, so it commits with the
+    write that needed it. A patient missing from ``source`` too is left for
+    the write's foreign key to report.
+    """
+    if shard_db.get(Patient, patient_reference) is not None:
+        return
+    patient = source.get(Patient, patient_reference)
+    if patient is not None:
+        shard_db.add(Patient(**_patient_row(patient)))
+        shard_db.flush()
+
+
+def allocate_request_ids(source: Session, patient_references: list[int]) -> list[int]:
+    """
+    Allocate ids for new medication requests of the given patients.
+
+    The ids are committed on ``source`` before the requests are written to
+    their shards, so an id is never handed out twice; the id of a write that
+    fails afterwards is left unused.
+
+    Returns:
+        One id per patient reference, in order
+    """
+    ids = [
+        source.execute(
+            insert(MedicationRequestDirectory)
+            .values(patient_reference=patient_reference)
+            .returning(MedicationRequestDirectory.id)
+        ).scalar_one()
+        for patient_reference in patient_references
+    ]
+    source.commit()
+    return ids
+
+
+def requests_by_shard(
+    source: Session, shards: ShardSet, request_ids: Iterable[int]
+) -> dict[str, list[int]]:
+    """
+    Group medication request ids by the shard holding them.
+
+    Returns:
+        The ids per shard name; ids not in the directory are left out
+    """
+    grouped: dict[str, list[int]] = {}
+    for request_id, patient_reference in source.execute(
+        select(
+            MedicationRequestDirectory.id, MedicationRequestDirectory.patient_reference
+        ).where(MedicationRequestDirectory.id.in_(list(request_ids)))
+    ):
+        grouped.setdefault(shards.shard_for(patient_reference), []).append(request_id)
+    return grouped
+
+
+def shard_for_request(
+    source: Session, shards: ShardSet, request_id: int
+) -> Optional[str]:
+    """Name of the shard holding a medication request, None for unknown ids."""
+    return next(iter(requests_by_shard(source, shards, [request_id])), None)
+
+
+def misplaced_patients(shards: ShardSet) -> dict[str, list[int]]:
+    """
+    Find patients stored on a shard other than the one the ring maps them to.
+
+    After the shard map changes, these are the patients whose data has to be
+    moved.
+
+    Returns:
+        Ids of the misplaced patients, per shard they are stored on
+    """
+    misplaced: dict[str, list[int]] = {}
+    for name in shards.names:
+        with shards.session(name) as db:
+            misplaced[name] = [
+                patient_id
+                for patient_id in db.execute(select(Patient.id)).scalars()
+                if shards.shard_for(patient_id) != name
+            ]
+    return misplaced
+
+
+def build_shard_set() -> Optional[ShardSet]:
+    """Create the shard set from the settings, or None when sharding is off."""
+    if not settings.shard_database_urls:
+        return None
+    return ShardSet(settings.shard_database_urls, settings.shard_virtual_nodes)
+
+
+shards = build_shard_set()
+
+
+def get_shards() -> Optional[ShardSet]:
+    """Dependency to get the shard set, None when sharding is off."""
+    return shards
@@ -0,0 +1,170 @@
+"""SQLite specific engine configuration.
+
+Besides the foreign key setup shared by every SQLite engine, this module builds
+the tuned engines used when ``DATABASE_URL`` points at a SQLite file, for
+single-node deployments:
+
+* WAL journaling, so readers never block the writer and the writer never
+  blocks readers, with ``synchronous=NORMAL`` (durable at checkpoints, safe
+  against corruption), a memory-mapped file and a larger page cache.
+* A single-writer queue: statements that write go through a writer engine
+  whose pool holds one connection, so writes from the same process queue for
+  it instead of racing for SQLite's write lock. Write transactions start with
+  ``BEGIN IMMEDIATE``, which takes the lock up front and waits for other
+  processes through ``busy_timeout``; a deferred transaction upgrading from
+  read to write would fail with ``database is locked`` instead of waiting.
+* Reads go through a separate pool of ``query_only`` connections.
+"""
+
+from typing import Any, Mapping, Optional
+
+from sqlalchemy import Delete, Engine, Insert, Update, create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, SessionTransaction
+
+
+def enable_sqlite_foreign_keys(engine: Engine) -> None:
+    """Turn on foreign key enforcement, which SQLite leaves off by default."""
+
+    @event.listens_for(engine, "connect")
+    def _set_foreign_keys(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def is_sqlite_file_url(url: str) -> bool:
+    """Whether ``url`` is a SQLite database stored in a file."""
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (
+        None,
+        "",
+        ":memory:",
+    )
+
+
+def set_sqlite_pragmas(engine: Engine, pragmas: Mapping[str, Any]) -> None:
+    """Run ``PRAGMA name=value`` for each of ``pragmas`` on every new connection."""
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def begin_immediate(engine: Engine) -> None:
+    """Start every transaction on ``engine`` with BEGIN IMMEDIATE."""
+
+    @event.listens_for(engine, "connect")
+    def _disable_driver_transactions(dbapi_connection, connection_record) -> None:
+        # Stop the sqlite3 module from emitting its own deferred BEGIN
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection) -> None:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def create_sqlite_engines(
+    url: str,
+    synchronous: str = "NORMAL",
+    mmap_size: int = 256 * 1024 * 1024,
+    cache_size_kib: int = 64 * 1024,
+    busy_timeout_ms: int = 5000,
+    read_pool_size: int = 4,
+    write_queue_timeout: float = 30.0,
+    **engine_kwargs: Any,
+) -> tuple[Engine, Engine]:
+    """
+    Create the writer and reader engines for a file-backed SQLite database.
+
+    Args:
+        url: SQLite database URL
+        synchronous: Value of PRAGMA synchronous
+        mmap_size: Bytes of the database file to memory-map
+        cache_size_kib: Page cache size per connection, in KiB
+        busy_timeout_ms: How long to wait for another process holding the
+            write lock
+        read_pool_size: Number of reader connections
+        write_queue_timeout: Seconds to wait for the writer connection
+        engine_kwargs: Passed on to ``create_engine``
+
+    Returns:
+        The writer engine and the reader engine
+    """
+    pragmas = {
+        "journal_mode": "WAL",
+        "synchronous": synchronous,
+        "mmap_size": mmap_size,
+        # Negative sizes are in KiB rather than pages
+        "cache_size": -cache_size_kib,
+        "busy_timeout": busy_timeout_ms,
+        "temp_store": "MEMORY",
+    }
+    # The timeout of the sqlite3 module is the busy timeout, in seconds
+    connect_args = {"check_same_thread": False, "timeout": busy_timeout_ms / 1000}
+
+    writer = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=write_queue_timeout,
+        **engine_kwargs,
+    )
+    set_sqlite_pragmas(writer, pragmas)
+    enable_sqlite_foreign_keys(writer)
+    begin_immediate(writer)
+
+    reader = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=read_pool_size,
+        max_overflow=0,
+        pool_timeout=write_queue_timeout,
+        **engine_kwargs,
+    )
+    set_sqlite_pragmas(reader, {**pragmas, "query_only": "ON"})
+    enable_sqlite_foreign_keys(reader)
+
+    # Switch the file to WAL once, before any reader opens it
+    with writer.connect():
+        pass
+    return writer, reader
+
+
+class SQLiteRoutingSession(Session):
+    """
+    Session sending writes to the writer engine and reads to the reader engine.
+
+    Inserts, updates, deletes, flushes and SELECT ... FOR UPDATE use the
+    writer; once a transaction has written, its later reads use the writer
+    too, so they see its own changes.
+    """
+
+    def __init__(self, *args: Any, read_bind: Optional[Engine] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.read_bind = read_bind
+        self._writing = False
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        writes = (
+            self._flushing
+            or isinstance(clause, (Insert, Update, Delete))
+            or getattr(clause, "_for_update_arg", None) is not None
+        )
+        if writes:
+            self._writing = True
+        if self._writing or self.read_bind is None:
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        return self.read_bind
+
+
+@event.listens_for(SQLiteRoutingSession, "after_transaction_end")
+def _end_writing(
+    session: SQLiteRoutingSession, transaction: SessionTransaction
+) -> None:
+    if transaction.parent is None:
+        session._writing = False
@@ -0,0 +1,21 @@
+"""In-process metrics registry.
+
+Components register a provider returning a snapshot of their counters, and the
+``/metrics`` endpoint reports every registered snapshot under its name.
+"""
+
+from typing import Any, Callable
+
+MetricsProvider = Callable[[], dict[str, Any]]
+
+_providers: dict[str, MetricsProvider] = {}
+
+
+def register_metrics(name: str, provider: MetricsProvider) -> None:
+    """Register (or replace) the metrics provider for ``name``."""
+    _providers[name] = provider
+
+
+def collect_metrics() -> dict[str, dict[str, Any]]:
+    """Return a snapshot of all registered metrics."""
+    return {name: provider() for name, provider in _providers.items()}
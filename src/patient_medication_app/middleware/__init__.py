@@ -0,0 +1,6 @@
+"""ASGI middleware for the Patient Medication service."""
+
+from .admission import AdmissionControlMiddleware, AdmissionGate
+from .profiling import ProfilingMiddleware
+
+__all__ = ["AdmissionControlMiddleware", "AdmissionGate", "ProfilingMiddleware"]
@@ -0,0 +1,143 @@
+"""Admission control in front of the database connection pool.
+
+Requests are split into read and write classes, each with a bounded number of
+requests in flight and a bounded wait queue. When the queue is full, or a
+request has waited past its deadline, the middleware answers 503 with a
+``Retry-After`` header instead of letting requests pile up on the pool.
+"""
+
+import asyncio
+import json
+from collections import deque
+from typing import Any, Iterable
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class AdmissionGate:
+    """Bounded concurrency limiter with a bounded, deadline-based wait queue."""
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.admitted_total = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def try_acquire(self) -> bool:
+        """Take a slot without waiting, returning whether one was free."""
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            self.admitted_total += 1
+            return True
+        return False
+
+    async def acquire(self) -> bool:
+        """
+        Take a slot, waiting in the queue up to ``queue_timeout`` seconds.
+
+        Returns:
+            True if admitted, False if the request should be shed
+        """
+        if self.try_acquire():
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            return False
+
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # The slot was handed over just as the deadline passed
+                return True
+            self._waiters.remove(waiter)
+            self.rejected_timeout += 1
+            return False
+        except asyncio.CancelledError:
+            # Client went away while queued: give back a slot we may have been handed
+            if waiter.done():
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        return True
+
+    def release(self) -> None:
+        """Free a slot, handing it straight to the oldest waiter if any."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.admitted_total += 1
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted_total": self.admitted_total,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+        }
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware routing HTTP requests through the read or write gate."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        read_gate: AdmissionGate,
+        write_gate: AdmissionGate,
+        exempt_paths: Iterable[str] = (),
+        retry_after: int = 1,
+    ):
+        self.app = app
+        self.read_gate = read_gate
+        self.write_gate = write_gate
+        self.exempt_paths = frozenset(exempt_paths)
+        self.retry_after = retry_after
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        gate = self.read_gate if scope["method"] in READ_METHODS else self.write_gate
+        if not await gate.acquire():
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
+
+    async def _reject(self, send: Send) -> None:
+        body = json.dumps({"detail": "Service is busy, retry later"}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(self.retry_after).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
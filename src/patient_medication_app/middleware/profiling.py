@@ -0,0 +1,144 @@
+"""Opt-in statistical profiling of individual requests.
+
+A request is profiled when it carries the configured ``X-Profile`` token, or is
+picked by the sampling rate. While it runs, a background thread samples the
+stacks of every other thread at a fixed interval; this covers both the event
+loop and the threadpool, where the synchronous database work runs. Samples are
+written as folded stacks (one ``frame;frame;frame count`` line per stack), which
+flamegraph.pl, speedscope and inferno read directly.
+
+Overhead is capped by profiling at most one request at a time, sampling for at
+most ``max_duration`` seconds, and keeping only the newest ``max_profiles``
+files.
+
+The sampler cannot tell which thread works on which request: the event loop
+and the threadpool are shared. A profile taken while other requests run
+concurrently also contains their stacks, so profile on an otherwise idle
+instance, or read the profile as a sample of the whole process over the
+duration of the request.
+"""
+
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+
+class StackSampler(threading.Thread):
+    """Background thread counting the stacks of all other threads."""
+
+    def __init__(self, interval: float, max_duration: float):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        self.max_duration = max_duration
+        self.samples: Counter[str] = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        deadline = time.monotonic() + self.max_duration
+        while not self._stop_event.wait(self.interval):
+            if time.monotonic() > deadline:
+                break
+            for thread_id, top in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                stack = []
+                frame: Optional[FrameType] = top
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+                    )
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self) -> Counter[str]:
+        """Stop sampling and return the folded stack counts."""
+        self._stop_event.set()
+        self.join()
+        return self.samples
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling selected requests into a local directory."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        output_dir: str,
+        token: Optional[str] = None,
+        sample_rate: float = 0.0,
+        interval: float = 0.005,
+        max_duration: float = 30.0,
+        max_profiles: int = 50,
+    ):
+        self.app = app
+        self.output_dir = Path(output_dir)
+        self.token = token
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_duration = max_duration
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def _selected(self, scope: Scope) -> bool:
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER.encode():
+                    # Compared as bytes: header values need not be valid text
+                    return secrets.compare_digest(value, self.token.encode())
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._selected(scope):
+            await self.app(scope, receive, send)
+            return
+        # Only one request is profiled at a time
+        if not self._lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}_{scope['method']}_{slug}_{secrets.token_hex(3)}"
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (PROFILE_ID_HEADER, profile_id.encode()),
+                ]
+            await send(message)
+
+        sampler = StackSampler(self.interval, self.max_duration)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            try:
+                self._write(profile_id, sampler.stop())
+            finally:
+                self._lock.release()
+
+    def _write(self, profile_id: str, samples: Counter[str]) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"{profile_id}.folded"
+        path.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+        )
+
+        profiles = sorted(
+            self.output_dir.glob("*.folded"), key=lambda p: p.stat().st_mtime
+        )
+        for old in profiles[: max(len(profiles) - self.max_profiles, 0)]:
+            old.unlink(missing_ok=True)
@@ -0,0 +1,12 @@
+from pydantic import BaseModel, Field
+
+
+class ClinicianResponse(BaseModel):
+    """Schema for returning clinician data."""
+
+    registration_id: str = Field(..., description="Registration ID of the clinician")
+    first_name: str = Field(..., description="First name of the clinician")
+    last_name: str = Field(..., description="Last name of the clinician")
+
+    class Config:
+        orm_mode = True
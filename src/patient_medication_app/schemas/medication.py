@@ -0,0 +1,29 @@
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+class MedicationSuggestion(BaseModel):
+    """Schema for a medication suggested while typing."""
+
+    code: str = Field(..., description="Medication code")
+    code_name: str = Field(..., description="Name of the medication")
+    score: float = Field(
+        ..., description="Relevance between 0 and 1, 1 for an exact code match"
+    )
+
+
+class MedicationResponse(BaseModel):
+    """Schema for returning medication data."""
+
+    code: str = Field(..., description="Medication code")
+    code_name: str = Field(..., description="Name of the medication")
+    code_system: str = Field(..., description="Coding system of the code")
+    strength_value: int = Field(..., description="Strength of the medication")
+    strength_unit: str = Field(..., description="Unit of the strength")
+    form: Literal["powder", "tablet", "capsule", "syrup"] = Field(
+        ..., description="Form of the medication"
+    )
+
+    class Config:
+        orm_mode = True
@@ -1,11 +1,21 @@
-from datetime import date
-from typing import Literal, Optional
+from datetime import date, datetime
+from typing import Annotated, Any, Literal, Optional, Union
 
 from pydantic import BaseModel, Field
 
+from patient_medication_app.schemas.clinician import ClinicianResponse
+from patient_medication_app.schemas.medication import MedicationResponse
+from patient_medication_app.schemas.patient import PatientResponse
+
 # Define valid status values
 MedicationRequestStatus = Literal["active", "completed", "cancelled", "on-hold"]
 
+# Maximum number of ids accepted by a single lookup
+MAX_LOOKUP_IDS = 1000
+
+# Maximum number of operations accepted by a single batch
+MAX_BATCH_OPERATIONS = 100
+
 
 class MedicationRequest(BaseModel):
     """Base schema for medication request data."""
@@ -63,6 +73,9 @@ class MedicationRequestResponse(MedicationRequest):
     """Schema for returning medication request data."""
 
     id: int = Field(..., description="Unique identifier for the medication request")
+    version: int = Field(
+        ..., description="Version of the medication request, also sent as its ETag"
+    )
     medication_code_name: str = Field(..., description="Name of the medication")
     clinician_first_name: str = Field(
         ..., description="First name of the prescribing clinician"
@@ -70,6 +83,15 @@ class MedicationRequestResponse(MedicationRequest):
     clinician_last_name: str = Field(
         ..., description="Last name of the prescribing clinician"
     )
+    patient: Optional[PatientResponse] = Field(
+        None, description="The patient, with expand=patient"
+    )
+    clinician: Optional[ClinicianResponse] = Field(
+        None, description="The prescribing clinician, with expand=clinician"
+    )
+    medication: Optional[MedicationResponse] = Field(
+        None, description="The medication, with expand=medication"
+    )
 
 
 class MedicationRequestListResponse(BaseModel):
@@ -82,3 +104,135 @@ class MedicationRequestListResponse(BaseModel):
     class Config:
         orm_mode = True
         json_encoders = {date: lambda v: v.isoformat()}
+
+
+class MedicationRequestLookup(BaseModel):
+    """Schema for fetching many medication requests by id."""
+
+    ids: list[int] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_LOOKUP_IDS,
+        description="Ids of the medication requests to fetch",
+    )
+    include_archived: bool = Field(
+        False, description="Also search archived (closed) medication requests"
+    )
+
+
+class MedicationRequestLookupResponse(BaseModel):
+    """Schema for the result of a lookup by id."""
+
+    medication_requests: list[MedicationRequestResponse] = Field(
+        ..., description="Medication requests found, in the order requested"
+    )
+    not_found: list[int] = Field(..., description="Requested ids that do not exist")
+
+
+class MedicationRequestBatchCreate(BaseModel):
+    """Schema for a create operation in a batch."""
+
+    op: Literal["create"] = Field(..., description="Create a medication request")
+    data: MedicationRequestCreate = Field(..., description="The request to create")
+
+
+class MedicationRequestBatchPatch(BaseModel):
+    """Schema for an update operation in a batch."""
+
+    op: Literal["patch"] = Field(..., description="Update a medication request")
+    id: int = Field(..., description="The ID of the medication request to update")
+    data: MedicationRequestUpdate = Field(..., description="The fields to update")
+    if_match: Optional[int] = Field(
+        None, description="Version the update is based on, like the If-Match header"
+    )
+
+
+MedicationRequestBatchOperation = Annotated[
+    Union[MedicationRequestBatchCreate, MedicationRequestBatchPatch],
+    Field(discriminator="op"),
+]
+
+
+class MedicationRequestBatch(BaseModel):
+    """Schema for operations applied together in one transaction."""
+
+    operations: list[MedicationRequestBatchOperation] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_BATCH_OPERATIONS,
+        description="Operations to apply, in order",
+    )
+
+
+class MedicationRequestBatchResult(BaseModel):
+    """Schema for the outcome of one operation of a batch."""
+
+    op: Literal["create", "patch"] = Field(..., description="The operation applied")
+    medication_request: MedicationRequestResponse = Field(
+        ..., description="The medication request as created or updated"
+    )
+    duplicate_therapy: list[int] = Field(
+        default_factory=list,
+        description="Active requests overlapping a created one, in warn mode",
+    )
+
+
+class MedicationRequestBatchResponse(BaseModel):
+    """Schema for the outcome of a batch."""
+
+    results: list[MedicationRequestBatchResult] = Field(
+        ..., description="One result per operation, in order"
+    )
+
+
+class MedicationRequestImportError(BaseModel):
+    """Schema for a row rejected by a bulk import."""
+
+    row: int = Field(..., description="1-based row number in the uploaded file")
+    error: str = Field(..., description="Why the row was rejected")
+
+
+class MedicationRequestImportReport(BaseModel):
+    """Schema for the outcome of a bulk import."""
+
+    rows_read: int = Field(
+        default=0, description="Number of data rows read from the file"
+    )
+    rows_imported: int = Field(
+        default=0, description="Number of medication requests created"
+    )
+    rows_failed: int = Field(default=0, description="Number of rows rejected")
+    errors: list[MedicationRequestImportError] = Field(
+        default_factory=list,
+        description="Rejected rows, truncated to the configured maximum",
+    )
+
+
+class MedicationRequestTimeSeries(BaseModel):
+    """Schema for daily counts of active medication requests, in columnar form."""
+
+    start: date = Field(..., description="First day counted")
+    end: date = Field(..., description="Last day counted")
+    group_by: str = Field(..., description="Field the counts are grouped by")
+    groups: list[str] = Field(..., description="Group labels, one per row of counts")
+    counts: list[list[int]] = Field(
+        ...,
+        description="Active requests per group (rows) and day from start (columns)",
+    )
+
+
+class MedicationRequestAuditEntry(BaseModel):
+    """Schema for one change in the audit log of a medication request."""
+
+    id: int = Field(..., description="Unique identifier of the audit entry")
+    medication_request_id: int = Field(..., description="The medication request")
+    version: int = Field(..., description="Version of the request after the change")
+    action: str = Field(..., description="create, update or expire")
+    actor: str = Field(..., description="Who made the change")
+    changed_at: datetime = Field(..., description="When the change was made (UTC)")
+    changes: dict[str, dict[str, Any]] = Field(
+        ..., description='Changed fields as {"field": {"before": ..., "after": ...}}'
+    )
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,17 @@
+from datetime import date
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+class PatientResponse(BaseModel):
+    """Schema for returning patient data."""
+
+    id: int = Field(..., description="Unique identifier for the patient")
+    first_name: str = Field(..., description="First name of the patient")
+    last_name: str = Field(..., description="Last name of the patient")
+    date_of_birth: date = Field(..., description="Date of birth of the patient")
+    sex: Literal["male", "female"] = Field(..., description="Sex of the patient")
+
+    class Config:
+        orm_mode = True
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -8,5 +8,81 @@ class Settings(BaseSettings):
 
     database_url: Optional[str] = None
 
+    # Tuning of file-backed SQLite databases (sqlite:///path/to/file.db)
+    sqlite_synchronous: Literal["OFF", "NORMAL", "FULL"] = "NORMAL"
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kib: int = 64 * 1024
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_read_pool_size: int = 4
+    sqlite_write_queue_timeout: float = 30.0
+
+    # Closed medication requests older than this are moved to the archive table
+    archive_after_days: int = 365
+    archive_batch_size: int = 1000
+
+    # Admission control: requests in flight and queued per route class. The
+    # defaults match SQLAlchemy's default pool (5 connections + 10 overflow).
+    admission_max_reads: int = 10
+    admission_max_writes: int = 5
+    admission_queue_size: int = 50
+    admission_queue_timeout: float = 2.0
+    admission_retry_after: int = 1
+
+    # Cache of serialized list responses, invalidated on every write
+    result_cache_backend: Literal["none", "memory", "redis"] = "memory"
+    result_cache_max_bytes: int = 32 * 1024 * 1024
+    result_cache_ttl: int = 300
+    redis_url: Optional[str] = None
+
+    # Maintain the denormalized listing table and serve list reads from it.
+    # Run the read-model rebuild command before turning this on.
+    read_model_enabled: bool = False
+
+    # Request profiling: requests sending this token in X-Profile, or picked at
+    # the sample rate, are profiled into profiling_dir as folded stacks
+    profiling_token: Optional[str] = None
+    profiling_sample_rate: float = 0.0
+    profiling_dir: str = "profiles"
+    profiling_interval: float = 0.005
+    profiling_max_duration: float = 30.0
+    profiling_max_profiles: int = 50
+
+    # Duplicate therapy check on create: "warn" flags overlapping active
+    # requests in a response header, "reject" refuses them with a 409
+    overlap_check_mode: Literal["off", "warn", "reject"] = "warn"
+
+    # Estimated total counts of the list endpoint (count=estimate) use the
+    # planner's row estimate when it is at least this many rows
+    count_estimate_threshold: int = 100_000
+
+    # Build the medication suggestion index at startup rather than on the
+    # first suggestion request; a database that is not up yet is only logged
+    medication_index_preload: bool = True
+    # Reload the index once older than this many seconds, to pick up
+    # medications written by other processes
+    medication_index_max_age: float = 300.0
+
+    # Patient-keyed sharding, as a JSON object of shard name to database URL.
+    # Medication requests then live on the shard their patient hashes to;
+    # run the shards sync-reference command to copy medications and clinicians.
+    shard_database_urls: dict[str, str] = {}
+    shard_virtual_nodes: int = 64
+
+    # Background completion of active requests past their end date. Every
+    # worker runs the loop; a lease row lets only one of them do the work.
+    lifecycle_enabled: bool = False
+    lifecycle_interval: float = 60.0
+    lifecycle_lease_ttl: float = 180.0
+    lifecycle_batch_size: int = 500
+    lifecycle_max_batches: int = 20
+
+    # Audit trail: changes are queued in an outbox table inside each write
+    # transaction and moved to the audit log by a background drainer
+    audit_enabled: bool = True
+    audit_drain_enabled: bool = True
+    audit_drain_interval: float = 5.0
+    audit_drain_lease_ttl: float = 30.0
+    audit_drain_batch_size: int = 1000
+
 
 settings = Settings()
@@ -1,3 +1,5 @@
+from datetime import date
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -5,8 +7,26 @@ from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from patient_medication_app.app import app
-from patient_medication_app.core.models import Base
-from patient_medication_app.database.connections import get_session
+from patient_medication_app.core.cache import result_cache
+from patient_medication_app.core.suggest import medication_index
+from patient_medication_app.core.models import (
+    Base,
+    Clinician,
+    Medication,
+    MedicationRequest,
+    Patient,
+)
+from patient_medication_app.database.connections import (
+    get_session,
+    get_session_factory,
+)
+from patient_medication_app.database.sqlite import enable_sqlite_foreign_keys
+from patient_medication_app.settings import settings
+
+# The audit outbox is drained explicitly by the tests that need it
+settings.audit_drain_enabled = False
+# The medication index loads from the test database on first use
+settings.medication_index_preload = False
 
 # Create in-memory SQLite database for testing
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -16,6 +36,7 @@ engine = create_engine(
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
+enable_sqlite_foreign_keys(engine)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -47,6 +68,11 @@ def client(db_session: Session):
 
     # Override the database session dependency
     app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
+
+    # Start each test with an empty result cache and medication index
+    result_cache.clear()
+    medication_index.clear()
 
     # Create test client
     with TestClient(app) as test_client:
@@ -54,3 +80,89 @@ def client(db_session: Session):
 
     # Clear dependency overrides
     app.dependency_overrides.clear()
+    result_cache.clear()
+    medication_index.clear()
+
+
+@pytest.fixture
+def sample_patient(db_session: Session):
+    patient = Patient(
+        first_name="John", last_name="Doe", date_of_birth=date(1990, 1, 1), sex="male"
+    )
+    db_session.add(patient)
+    db_session.commit()
+    return patient
+
+
+@pytest.fixture
+def sample_clinician(db_session: Session):
+    clinician = Clinician(first_name="Dr", last_name="House", registration_id="MD12345")
+    db_session.add(clinician)
+    db_session.commit()
+    return clinician
+
+
+@pytest.fixture
+def sample_medication(db_session: Session):
+    medication = Medication(
+        code="PARA500",
+        code_name="Paracetamol",
+        code_system="SNOMED-CT",
+        strength_value=500,
+        strength_unit="mg",
+        form="tablet",
+    )
+    db_session.add(medication)
+    db_session.commit()
+    return medication
+
+
+@pytest.fixture
+def sample_medication_requests(
+    db_session: Session, sample_patient, sample_clinician, sample_medication
+):
+    request1 = MedicationRequest(
+        patient_reference=sample_patient.id,
+        clinician_reference=sample_clinician.registration_id,
+        medication_reference=sample_medication.code,
+        reason="Test reason",
+        prescribed_date=date(2025, 6, 16),
+        start_date=date(2025, 6, 16),
+        frequency="twice daily",
+        status="active",
+    )
+    request2 = MedicationRequest(
+        patient_reference=sample_patient.id,
+        clinician_reference=sample_clinician.registration_id,
+        medication_reference=sample_medication.code,
+        reason="Test reason 2",
+        prescribed_date=date(2025, 6, 9),
+        start_date=date(2025, 6, 9),
+        frequency="twice daily",
+        status="completed",
+    )
+    request3 = MedicationRequest(
+        patient_reference=sample_patient.id,
+        clinician_reference=sample_clinician.registration_id,
+        medication_reference=sample_medication.code,
+        reason="Test reason 3",
+        prescribed_date=date(2025, 6, 2),
+        start_date=date(2025, 6, 2),
+        frequency="twice daily",
+        status="on-hold",
+    )
+    request4 = MedicationRequest(
+        patient_reference=sample_patient.id,
+        clinician_reference=sample_clinician.registration_id,
+        medication_reference=sample_medication.code,
+        reason="Test reason 4",
+        prescribed_date=date(2025, 5, 16),
+        start_date=date(2025, 5, 16),
+        frequency="twice daily",
+        status="cancelled",
+    )
+    db_session.add_all([request1, request2, request3, request4])
+    db_session.commit()
+    for request in [request1, request2, request3, request4]:
+        db_session.refresh(request)
+    return [request1, request2, request3, request4]
@@ -0,0 +1,102 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from patient_medication_app.app import app
+from patient_medication_app.middleware import AdmissionControlMiddleware, AdmissionGate
+
+
+def _make_app(read_gate: AdmissionGate, write_gate: AdmissionGate) -> FastAPI:
+    test_app = FastAPI()
+
+    @test_app.get("/items")
+    async def list_items():
+        return []
+
+    @test_app.post("/items")
+    async def create_item():
+        return {}
+
+    @test_app.get("/healthcheck")
+    async def healthcheck():
+        return {"status": "ok"}
+
+    test_app.add_middleware(
+        AdmissionControlMiddleware,
+        read_gate=read_gate,
+        write_gate=write_gate,
+        exempt_paths=["/healthcheck"],
+        retry_after=3,
+    )
+    return test_app
+
+
+def test_gate_queues_until_release():
+    async def scenario():
+        gate = AdmissionGate(max_concurrency=1, max_queue=1, queue_timeout=1)
+        assert await gate.acquire()
+
+        waiter = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+        assert gate.waiting == 1
+
+        gate.release()
+        assert await waiter
+        assert gate.active == 1
+        gate.release()
+        assert gate.active == 0
+        return gate.metrics()
+
+    metrics = asyncio.run(scenario())
+    assert metrics["admitted_total"] == 2
+    assert metrics["rejected_queue_full"] == 0
+
+
+def test_gate_rejects_when_queue_full():
+    async def scenario():
+        gate = AdmissionGate(max_concurrency=1, max_queue=0, queue_timeout=1)
+        assert await gate.acquire()
+        assert not await gate.acquire()
+        return gate
+
+    gate = asyncio.run(scenario())
+    assert gate.rejected_queue_full == 1
+
+
+def test_gate_rejects_after_deadline():
+    async def scenario():
+        gate = AdmissionGate(max_concurrency=1, max_queue=5, queue_timeout=0.01)
+        assert await gate.acquire()
+        assert not await gate.acquire()
+        return gate
+
+    gate = asyncio.run(scenario())
+    assert gate.rejected_timeout == 1
+    assert gate.waiting == 0
+
+
+def test_middleware_sheds_load_per_route_class():
+    read_gate = AdmissionGate(max_concurrency=1, max_queue=0, queue_timeout=1)
+    write_gate = AdmissionGate(max_concurrency=1, max_queue=0, queue_timeout=1)
+    client = TestClient(_make_app(read_gate, write_gate))
+
+    # Saturate the read gate; writes and the health check are unaffected
+    assert read_gate.try_acquire()
+    response = client.get("/items")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "3"
+    assert client.post("/items").status_code == 200
+    assert client.get("/healthcheck").status_code == 200
+
+    read_gate.release()
+    assert client.get("/items").status_code == 200
+    assert read_gate.active == 0
+
+
+def test_metrics_endpoint_reports_admission_gates():
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["admission_reads"]["max_concurrency"] >= 1
+    assert "rejected_queue_full" in data["admission_writes"]
@@ -1,6 +1,8 @@
 from fastapi.testclient import TestClient
 
 from patient_medication_app.app import app
+from patient_medication_app.core.suggest import medication_index
+from patient_medication_app.settings import settings
 
 client = TestClient(app)
 
@@ -9,3 +11,18 @@ def test_healthcheck():
     response = client.get("/healthcheck")
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
+
+
+def test_starts_without_the_database(monkeypatch, caplog):
+    def unreachable():
+        raise ConnectionError("database is down")
+
+    medication_index.clear()
+    monkeypatch.setattr(settings, "medication_index_preload", True)
+    monkeypatch.setattr("patient_medication_app.app.SessionLocal", unreachable)
+
+    with TestClient(app) as started:
+        assert started.get("/healthcheck").status_code == 200
+
+    assert not medication_index.loaded
+    assert "Could not preload the medication index" in caplog.text
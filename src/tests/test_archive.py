@@ -0,0 +1,108 @@
+from datetime import date
+
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.archive import (
+    archive_closed_requests,
+    archive_cutoff,
+)
+from patient_medication_app.core.models import (
+    MedicationRequest,
+    MedicationRequestArchive,
+)
+
+
+def test_archive_cutoff():
+    assert archive_cutoff(30, today=date(2025, 7, 1)) == date(2025, 6, 1)
+
+
+def test_archive_moves_only_closed_requests(
+    db_session: Session, sample_medication_requests
+):
+    archived = archive_closed_requests(db_session, older_than_days=0)
+
+    assert archived == 2
+    archived_statuses = {
+        r.status for r in db_session.query(MedicationRequestArchive).all()
+    }
+    assert archived_statuses == {"completed", "cancelled"}
+    live_statuses = {r.status for r in db_session.query(MedicationRequest).all()}
+    assert live_statuses == {"active", "on-hold"}
+
+
+def test_archive_respects_age(db_session: Session, sample_medication_requests):
+    older_than_days = (date.today() - date(2025, 6, 1)).days
+
+    archived = archive_closed_requests(db_session, older_than_days=older_than_days)
+
+    # Only the cancelled request from May is older than the cutoff
+    assert archived == 1
+    archived_request = db_session.query(MedicationRequestArchive).one()
+    assert archived_request.id == sample_medication_requests[3].id
+    assert archived_request.archived_at is not None
+
+
+def test_archive_runs_in_batches(db_session: Session, sample_medication_requests):
+    assert (
+        archive_closed_requests(
+            db_session, older_than_days=0, batch_size=1, max_batches=1
+        )
+        == 1
+    )
+    assert archive_closed_requests(db_session, older_than_days=0, batch_size=1) == 1
+    assert db_session.query(MedicationRequestArchive).count() == 2
+
+
+def test_list_excludes_archived_by_default(
+    client, db_session: Session, sample_medication_requests
+):
+    archive_closed_requests(db_session, older_than_days=0)
+
+    response = client.get("/medication-requests/")
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+    response = client.get("/medication-requests/?include_archived=true")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 4
+    assert all("medication_code_name" in r for r in data)
+
+    response = client.get(
+        "/medication-requests/?include_archived=true&status=cancelled"
+    )
+    assert [r["status"] for r in response.json()] == ["cancelled"]
+
+
+def test_lookup_searches_archive_when_asked(
+    client, db_session: Session, sample_medication_requests
+):
+    archived_id = sample_medication_requests[3].id
+    archive_closed_requests(db_session, older_than_days=0)
+
+    response = client.post("/medication-requests/lookup", json={"ids": [archived_id]})
+    assert response.json()["not_found"] == [archived_id]
+
+    response = client.post(
+        "/medication-requests/lookup",
+        json={"ids": [archived_id], "include_archived": True},
+    )
+    data = response.json()
+    assert [r["id"] for r in data["medication_requests"]] == [archived_id]
+    assert data["not_found"] == []
+
+
+def test_list_pages_across_live_and_archived(
+    client, db_session: Session, sample_medication_requests
+):
+    archive_closed_requests(db_session, older_than_days=0)
+
+    response = client.get(
+        "/medication-requests/?include_archived=true&offset=1&limit=2&count=exact"
+    )
+    assert response.status_code == 200
+    assert [r["prescribed_date"] for r in response.json()] == [
+        "2025-06-09",
+        "2025-06-02",
+    ]
+    assert response.headers["x-total-count"] == "4"
@@ -0,0 +1,147 @@
+import io
+import json
+from datetime import date
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.audit import AuditDrainer, drain_audit_outbox
+from patient_medication_app.core.importer import import_medication_requests, iter_rows
+from patient_medication_app.core.lifecycle import expire_requests
+from patient_medication_app.core.models import (
+    MedicationRequestAudit,
+    MedicationRequestAuditOutbox,
+)
+from patient_medication_app.settings import settings
+from tests.conftest import TestingSessionLocal
+
+
+def _request_data(**overrides) -> dict:
+    data = {
+        "patient_reference": 1,
+        "clinician_reference": "MD12345",
+        "medication_reference": "PARA500",
+        "reason": "Test reason",
+        "prescribed_date": "2025-06-20",
+        "start_date": "2025-06-20",
+        "frequency": "twice daily",
+        "status": "on-hold",
+    }
+    data.update(overrides)
+    return data
+
+
+def _outbox_size(db_session: Session) -> int:
+    return db_session.scalar(select(func.count(MedicationRequestAuditOutbox.id)))
+
+
+def test_create_and_updates_are_audited(
+    client, db_session: Session, sample_patient, sample_clinician, sample_medication
+):
+    created = client.post(
+        "/medication-requests/",
+        json=_request_data(),
+        headers={"X-Actor": "dr.house"},
+    ).json()
+    request_id = created["id"]
+    client.patch(
+        f"/medication-requests/{request_id}",
+        json={"status": "active"},
+        headers={"X-Actor": "nurse.ratched"},
+    )
+    client.patch(
+        f"/medication-requests/{request_id}",
+        json={"frequency": "daily", "end_date": "2025-07-01"},
+    )
+    assert _outbox_size(db_session) == 3
+    # Nothing reaches the audit log until the outbox is drained
+    assert client.get(f"/medication-requests/{request_id}/audit").json() == []
+
+    assert drain_audit_outbox(db_session, batch_size=2) == 3
+    assert _outbox_size(db_session) == 0
+
+    history = client.get(f"/medication-requests/{request_id}/audit").json()
+    assert [(entry["action"], entry["actor"]) for entry in history] == [
+        ("create", "dr.house"),
+        ("update", "nurse.ratched"),
+        ("update", "anonymous"),
+    ]
+    assert [entry["version"] for entry in history] == [1, 2, 3]
+    assert history[0]["changes"]["status"] == {"before": None, "after": "on-hold"}
+    assert history[1]["changes"] == {
+        "status": {"before": "on-hold", "after": "active"},
+        "version": {"before": 1, "after": 2},
+    }
+    assert history[2]["changes"] == {
+        "end_date": {"before": None, "after": "2025-07-01"},
+        "frequency": {"before": "twice daily", "after": "daily"},
+        "version": {"before": 2, "after": 3},
+    }
+
+
+def test_update_of_request_created_before_auditing(
+    client, db_session: Session, sample_medication_requests
+):
+    request_id = sample_medication_requests[0].id
+    client.patch(f"/medication-requests/{request_id}", json={"status": "on-hold"})
+    drain_audit_outbox(db_session)
+
+    (entry,) = client.get(f"/medication-requests/{request_id}/audit").json()
+    assert entry["changes"]["status"] == {"before": None, "after": "on-hold"}
+    assert entry["changes"]["reason"] == {"before": None, "after": "Test reason"}
+
+
+def test_failed_writes_leave_no_audit_entry(
+    client, db_session: Session, sample_clinician, sample_medication
+):
+    response = client.post("/medication-requests/", json=_request_data())
+    assert response.status_code == 404
+    response = client.patch("/medication-requests/999", json={"status": "active"})
+    assert response.status_code == 404
+
+    assert _outbox_size(db_session) == 0
+
+
+def test_audit_can_be_disabled(
+    monkeypatch,
+    client,
+    db_session: Session,
+    sample_patient,
+    sample_clinician,
+    sample_medication,
+):
+    monkeypatch.setattr(settings, "audit_enabled", False)
+    client.post("/medication-requests/", json=_request_data())
+
+    assert _outbox_size(db_session) == 0
+
+
+def test_bulk_changes_are_audited(
+    db_session: Session, sample_patient, sample_clinician, sample_medication
+):
+    data = "\n".join(
+        json.dumps(_request_data(status="active", end_date=end_date))
+        for end_date in ["2025-07-01", "2025-07-02"]
+    )
+    import_medication_requests(
+        db_session, iter_rows(io.BytesIO(data.encode()), "ndjson"), actor="loader"
+    )
+    expire_requests(db_session, today=date(2025, 7, 2))
+
+    drainer = AuditDrainer(TestingSessionLocal)
+    assert drainer.run_once() == 3
+    assert drainer.metrics()["backlog"] == 0
+
+    entries = db_session.execute(
+        select(
+            MedicationRequestAudit.action,
+            MedicationRequestAudit.actor,
+            MedicationRequestAudit.changes,
+        ).order_by(MedicationRequestAudit.id)
+    ).all()
+    assert [(action, actor) for action, actor, _ in entries] == [
+        ("create", "loader"),
+        ("create", "loader"),
+        ("expire", "system:lifecycle"),
+    ]
+    assert entries[2].changes["status"] == {"before": "active", "after": "completed"}
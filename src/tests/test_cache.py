@@ -0,0 +1,93 @@
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core import cache as cache_module
+from patient_medication_app.core.cache import MemoryResultCache, result_cache
+from patient_medication_app.core.models import MedicationRequest
+
+
+def test_memory_cache_evicts_least_recently_used(db_session: Session):
+    cache = MemoryResultCache(max_bytes=10, ttl=60)
+    cache.set(cache.key(db_session, "list", "a"), b"aaaa")
+    cache.set(cache.key(db_session, "list", "b"), b"bbbb")
+    assert cache.get(cache.key(db_session, "list", "a")) == b"aaaa"
+
+    cache.set(cache.key(db_session, "list", "c"), b"cccc")
+
+    assert cache.get(cache.key(db_session, "list", "b")) is None
+    assert cache.get(cache.key(db_session, "list", "a")) == b"aaaa"
+    assert cache.metrics()["evictions"] == 1
+    assert cache.metrics()["bytes"] == 8
+
+
+def test_memory_cache_skips_values_over_the_limit(db_session: Session):
+    cache = MemoryResultCache(max_bytes=4, ttl=60)
+    cache.set(cache.key(db_session, "list", "a"), b"too large")
+    assert cache.get(cache.key(db_session, "list", "a")) is None
+
+
+def test_memory_cache_entries_expire(monkeypatch, db_session: Session):
+    now = 1000.0
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now)
+    cache = MemoryResultCache(max_bytes=100, ttl=30)
+    key = cache.key(db_session, "list", "a")
+    cache.set(key, b"aaaa")
+
+    now += 29
+    assert cache.get(key) == b"aaaa"
+    now += 1
+    assert cache.get(key) is None
+    assert cache.metrics()["bytes"] == 0
+
+
+def test_bump_invalidates_previous_generation(db_session: Session):
+    cache = MemoryResultCache(max_bytes=100, ttl=60)
+    old_key = cache.key(db_session, "list", ("active",))
+    cache.set(old_key, b"[]")
+
+    cache.bump(db_session)
+
+    assert cache.key(db_session, "list", ("active",)) != old_key
+    assert cache.get(cache.key(db_session, "list", ("active",))) is None
+    # A value computed before the bump is not stored
+    cache.set(old_key, b"[]")
+    assert cache.metrics()["entries"] == 0
+
+
+def test_list_responses_are_cached(client, sample_medication_requests):
+    hits = result_cache.hits
+
+    first = client.get("/medication-requests/?status=active")
+    second = client.get("/medication-requests/?status=active")
+
+    assert first.content == second.content
+    assert result_cache.hits == hits + 1
+
+
+def test_writes_invalidate_cached_lists(client, sample_medication_requests):
+    assert len(client.get("/medication-requests/?status=completed").json()) == 1
+
+    response = client.patch(
+        f"/medication-requests/{sample_medication_requests[0].id}",
+        json={"status": "completed"},
+    )
+    assert response.status_code == 200
+
+    assert len(client.get("/medication-requests/?status=completed").json()) == 2
+
+
+def test_writes_of_other_processes_invalidate_cached_lists(
+    client, db_session: Session, sample_medication_requests
+):
+    assert len(client.get("/medication-requests/?status=completed").json()) == 1
+
+    # A CLI command or another worker, with a cache of its own, changes a row
+    db_session.execute(
+        update(MedicationRequest)
+        .where(MedicationRequest.id == sample_medication_requests[0].id)
+        .values(status="completed")
+    )
+    db_session.commit()
+    MemoryResultCache(max_bytes=100, ttl=60).bump(db_session)
+
+    assert len(client.get("/medication-requests/?status=completed").json()) == 2
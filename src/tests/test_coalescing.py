@@ -0,0 +1,121 @@
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy.orm import Session
+
+from patient_medication_app.api.medication_request_router import list_query_flight
+from patient_medication_app.app import app
+from patient_medication_app.core.coalescing import SingleFlight
+from patient_medication_app.database.connections import get_session_factory
+
+
+def test_identical_calls_share_one_execution():
+    flight: SingleFlight[bytes] = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def work() -> bytes:
+        calls.append(1)
+        release.wait(timeout=5)
+        return b"[]"
+
+    async def scenario():
+        leader = asyncio.create_task(flight.do(("active",), work))
+        await asyncio.sleep(0.01)
+        followers = [
+            asyncio.create_task(flight.do(("active",), work)) for _ in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        release.set()
+        return await asyncio.gather(leader, *followers)
+
+    results = asyncio.run(scenario())
+
+    assert results == [b"[]"] * 4
+    assert len(calls) == 1
+    assert flight.metrics() == {"in_flight": 0, "executed": 1, "coalesced": 3}
+
+
+def test_different_keys_run_separately():
+    flight: SingleFlight[str] = SingleFlight()
+
+    async def scenario():
+        return await asyncio.gather(
+            flight.do("a", lambda: "a"), flight.do("b", lambda: "b")
+        )
+
+    assert asyncio.run(scenario()) == ["a", "b"]
+    assert flight.executed == 2
+    assert flight.coalesced == 0
+
+
+def test_errors_propagate_and_clear_the_flight():
+    flight: SingleFlight[str] = SingleFlight()
+
+    def fail() -> str:
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(flight.do("a", fail))
+    assert flight.metrics()["in_flight"] == 0
+
+
+def test_cancelled_leader_leaves_followers_running():
+    flight: SingleFlight[bytes] = SingleFlight()
+    release = threading.Event()
+
+    def work() -> bytes:
+        release.wait(timeout=5)
+        return b"[]"
+
+    async def scenario():
+        leader = asyncio.create_task(flight.do(("active",), work))
+        await asyncio.sleep(0.01)
+        followers = [
+            asyncio.create_task(flight.do(("active",), work)) for _ in range(2)
+        ]
+        await asyncio.sleep(0.01)
+        # The leader's client disconnects
+        leader.cancel()
+        await asyncio.sleep(0.01)
+        release.set()
+        return leader, await asyncio.gather(*followers)
+
+    leader, results = asyncio.run(scenario())
+
+    assert leader.cancelled()
+    assert results == [b"[]"] * 2
+    assert flight.metrics() == {"in_flight": 0, "executed": 1, "coalesced": 2}
+
+
+def test_list_endpoint_goes_through_single_flight(client, sample_medication_requests):
+    executed = list_query_flight.executed
+
+    response = client.get("/medication-requests/?status=active")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert [r["status"] for r in response.json()] == ["active"]
+    assert list_query_flight.executed == executed + 1
+
+
+def test_list_query_runs_in_a_session_of_its_own(
+    client, db_session: Session, sample_medication_requests
+):
+    sessions = []
+
+    def session_factory():
+        sessions.append(Session(bind=db_session.get_bind()))
+        return sessions[-1]
+
+    app.dependency_overrides[get_session_factory] = lambda: session_factory
+
+    response = client.get("/medication-requests/?status=active&count=exact")
+
+    assert response.status_code == 200
+    assert response.headers["X-Total-Count"] == "1"
+    # One session for the count and one for the page, both closed by the flight
+    assert len(sessions) == 2
+    assert db_session not in sessions
+    assert not any(session.in_transaction() for session in sessions)
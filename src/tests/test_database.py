@@ -1,10 +1,20 @@
 import importlib
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 
 import pytest
-from sqlalchemy import text
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.orm import sessionmaker
 
+from patient_medication_app.core.models import Patient
+from patient_medication_app.database import Base
 from patient_medication_app.database.connections import engine, get_session
+from patient_medication_app.database.sqlite import (
+    SQLiteRoutingSession,
+    create_sqlite_engines,
+    is_sqlite_file_url,
+)
 
 
 def test_db_connection():
@@ -31,3 +41,75 @@ def test_missing_database_url(monkeypatch):
         import patient_medication_app.database.connections
 
         importlib.reload(patient_medication_app.database.connections)
+
+
+@pytest.fixture
+def sqlite_engines(tmp_path):
+    writer, reader = create_sqlite_engines(f"sqlite:///{tmp_path / 'app.db'}")
+    Base.metadata.create_all(bind=writer)
+    yield writer, reader
+    writer.dispose()
+    reader.dispose()
+
+
+def test_sqlite_file_url():
+    assert is_sqlite_file_url("sqlite:///app.db")
+    assert not is_sqlite_file_url("sqlite:///:memory:")
+    assert not is_sqlite_file_url("sqlite://")
+    assert not is_sqlite_file_url("postgresql://localhost/app")
+
+
+def test_sqlite_pragmas(sqlite_engines):
+    writer, reader = sqlite_engines
+    with writer.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+    with reader.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA query_only").scalar() == 1
+
+
+def test_sqlite_routing_session_concurrent_writes(sqlite_engines):
+    writer, reader = sqlite_engines
+    Sessions = sessionmaker(
+        class_=SQLiteRoutingSession, bind=writer, read_bind=reader, autoflush=False
+    )
+
+    def create_patients(worker: int) -> None:
+        for i in range(20):
+            with Sessions() as db:
+                # Read first, as the create endpoints do, then write
+                db.scalar(select(func.count(Patient.id)))
+                db.add(
+                    Patient(
+                        first_name=f"Worker {worker}",
+                        last_name=str(i),
+                        date_of_birth=date(1990, 1, 1),
+                        sex="female",
+                    )
+                )
+                db.commit()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(create_patients, range(8)))
+
+    with Sessions() as db:
+        assert db.get_bind() is reader
+        assert db.scalar(select(func.count(Patient.id))) == 160
+
+
+def test_sqlite_routing_session_reads_own_writes(sqlite_engines):
+    writer, reader = sqlite_engines
+    with SQLiteRoutingSession(bind=writer, read_bind=reader) as db:
+        db.execute(
+            insert(Patient).values(
+                first_name="Jane",
+                last_name="Doe",
+                date_of_birth=date(1990, 1, 1),
+                sex="female",
+            )
+        )
+        # Not committed yet, so only visible on the writer connection
+        assert db.scalar(select(func.count(Patient.id))) == 1
+        db.rollback()
+        assert db.scalar(select(func.count(Patient.id))) == 0
@@ -0,0 +1,99 @@
+import pytest
+from sqlalchemy import event
+
+from patient_medication_app.core.expand import UnknownExpansionError, parse_expand
+from tests.conftest import engine
+
+
+def _selects(client, url: str):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        # The result cache's generation lookup is not part of the response
+        if statement.startswith("SELECT") and "cache_generation" not in statement:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return response, statements
+
+
+def test_parse_expand():
+    assert parse_expand(None) == ()
+    assert parse_expand(" medication,patient,,medication") == ("medication", "patient")
+    with pytest.raises(UnknownExpansionError, match="reason"):
+        parse_expand("patient,reason")
+
+
+def test_list_expands_with_one_query_per_relation(client, sample_medication_requests):
+    response, statements = _selects(
+        client, "/medication-requests/?expand=patient,clinician,medication"
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 4
+    assert data[0]["patient"] == {
+        "id": 1,
+        "first_name": "John",
+        "last_name": "Doe",
+        "date_of_birth": "1990-01-01",
+        "sex": "male",
+    }
+    assert all(r["clinician"]["last_name"] == "House" for r in data)
+    assert all(r["medication"]["code"] == "PARA500" for r in data)
+    # The page, then one IN query each for patients, clinicians and medications
+    assert len(statements) == 4
+    assert [s.split("FROM ")[1].split()[0] for s in statements[1:]] == [
+        "clinician",
+        "medication",
+        "patient",
+    ]
+
+
+def test_unexpanded_relations_are_left_out(client, sample_medication_requests):
+    data = client.get("/medication-requests/?expand=medication").json()
+
+    assert "medication" in data[0]
+    assert "patient" not in data[0]
+    assert "clinician" not in data[0]
+    assert "patient" not in client.get("/medication-requests/").json()[0]
+
+
+def test_unknown_expansion_is_rejected(client):
+    response = client.get("/medication-requests/?expand=reason")
+
+    assert response.status_code == 400
+    assert "reason" in response.json()["detail"]
+
+
+def test_single_read_and_lookup_expand(client, sample_medication_requests):
+    request_id = sample_medication_requests[0].id
+
+    response = client.get(f"/medication-requests/{request_id}?expand=patient")
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"1"'
+    assert response.json()["patient"]["id"] == 1
+    assert "medication" not in response.json()
+
+    response = client.post(
+        "/medication-requests/lookup?expand=clinician", json={"ids": [request_id]}
+    )
+    (found,) = response.json()["medication_requests"]
+    assert found["clinician"]["registration_id"] == "MD12345"
+    assert "patient" not in found
+
+
+def test_write_responses_leave_relations_out(client, sample_medication_requests):
+    request_id = sample_medication_requests[0].id
+
+    response = client.patch(
+        f"/medication-requests/{request_id}", json={"status": "on-hold"}
+    )
+
+    assert response.status_code == 200
+    assert "end_date" in response.json()
+    assert not {"patient", "clinician", "medication"} & response.json().keys()
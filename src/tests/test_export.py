@@ -0,0 +1,100 @@
+import io
+from datetime import date
+
+import pytest
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.export import (
+    export_schema,
+    export_stream,
+    iter_record_batches,
+    stream_export,
+)
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def test_record_batches_are_chunked(db_session: Session, sample_medication_requests):
+    batches = list(iter_record_batches(db_session, chunk_size=3))
+
+    assert [batch.num_rows for batch in batches] == [3, 1]
+    assert all(batch.schema == export_schema() for batch in batches)
+
+
+def test_record_batches_apply_filters(db_session: Session, sample_medication_requests):
+    batches = list(
+        iter_record_batches(
+            db_session,
+            prescribed_from=date(2025, 6, 1),
+            prescribed_to=date(2025, 6, 10),
+        )
+    )
+
+    table = pa.Table.from_batches(batches)
+    assert table.column("prescribed_date").to_pylist() == [
+        date(2025, 6, 9),
+        date(2025, 6, 2),
+    ]
+
+
+def test_export_parquet_endpoint(client, sample_medication_requests):
+    response = client.get("/medication-requests/export?status=active")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 1
+    assert table.schema.field("prescribed_date").type == pa.date32()
+    assert pa.types.is_dictionary(table.schema.field("status").type)
+    row = table.to_pylist()[0]
+    assert row["status"] == "active"
+    assert row["medication_code_name"] == "Paracetamol"
+    assert row["clinician_last_name"] == "House"
+    assert row["end_date"] is None
+
+
+def test_export_matches_any_of_several_statuses(client, sample_medication_requests):
+    response = client.get(
+        "/medication-requests/export?format=arrow&status=active&status=on-hold"
+    )
+    assert response.status_code == 200
+
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert sorted(table.column("status").to_pylist()) == ["active", "on-hold"]
+
+
+def test_export_stream_closes_its_own_session(db_session: Session):
+    sessions = []
+
+    def session_factory():
+        sessions.append(Session(bind=db_session.get_bind()))
+        return sessions[-1]
+
+    chunks = export_stream(session_factory, "arrow")
+    assert sessions == []
+
+    b"".join(chunks)
+    assert len(sessions) == 1
+    assert not sessions[0].in_transaction()
+
+
+def test_export_arrow_stream_endpoint(client, sample_medication_requests):
+    response = client.get("/medication-requests/export?format=arrow")
+    assert response.status_code == 200
+
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.num_rows == 4
+
+
+def test_export_empty_result(db_session: Session):
+    data = b"".join(stream_export(iter_record_batches(db_session), "parquet"))
+
+    table = pq.read_table(io.BytesIO(data))
+    assert table.num_rows == 0
+    assert table.schema == export_schema()
+
+
+def test_export_invalid_format(client):
+    response = client.get("/medication-requests/export?format=csv")
+    assert response.status_code == 422
@@ -0,0 +1,198 @@
+import io
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.importer import (
+    ImportFileError,
+    _copy_rows,
+    import_medication_requests,
+    iter_rows,
+)
+from patient_medication_app.core.models import MedicationRequest
+from patient_medication_app.schemas.medication_request import MedicationRequestCreate
+
+CSV_HEADER = (
+    "patient_reference,clinician_reference,medication_reference,reason,"
+    "prescribed_date,start_date,end_date,frequency,status\n"
+)
+
+
+def _ndjson_row(**overrides) -> str:
+    row = {
+        "patient_reference": 1,
+        "clinician_reference": "MD12345",
+        "medication_reference": "PARA500",
+        "reason": "Headache",
+        "prescribed_date": "2025-06-16",
+        "start_date": "2025-06-16",
+        "frequency": "twice daily",
+        "status": "active",
+    }
+    row.update(overrides)
+    return json.dumps(row)
+
+
+def test_iter_rows_csv_treats_blank_cells_as_missing():
+    data = (
+        CSV_HEADER + "1,MD12345,PARA500,Headache,2025-06-16,2025-06-16,,daily,active\n"
+    )
+
+    rows = list(iter_rows(io.BytesIO(data.encode()), "csv"))
+
+    assert len(rows) == 1
+    assert "end_date" not in rows[0]
+    assert rows[0]["reason"] == "Headache"
+
+
+def test_import_reports_per_row_errors(
+    db_session: Session, sample_patient, sample_clinician, sample_medication
+):
+    lines = [
+        _ndjson_row(),
+        _ndjson_row(patient_reference=999),
+        _ndjson_row(clinician_reference="MD00001"),
+        _ndjson_row(medication_reference="MED00001"),
+        _ndjson_row(status="not-a-status"),
+        "{not json",
+        _ndjson_row(reason="Second"),
+    ]
+    data = "\n".join(lines).encode()
+
+    progress = []
+    report = import_medication_requests(
+        db_session,
+        iter_rows(io.BytesIO(data), "ndjson"),
+        chunk_size=3,
+        progress=lambda r: progress.append(r.rows_read),
+    )
+
+    assert report.rows_read == 7
+    assert report.rows_imported == 2
+    assert report.rows_failed == 5
+    errors = {error.row: error.error for error in report.errors}
+    assert errors[2] == "Patient with id 999 not found"
+    assert errors[3] == "Clinician with registration ID MD00001 not found"
+    assert errors[4] == "Medication with code MED00001 not found"
+    assert errors[5].startswith("status:")
+    assert 6 in errors
+    assert progress == [3, 6, 7]
+    assert {r.reason for r in db_session.query(MedicationRequest).all()} == {
+        "Headache",
+        "Second",
+    }
+
+
+def test_import_truncates_error_list(
+    db_session: Session, sample_patient, sample_clinician, sample_medication
+):
+    data = "\n".join(_ndjson_row(patient_reference=999) for _ in range(5)).encode()
+
+    report = import_medication_requests(
+        db_session, iter_rows(io.BytesIO(data), "ndjson"), max_errors=2
+    )
+
+    assert report.rows_failed == 5
+    assert len(report.errors) == 2
+
+
+def test_import_endpoint_csv(
+    client, db_session: Session, sample_patient, sample_clinician, sample_medication
+):
+    data = (
+        CSV_HEADER
+        + "1,MD12345,PARA500,Headache,2025-06-16,2025-06-16,2025-06-30,daily,active\n"
+        + "1,MD12345,PARA500,Fever,2025-06-17,2025-06-17,,daily,on-hold\n"
+    )
+
+    response = client.post(
+        "/medication-requests/import",
+        files={"file": ("requests.csv", data.encode(), "text/csv")},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "rows_read": 2,
+        "rows_imported": 2,
+        "rows_failed": 0,
+        "errors": [],
+    }
+    response = client.get("/medication-requests/?status=on-hold")
+    assert response.json()[0]["end_date"] is None
+
+
+def test_import_endpoint_unknown_format(client):
+    response = client.post(
+        "/medication-requests/import",
+        files={"file": ("requests.txt", b"", "text/plain")},
+    )
+    assert response.status_code == 400
+
+
+def test_import_stops_at_undecodable_data(
+    db_session: Session, sample_patient, sample_clinician, sample_medication
+):
+    data = (_ndjson_row() + "\n").encode() * 100 + b"\xff\xfe not utf-8\n"
+
+    with pytest.raises(ImportFileError, match="not UTF-8") as raised:
+        import_medication_requests(
+            db_session, iter_rows(io.BytesIO(data), "ndjson"), chunk_size=10
+        )
+
+    # The chunks before the bad data stay imported
+    imported = raised.value.report.rows_imported
+    assert imported >= 90
+    assert db_session.query(MedicationRequest).count() == imported
+
+
+@pytest.mark.parametrize(
+    "filename, data, error",
+    [
+        ("requests.csv", b"\xff\xfe\x00p\x00a", "not UTF-8"),
+        ("requests.csv", CSV_HEADER.encode() + b"1," + b"x" * 200_000, "CSV"),
+        ("requests.ndjson", b"\x80\x81\n", "not UTF-8"),
+    ],
+)
+def test_import_endpoint_rejects_malformed_files(client, filename, data, error):
+    response = client.post(
+        "/medication-requests/import",
+        files={"file": (filename, data, "application/octet-stream")},
+    )
+
+    assert response.status_code == 422
+    assert error in response.json()["detail"]["detail"]
+    assert response.json()["detail"]["report"]["rows_imported"] == 0
+
+
+def test_copy_writes_null_as_an_unquoted_empty_field():
+    copied = []
+
+    class Cursor:
+        def copy_expert(self, sql, file):
+            copied.append((sql, file.read()))
+
+        def close(self):
+            pass
+
+    class PostgresSession:
+        def connection(self):
+            driver_connection = SimpleNamespace(cursor=Cursor)
+            return SimpleNamespace(
+                connection=SimpleNamespace(driver_connection=driver_connection)
+            )
+
+    row = MedicationRequestCreate.model_validate_json(
+        _ndjson_row(reason='Said "ouch"')
+    ).model_dump()
+    _copy_rows(PostgresSession(), [row])
+
+    sql, data = copied[0]
+    assert "FORMAT csv" in sql
+    # end_date is NULL: an empty field, where a quoted one would be empty text
+    assert data == (
+        '"1","MD12345","PARA500","Said ""ouch""","2025-06-16","2025-06-16",,'
+        '"twice daily","active"\n'
+    )
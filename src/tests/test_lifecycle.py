@@ -0,0 +1,129 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.cache import MemoryResultCache
+from patient_medication_app.core.leases import acquire_lease, release_lease
+from patient_medication_app.core.lifecycle import (
+    LifecycleScheduler,
+    expire_requests,
+    expiry_lag_days,
+)
+from patient_medication_app.core.models import MedicationRequest
+from patient_medication_app.core.read_model import (
+    check_read_model,
+    rebuild_read_model,
+)
+from patient_medication_app.settings import settings
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def ended_requests(db_session: Session, sample_medication_requests):
+    """Active requests that ended on 1 and 10 July, plus one ending 31 July."""
+    requests = [
+        MedicationRequest(
+            patient_reference=1,
+            clinician_reference="MD12345",
+            medication_reference="PARA500",
+            reason="Test reason",
+            prescribed_date=date(2025, 6, 1),
+            start_date=date(2025, 6, 1),
+            end_date=end_date,
+            frequency="daily",
+            status="active",
+        )
+        for end_date in [date(2025, 7, 1), date(2025, 7, 10), date(2025, 7, 31)]
+    ]
+    db_session.add_all(requests)
+    db_session.commit()
+    return [request.id for request in requests]
+
+
+def _statuses(db_session: Session, ids: list[int]) -> list[str]:
+    return list(
+        db_session.scalars(
+            select(MedicationRequest.status)
+            .where(MedicationRequest.id.in_(ids))
+            .order_by(MedicationRequest.id)
+        )
+    )
+
+
+def test_expire_requests(db_session: Session, ended_requests):
+    today = date(2025, 7, 20)
+    assert expiry_lag_days(db_session, today=today) == 19
+
+    assert expire_requests(db_session, batch_size=1, max_batches=1, today=today) == 1
+    assert expiry_lag_days(db_session, today=today) == 10
+    assert expire_requests(db_session, batch_size=1, today=today) == 1
+    assert expiry_lag_days(db_session, today=today) == 0
+
+    assert _statuses(db_session, ended_requests) == ["completed", "completed", "active"]
+    versions = db_session.scalars(
+        select(MedicationRequest.version).where(
+            MedicationRequest.id.in_(ended_requests)
+        )
+    ).all()
+    assert sorted(versions) == [1, 2, 2]
+
+
+def test_expire_requests_refreshes_read_model(
+    monkeypatch, db_session: Session, ended_requests
+):
+    monkeypatch.setattr(settings, "read_model_enabled", True)
+    rebuild_read_model(db_session)
+
+    expire_requests(db_session, today=date(2025, 7, 20))
+
+    assert check_read_model(db_session) == {"missing": 0, "orphaned": 0, "stale": 0}
+
+
+def test_lease_is_exclusive(db_session: Session):
+    assert acquire_lease(db_session, "job", "worker-1", ttl=60)
+    assert not acquire_lease(db_session, "job", "worker-2", ttl=60)
+    # The holder renews its lease
+    assert acquire_lease(db_session, "job", "worker-1", ttl=60)
+
+    release_lease(db_session, "job", "worker-1")
+    assert acquire_lease(db_session, "job", "worker-2", ttl=60)
+
+
+def test_expired_lease_is_taken_over(db_session: Session):
+    assert acquire_lease(db_session, "job", "worker-1", ttl=-1)
+    assert acquire_lease(db_session, "job", "worker-2", ttl=60)
+    assert not acquire_lease(db_session, "job", "worker-1", ttl=60)
+
+
+def test_only_the_lease_holder_runs(db_session: Session, ended_requests):
+    first = LifecycleScheduler(TestingSessionLocal)
+    second = LifecycleScheduler(TestingSessionLocal)
+
+    assert first.run_once() == 3
+    assert second.run_once() == 0
+
+    assert first.metrics()["processed"] == 3
+    assert first.metrics()["lag_days"] == 0
+    assert second.metrics()["skipped"] == 1
+
+
+def test_expiry_invalidates_the_cache_of_every_worker(
+    monkeypatch, client, db_session: Session, ended_requests
+):
+    assert len(client.get("/medication-requests/?status=completed").json()) == 1
+
+    # The lease holder is another worker, with a cache of its own
+    monkeypatch.setattr(
+        "patient_medication_app.core.lifecycle.result_cache",
+        MemoryResultCache(max_bytes=100, ttl=60),
+    )
+    assert LifecycleScheduler(TestingSessionLocal).run_once() == 3
+
+    assert len(client.get("/medication-requests/?status=completed").json()) == 4
+
+
+def test_scheduler_metrics_are_exposed(client):
+    metrics = client.get("/metrics").json()
+    assert metrics["lifecycle"]["running"] is False
@@ -0,0 +1,231 @@
+from datetime import date
+
+import pytest
+import sqlalchemy as sa
+from alembic import command
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import func, inspect, select
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.models import MedicationRequest, MigrationCheckpoint
+from patient_medication_app.database.online_migrations import (
+    Backfill,
+    create_index_concurrently,
+    drop_index_concurrently,
+)
+from tests.conftest import engine
+
+
+@pytest.fixture
+def requests(db_session: Session, sample_patient, sample_clinician, sample_medication):
+    db_session.add_all(
+        MedicationRequest(
+            patient_reference=sample_patient.id,
+            clinician_reference="MD12345",
+            medication_reference="PARA500",
+            reason="Test reason",
+            prescribed_date=date(2025, 6, 16),
+            start_date=date(2025, 6, 16),
+            frequency="twice daily",
+            status="active" if i % 5 else "completed",
+        )
+        for i in range(25)
+    )
+    db_session.commit()
+
+
+@pytest.fixture
+def operations(db_session: Session):
+    """Run migration operations, like a migration's ``op``, on the test database."""
+    with engine.connect() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            yield connection
+        connection.commit()
+
+
+def _frequencies(db_session: Session) -> dict[str, int]:
+    return dict(
+        db_session.execute(
+            select(MedicationRequest.frequency, func.count()).group_by(
+                MedicationRequest.frequency
+            )
+        ).all()
+    )
+
+
+def test_backfill_runs_in_resumable_batches(db_session: Session, requests):
+    job = Backfill(
+        "test:frequency", "medication_request", "frequency = 'daily'", batch_size=10
+    )
+
+    with engine.connect() as connection:
+        assert job.run(connection, max_batches=1) == 10
+        checkpoint = db_session.get(MigrationCheckpoint, "test:frequency")
+        assert checkpoint.last_key == 10
+        # Resumes after the checkpoint
+        assert job.run(connection) == 15
+        assert job.run(connection) == 0
+
+    db_session.expire_all()
+    assert _frequencies(db_session) == {"daily": 25}
+    assert db_session.get(MigrationCheckpoint, "test:frequency").last_key == 25
+
+
+def test_backfill_only_updates_matching_rows(db_session: Session, requests):
+    job = Backfill(
+        "test:completed",
+        "medication_request",
+        "frequency = 'once'",
+        where="status = 'completed'",
+        batch_size=7,
+    )
+
+    with engine.connect() as connection:
+        assert job.run(connection) == 5
+
+    assert _frequencies(db_session) == {"once": 5, "twice daily": 20}
+
+
+def test_backfill_estimate_changes_nothing(db_session: Session, requests):
+    job = Backfill(
+        "test:estimate",
+        "medication_request",
+        "frequency = 'daily'",
+        batch_size=10,
+        pause=0.5,
+    )
+
+    with engine.connect() as connection:
+        estimate = job.estimate(connection, sample_batches=2)
+
+    assert estimate.rows == 25
+    assert estimate.batches == 3
+    assert estimate.sampled_batches == 2
+    assert estimate.estimated_seconds == pytest.approx(
+        3 * (estimate.seconds_per_batch + 0.5)
+    )
+    assert _frequencies(db_session) == {"twice daily": 25}
+    assert db_session.get(MigrationCheckpoint, "test:estimate") is None
+
+
+def test_create_index_concurrently_is_idempotent(operations):
+    for _ in range(2):
+        create_index_concurrently(
+            "ix_medication_request_reason",
+            "medication_request",
+            ["reason"],
+            where="status = 'active'",
+        )
+
+    indexes = {i["name"] for i in inspect(operations).get_indexes("medication_request")}
+    assert "ix_medication_request_reason" in indexes
+
+    drop_index_concurrently("ix_medication_request_reason", "medication_request")
+    indexes = {i["name"] for i in inspect(operations).get_indexes("medication_request")}
+    assert "ix_medication_request_reason" not in indexes
+
+
+MIGRATION_ENV = """
+from alembic import context
+
+context.configure(connection=context.config.attributes["connection"])
+with context.begin_transaction():
+    context.run_migrations()
+"""
+
+MIGRATION = """
+from alembic import op
+import sqlalchemy as sa
+
+from patient_medication_app.database.online_migrations import (
+    add_not_null_column,
+    backfill,
+)
+
+revision = '0a1b2c3d4e5f'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+{upgrade}
+"""
+
+
+def _run_migration(tmp_path, upgrade: str) -> list[str]:
+    """Upgrade the test database with a one-off migration, as ``alembic`` does."""
+    (tmp_path / "versions").mkdir()
+    (tmp_path / "env.py").write_text(MIGRATION_ENV)
+    (tmp_path / "script.py.mako").write_text("")
+    (tmp_path / "versions" / "0a1b2c3d4e5f_test.py").write_text(
+        MIGRATION.format(upgrade=upgrade)
+    )
+    config = Config()
+    config.set_main_option("script_location", str(tmp_path))
+
+    # Like the project's env.py, leave committing to the migration context
+    with engine.connect() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+
+    with engine.connect() as connection:
+        applied = list(
+            connection.scalars(sa.text("SELECT version_num FROM alembic_version"))
+        )
+        connection.execute(sa.text("DROP TABLE alembic_version"))
+        connection.commit()
+    return applied
+
+
+def test_backfill_in_migration_keeps_migration_transaction(
+    db_session: Session, requests, tmp_path
+):
+    applied = _run_migration(
+        tmp_path,
+        """
+    backfill('test:migration', 'medication_request', "frequency = 'daily'", batch_size=10)
+    op.create_index('ix_medication_request_reason', 'medication_request', ['reason'])
+""",
+    )
+
+    # The operations after the backfill and the version row were committed
+    assert applied == ["0a1b2c3d4e5f"]
+    indexes = inspect(engine).get_indexes("medication_request")
+    assert "ix_medication_request_reason" in {index["name"] for index in indexes}
+    db_session.expire_all()
+    assert _frequencies(db_session) == {"daily": 25}
+
+
+def test_add_not_null_column(db_session: Session, tmp_path):
+    with engine.begin() as connection:
+        connection.execute(
+            sa.text(
+                "INSERT INTO scheduler_lease (name, owner, expires_at) "
+                "VALUES ('a', 'worker-1', '2025-01-01'), "
+                "('b', 'worker-2', '2025-01-01')"
+            )
+        )
+
+    applied = _run_migration(
+        tmp_path,
+        """
+    add_not_null_column(
+        'scheduler_lease',
+        sa.Column('host', sa.String(100), nullable=False),
+        'owner',
+        key='rowid',
+        batch_size=1,
+    )
+""",
+    )
+
+    assert applied == ["0a1b2c3d4e5f"]
+    columns = {c["name"]: c for c in inspect(engine).get_columns("scheduler_lease")}
+    assert columns["host"]["nullable"] is False
+    with engine.connect() as connection:
+        assert connection.execute(
+            sa.text("SELECT name, host FROM scheduler_lease ORDER BY name")
+        ).all() == [("a", "worker-1"), ("b", "worker-2")]
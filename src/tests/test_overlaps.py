@@ -0,0 +1,141 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import Select, event
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.models import MedicationRequest, Patient
+from patient_medication_app.core.overlaps import (
+    Overlap,
+    audit_overlapping_requests,
+    find_overlapping_requests,
+)
+from patient_medication_app.settings import settings
+
+
+def _request_data(**overrides) -> dict:
+    data = {
+        "patient_reference": 1,
+        "clinician_reference": "MD12345",
+        "medication_reference": "PARA500",
+        "reason": "Test reason",
+        "prescribed_date": "2025-06-20",
+        "start_date": "2025-06-20",
+        "end_date": "2025-06-30",
+        "frequency": "twice daily",
+        "status": "active",
+    }
+    data.update(overrides)
+    return data
+
+
+@pytest.mark.parametrize(
+    "start_date, end_date, expected",
+    [
+        # The active sample request starts on 16 June with no end date
+        (date(2025, 6, 1), date(2025, 6, 15), False),
+        (date(2025, 6, 1), date(2025, 6, 16), True),
+        (date(2026, 1, 1), None, True),
+    ],
+)
+def test_find_overlapping_requests(
+    db_session: Session, sample_medication_requests, start_date, end_date, expected
+):
+    overlapping = find_overlapping_requests(
+        db_session, 1, "PARA500", start_date, end_date
+    )
+    assert overlapping == ([sample_medication_requests[0].id] if expected else [])
+
+
+def test_inactive_requests_do_not_overlap(
+    db_session: Session, sample_medication_requests
+):
+    # The completed, on-hold and cancelled samples all start before June 16
+    assert (
+        find_overlapping_requests(
+            db_session, 1, "PARA500", date(2025, 5, 1), date(2025, 6, 10)
+        )
+        == []
+    )
+
+
+def test_create_warns_about_overlaps(client, sample_medication_requests):
+    active_id = sample_medication_requests[0].id
+    response = client.post("/medication-requests/", json=_request_data())
+
+    assert response.status_code == 200
+    assert response.headers["x-duplicate-therapy"] == str(active_id)
+
+    response = client.post(
+        "/medication-requests/",
+        json=_request_data(start_date="2025-06-01", end_date="2025-06-10"),
+    )
+    assert "x-duplicate-therapy" not in response.headers
+
+
+def test_create_rejects_overlaps(monkeypatch, client, sample_medication_requests):
+    monkeypatch.setattr(settings, "overlap_check_mode", "reject")
+
+    response = client.post("/medication-requests/", json=_request_data())
+    assert response.status_code == 409
+    assert "overlapping" in response.json()["detail"]
+
+    response = client.post(
+        "/medication-requests/", json=_request_data(status="on-hold")
+    )
+    assert response.status_code == 200
+
+
+def test_reject_mode_locks_the_patient_before_checking(
+    monkeypatch, client, sample_medication_requests
+):
+    monkeypatch.setattr(settings, "overlap_check_mode", "reject")
+    statements = []
+
+    def capture(orm_execute_state):
+        statements.append(orm_execute_state.statement)
+
+    event.listen(Session, "do_orm_execute", capture)
+    try:
+        response = client.post(
+            "/medication-requests/",
+            json=_request_data(start_date="2025-06-01", end_date="2025-06-10"),
+        )
+    finally:
+        event.remove(Session, "do_orm_execute", capture)
+
+    assert response.status_code == 200
+    selects = [
+        (statement._for_update_arg is not None, statement.get_final_froms())
+        for statement in statements
+        if isinstance(statement, Select)
+    ]
+    lock = selects.index((True, [Patient.__table__]))
+    check = next(
+        i
+        for i, (_, froms) in enumerate(selects)
+        if MedicationRequest.__table__ in froms
+    )
+    assert lock < check
+
+
+def test_audit_overlapping_requests(db_session: Session, sample_medication_requests):
+    assert audit_overlapping_requests(db_session) == []
+
+    duplicate = MedicationRequest(
+        patient_reference=1,
+        clinician_reference="MD12345",
+        medication_reference="PARA500",
+        reason="Duplicate",
+        prescribed_date=date(2025, 7, 1),
+        start_date=date(2025, 7, 1),
+        end_date=date(2025, 7, 14),
+        frequency="daily",
+        status="active",
+    )
+    db_session.add(duplicate)
+    db_session.commit()
+
+    assert audit_overlapping_requests(db_session) == [
+        Overlap(1, "PARA500", sample_medication_requests[0].id, duplicate.id)
+    ]
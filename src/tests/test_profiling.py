@@ -0,0 +1,78 @@
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from patient_medication_app.middleware import ProfilingMiddleware
+from patient_medication_app.middleware.profiling import StackSampler
+
+
+def _busy_wait(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def _make_app(output_dir, **kwargs) -> FastAPI:
+    test_app = FastAPI()
+
+    @test_app.get("/items")
+    def list_items():
+        time.sleep(0.05)
+        return []
+
+    test_app.add_middleware(ProfilingMiddleware, output_dir=str(output_dir), **kwargs)
+    return test_app
+
+
+def test_sampler_collects_stacks_of_other_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_wait, args=(stop,))
+    worker.start()
+
+    sampler = StackSampler(interval=0.001, max_duration=5)
+    sampler.start()
+    time.sleep(0.05)
+    samples = sampler.stop()
+    stop.set()
+    worker.join()
+
+    assert any("_busy_wait" in stack for stack in samples)
+    assert not any(
+        "StackSampler" in stack or "run (profiling.py" in stack for stack in samples
+    )
+
+
+def test_profiles_requests_with_token(tmp_path):
+    client = TestClient(_make_app(tmp_path, token="secret", interval=0.001))
+
+    response = client.get("/items", headers={"X-Profile": "secret"})
+
+    assert response.status_code == 200
+    profile = tmp_path / f"{response.headers['x-profile-id']}.folded"
+    lines = profile.read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert any("list_items" in line for line in lines)
+
+
+def test_ignores_requests_without_valid_token(tmp_path):
+    client = TestClient(_make_app(tmp_path, token="secret"))
+
+    assert "x-profile-id" not in client.get("/items").headers
+    response = client.get("/items", headers={"X-Profile": "wrong"})
+    assert "x-profile-id" not in response.headers
+    response = client.get("/items", headers={"X-Profile": "café".encode("latin-1")})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_sampling_rate_and_retention(tmp_path):
+    client = TestClient(_make_app(tmp_path, sample_rate=1.0, max_profiles=2))
+
+    for _ in range(4):
+        assert "x-profile-id" in client.get("/items").headers
+
+    assert len(list(tmp_path.glob("*.folded"))) == 2
@@ -0,0 +1,107 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core import queries
+from patient_medication_app.core.models import (
+    MedicationRequest,
+    MedicationRequestArchive,
+    MedicationRequestListing,
+)
+from patient_medication_app.core.queries import (
+    MedicationRequestFilters,
+    count_medication_requests,
+    medication_request_filters,
+    planner_row_estimate,
+)
+from tests.conftest import engine
+
+
+@pytest.mark.parametrize(
+    "model", [MedicationRequest, MedicationRequestArchive, MedicationRequestListing]
+)
+@pytest.mark.parametrize(
+    "filters, index",
+    [
+        (MedicationRequestFilters(statuses=("active", "on-hold")), "status"),
+        (MedicationRequestFilters(patient_reference=1), "patient"),
+        (MedicationRequestFilters(clinician_reference="MD12345"), "clinician"),
+        (MedicationRequestFilters(medication_reference="PARA500"), "medication"),
+        (MedicationRequestFilters(prescribed_from=date(2025, 6, 1)), "prescribed"),
+        (MedicationRequestFilters(start_to=date(2025, 6, 1)), "start_date"),
+        (MedicationRequestFilters(end_from=date(2025, 6, 1)), "end_date"),
+    ],
+)
+def test_every_filter_uses_an_index(db_session: Session, model, filters, index):
+    statement = (
+        select(model.id)
+        .where(*medication_request_filters(model, filters))
+        .compile(engine, compile_kwargs={"literal_binds": True})
+    )
+    with engine.connect() as connection:
+        plan = " ".join(
+            row[-1]
+            for row in connection.execute(text(f"EXPLAIN QUERY PLAN {statement}"))
+        )
+
+    assert f"INDEX ix_{model.__tablename__}_{index}" in plan
+
+
+def test_count_uses_planner_estimate_above_threshold(
+    monkeypatch, db_session: Session, sample_medication_requests
+):
+    filters = MedicationRequestFilters(statuses=("active",))
+    assert count_medication_requests(db_session, MedicationRequest, filters) == (
+        1,
+        False,
+    )
+
+    monkeypatch.setattr(queries, "planner_row_estimate", lambda db, statement: 250)
+    assert count_medication_requests(
+        db_session, MedicationRequest, filters, estimate_above=100
+    ) == (250, True)
+    # Small estimates are counted exactly
+    assert count_medication_requests(
+        db_session, MedicationRequest, filters, estimate_above=1000
+    ) == (1, False)
+
+
+def test_planner_estimate_renders_in_parameters():
+    executed = []
+
+    class Result:
+        def scalar(self):
+            return [{"Plan": {"Plan Rows": 42}}]
+
+    class Connection:
+        def exec_driver_sql(self, sql, params):
+            executed.append((sql, params))
+            return Result()
+
+    class Bind:
+        dialect = postgresql.dialect()
+
+    class PostgresSession:
+        def get_bind(self):
+            return Bind()
+
+        def connection(self):
+            return Connection()
+
+    filters = MedicationRequestFilters(statuses=("active", "on-hold", "stopped"))
+    statement = select(MedicationRequest.id).where(
+        *medication_request_filters(MedicationRequest, filters)
+    )
+
+    assert planner_row_estimate(PostgresSession(), statement) == 42
+    ((sql, params),) = executed
+    assert sql.startswith("EXPLAIN (FORMAT JSON) SELECT")
+    assert "POSTCOMPILE" not in sql
+    assert sorted(value for value in params.values()) == [
+        "active",
+        "on-hold",
+        "stopped",
+    ]
@@ -0,0 +1,126 @@
+import pytest
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.archive import archive_closed_requests
+from patient_medication_app.core.importer import import_medication_requests
+from patient_medication_app.core.models import (
+    MedicationRequest,
+    MedicationRequestListing,
+)
+from patient_medication_app.core.read_model import (
+    check_read_model,
+    rebuild_read_model,
+)
+from patient_medication_app.settings import settings
+
+
+@pytest.fixture
+def read_model(monkeypatch):
+    monkeypatch.setattr(settings, "read_model_enabled", True)
+
+
+def test_rebuild_and_check(db_session: Session, sample_medication_requests):
+    assert check_read_model(db_session) == {"missing": 4, "orphaned": 0, "stale": 0}
+
+    assert rebuild_read_model(db_session, batch_size=3) == 4
+
+    assert check_read_model(db_session) == {"missing": 0, "orphaned": 0, "stale": 0}
+    listing = db_session.query(MedicationRequestListing).first()
+    assert listing.medication_code_name == "Paracetamol"
+    assert listing.clinician_last_name == "House"
+
+
+def test_check_detects_stale_rows(db_session: Session, sample_medication_requests):
+    rebuild_read_model(db_session)
+    db_session.execute(
+        update(MedicationRequest)
+        .where(MedicationRequest.id == sample_medication_requests[0].id)
+        .values(frequency="hourly")
+    )
+    db_session.commit()
+
+    assert check_read_model(db_session)["stale"] == 1
+    rebuild_read_model(db_session)
+    assert check_read_model(db_session)["stale"] == 0
+
+
+def test_writes_keep_listing_in_step(
+    read_model, client, db_session: Session, sample_medication_requests
+):
+    rebuild_read_model(db_session)
+    request_data = {
+        "patient_reference": 1,
+        "clinician_reference": "MD12345",
+        "medication_reference": "PARA500",
+        "reason": "New",
+        "prescribed_date": "2025-06-20",
+        "start_date": "2025-06-20",
+        "frequency": "daily",
+        "status": "active",
+    }
+    created = client.post("/medication-requests/", json=request_data).json()
+    client.patch(f"/medication-requests/{created['id']}", json={"status": "on-hold"})
+    archive_closed_requests(db_session, older_than_days=0)
+
+    assert check_read_model(db_session) == {"missing": 0, "orphaned": 0, "stale": 0}
+    response = client.get("/medication-requests/?status=on-hold")
+    assert sorted(r["reason"] for r in response.json()) == ["New", "Test reason 3"]
+    assert all(r["medication_code_name"] == "Paracetamol" for r in response.json())
+
+
+def test_renames_propagate_to_listing(
+    read_model,
+    db_session: Session,
+    sample_medication,
+    sample_clinician,
+    sample_medication_requests,
+):
+    rebuild_read_model(db_session)
+
+    sample_medication.code_name = "Acetaminophen"
+    sample_clinician.last_name = "Cuddy"
+    db_session.commit()
+
+    assert check_read_model(db_session)["stale"] == 0
+    names = {
+        (r.medication_code_name, r.clinician_last_name)
+        for r in db_session.query(MedicationRequestListing).all()
+    }
+    assert names == {("Acetaminophen", "Cuddy")}
+
+
+def test_lookup_reads_from_listing(
+    read_model, client, db_session: Session, sample_medication_requests
+):
+    rebuild_read_model(db_session)
+    ids = [sample_medication_requests[1].id, 99999]
+
+    response = client.post("/medication-requests/lookup", json={"ids": ids})
+
+    data = response.json()
+    assert [r["id"] for r in data["medication_requests"]] == ids[:1]
+    assert data["not_found"] == [99999]
+
+
+def test_import_adds_listing_rows(
+    read_model, db_session: Session, sample_medication_requests
+):
+    rebuild_read_model(db_session)
+    rows = [
+        {
+            "patient_reference": 1,
+            "clinician_reference": "MD12345",
+            "medication_reference": "PARA500",
+            "reason": f"Imported {i}",
+            "prescribed_date": "2025-06-20",
+            "start_date": "2025-06-20",
+            "frequency": "daily",
+            "status": "active",
+        }
+        for i in range(3)
+    ]
+
+    import_medication_requests(db_session, rows, chunk_size=2)
+
+    assert check_read_model(db_session) == {"missing": 0, "orphaned": 0, "stale": 0}
@@ -1,98 +1,10 @@
 from datetime import date
 
-import pytest
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
-from patient_medication_app.core.models import (
-    Clinician,
-    Medication,
-    MedicationRequest,
-    Patient,
-)
-
-
-@pytest.fixture
-def sample_patient(db_session: Session):
-    patient = Patient(
-        first_name="John", last_name="Doe", date_of_birth=date(1990, 1, 1), sex="male"
-    )
-    db_session.add(patient)
-    db_session.commit()
-    return patient
-
-
-@pytest.fixture
-def sample_clinician(db_session: Session):
-    clinician = Clinician(first_name="Dr", last_name="House", registration_id="MD12345")
-    db_session.add(clinician)
-    db_session.commit()
-    return clinician
-
-
-@pytest.fixture
-def sample_medication(db_session: Session):
-    medication = Medication(
-        code="PARA500",
-        code_name="Paracetamol",
-        code_system="SNOMED-CT",
-        strength_value=500,
-        strength_unit="mg",
-        form="tablet",
-    )
-    db_session.add(medication)
-    db_session.commit()
-    return medication
-
-
-@pytest.fixture
-def sample_medication_requests(
-    db_session: Session, sample_patient, sample_clinician, sample_medication
-):
-    request1 = MedicationRequest(
-        patient_reference=sample_patient.id,
-        clinician_reference=sample_clinician.registration_id,
-        medication_reference=sample_medication.code,
-        reason="Test reason",
-        prescribed_date=date(2025, 6, 16),
-        start_date=date(2025, 6, 16),
-        frequency="twice daily",
-        status="active",
-    )
-    request2 = MedicationRequest(
-        patient_reference=sample_patient.id,
-        clinician_reference=sample_clinician.registration_id,
-        medication_reference=sample_medication.code,
-        reason="Test reason 2",
-        prescribed_date=date(2025, 6, 9),
-        start_date=date(2025, 6, 9),
-        frequency="twice daily",
-        status="completed",
-    )
-    request3 = MedicationRequest(
-        patient_reference=sample_patient.id,
-        clinician_reference=sample_clinician.registration_id,
-        medication_reference=sample_medication.code,
-        reason="Test reason 3",
-        prescribed_date=date(2025, 6, 2),
-        start_date=date(2025, 6, 2),
-        frequency="twice daily",
-        status="on-hold",
-    )
-    request4 = MedicationRequest(
-        patient_reference=sample_patient.id,
-        clinician_reference=sample_clinician.registration_id,
-        medication_reference=sample_medication.code,
-        reason="Test reason 4",
-        prescribed_date=date(2025, 5, 16),
-        start_date=date(2025, 5, 16),
-        frequency="twice daily",
-        status="cancelled",
-    )
-    db_session.add_all([request1, request2, request3, request4])
-    db_session.commit()
-    for request in [request1, request2, request3, request4]:
-        db_session.refresh(request)
-    return [request1, request2, request3, request4]
+from patient_medication_app.settings import settings
+from tests.conftest import engine
 
 
 class TestCreateMedicationRequest:
@@ -128,6 +40,47 @@ class TestCreateMedicationRequest:
         assert data["medication_code_name"] == medication_code_name
         assert data["clinician_first_name"] == clinician_first_name
 
+    def test_create_medication_request_statements(
+        self,
+        monkeypatch,
+        client,
+        sample_patient,
+        sample_clinician,
+        sample_medication,
+    ):
+        request_data = {
+            "patient_reference": sample_patient.id,
+            "clinician_reference": sample_clinician.registration_id,
+            "medication_reference": sample_medication.code,
+            "reason": "Test reason",
+            "prescribed_date": "2025-06-16",
+            "start_date": "2025-06-16",
+            "frequency": "twice daily",
+            "status": "active",
+        }
+        # The duplicate therapy check adds its own indexed probe
+        monkeypatch.setattr(settings, "overlap_check_mode", "off")
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = client.post("/medication-requests/", json=request_data)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert response.status_code == 200
+        assert response.json()["version"] == 1
+        assert response.json()["clinician_last_name"] == "House"
+        # The request itself, and its audit entry in the outbox; after commit
+        # only the result cache generation is bumped
+        writes = [s for s in statements if "cache_generation" not in s]
+        assert len(writes) == 2
+        assert writes[0].startswith("INSERT INTO medication_request ")
+        assert writes[1].startswith("INSERT INTO medication_request_audit_outbox")
+
     def test_create_medication_request_invalid_patient(
         self, client, db_session: Session, sample_clinician, sample_medication
     ):
@@ -257,9 +210,82 @@ class TestGetMedicationRequests:
         assert "clinician_first_name" in data[0]
         assert "clinician_last_name" in data[0]
 
+    def test_get_medication_requests_filter_by_several_statuses(
+        self, client, sample_medication_requests
+    ):
+        response = client.get("/medication-requests/?status=active&status=on-hold")
+        assert response.status_code == 200
+        assert sorted(r["status"] for r in response.json()) == ["active", "on-hold"]
+
+    def test_get_medication_requests_filter_by_references(
+        self, client, sample_medication_requests
+    ):
+        for params, expected in [
+            ("clinician_reference=MD12345", 4),
+            ("clinician_reference=MD99999", 0),
+            ("medication_reference=PARA500", 4),
+            ("medication_reference=PARA500&patient_reference=2", 0),
+        ]:
+            response = client.get(f"/medication-requests/?{params}")
+            assert response.status_code == 200
+            assert len(response.json()) == expected, params
+
+    def test_get_medication_requests_filter_by_start_and_end_date(
+        self, client, sample_medication_requests
+    ):
+        request_id = sample_medication_requests[0].id
+        client.patch(
+            f"/medication-requests/{request_id}", json={"end_date": "2025-07-31"}
+        )
+
+        response = client.get("/medication-requests/?start_from=2025-06-01")
+        assert len(response.json()) == 3
+        response = client.get(
+            "/medication-requests/?start_from=2025-06-01&start_to=2025-06-10"
+        )
+        assert len(response.json()) == 2
+        response = client.get(
+            "/medication-requests/?end_from=2025-07-01&end_to=2025-07-31"
+        )
+        assert [r["id"] for r in response.json()] == [request_id]
+
+    def test_get_medication_requests_pages_newest_first(
+        self, client, sample_medication_requests
+    ):
+        response = client.get("/medication-requests/")
+        assert [r["prescribed_date"] for r in response.json()] == [
+            "2025-06-16",
+            "2025-06-09",
+            "2025-06-02",
+            "2025-05-16",
+        ]
+
+        response = client.get("/medication-requests/?offset=1&limit=2")
+        assert [r["prescribed_date"] for r in response.json()] == [
+            "2025-06-09",
+            "2025-06-02",
+        ]
+        assert "x-total-count" not in response.headers
+        assert client.get("/medication-requests/?limit=0").status_code == 422
+
+    def test_get_medication_requests_total_count(
+        self, client, sample_medication_requests
+    ):
+        response = client.get(
+            "/medication-requests/?status=active&status=completed&limit=1&count=exact"
+        )
+        assert len(response.json()) == 1
+        assert response.headers["x-total-count"] == "2"
+        assert response.headers["x-total-count-estimated"] == "false"
+
+        # SQLite has no planner estimate, so the count stays exact
+        response = client.get("/medication-requests/?count=estimate")
+        assert response.headers["x-total-count"] == "4"
+        assert response.headers["x-total-count-estimated"] == "false"
+
     def test_get_medication_request_not_found(self, client):
         response = client.get("/medication-requests/99999")
-        assert response.status_code == 405
+        assert response.status_code == 404
 
 
 class TestUpdateMedicationRequest:
@@ -279,6 +305,9 @@ class TestUpdateMedicationRequest:
     def test_update_medication_request_partial_data(
         self, client, sample_medication_requests
     ):
+        # Store values before the session is closed
+        original_status = sample_medication_requests[0].status
+
         # Only update frequency
         update_data = {"frequency": "three times daily"}
         response = client.patch(
@@ -288,7 +317,7 @@ class TestUpdateMedicationRequest:
         data = response.json()
         assert data["frequency"] == "three times daily"
         # Other fields remain unchanged
-        assert data["status"] == sample_medication_requests[0].status
+        assert data["status"] == original_status
 
     def test_update_medication_request_invalid_field(
         self, client, sample_medication_requests
@@ -314,3 +343,214 @@ class TestUpdateMedicationRequest:
             json={"status": "not-a-valid-status"},
         )
         assert response.status_code == 422
+
+    def test_update_medication_request_bumps_version(
+        self, client, sample_medication_requests
+    ):
+        request_id = sample_medication_requests[0].id
+
+        response = client.patch(
+            f"/medication-requests/{request_id}", json={"status": "on-hold"}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["version"] == 2
+        assert response.headers["etag"] == '"2"'
+        assert response.json()["medication_code_name"] == "Paracetamol"
+        assert response.json()["clinician_last_name"] == "House"
+
+    def test_update_medication_request_if_match(
+        self, client, sample_medication_requests
+    ):
+        request_id = sample_medication_requests[0].id
+
+        response = client.patch(
+            f"/medication-requests/{request_id}",
+            json={"status": "on-hold"},
+            headers={"If-Match": '"1"'},
+        )
+        assert response.status_code == 200
+
+        # A second writer still holding version 1 loses
+        response = client.patch(
+            f"/medication-requests/{request_id}",
+            json={"status": "cancelled"},
+            headers={"If-Match": '"1"'},
+        )
+        assert response.status_code == 412
+
+        response = client.patch(
+            f"/medication-requests/{request_id}",
+            json={"status": "cancelled"},
+            headers={"If-Match": 'W/"2"'},
+        )
+        assert response.status_code == 200
+        assert response.json()["status"] == "cancelled"
+
+    def test_update_medication_request_if_match_not_found(self, client):
+        response = client.patch(
+            "/medication-requests/99999",
+            json={"status": "completed"},
+            headers={"If-Match": '"1"'},
+        )
+        assert response.status_code == 404
+
+
+class TestLookupMedicationRequests:
+    def test_lookup_returns_requests_in_input_order(
+        self, client, sample_medication_requests
+    ):
+        ids = [sample_medication_requests[2].id, sample_medication_requests[0].id]
+
+        response = client.post("/medication-requests/lookup", json={"ids": ids})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [r["id"] for r in data["medication_requests"]] == ids
+        assert data["medication_requests"][0]["medication_code_name"] == "Paracetamol"
+        assert data["not_found"] == []
+
+    def test_lookup_reports_missing_ids(self, client, sample_medication_requests):
+        existing_id = sample_medication_requests[1].id
+
+        response = client.post(
+            "/medication-requests/lookup", json={"ids": [99999, existing_id, 99999]}
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [r["id"] for r in data["medication_requests"]] == [existing_id]
+        assert data["not_found"] == [99999]
+
+    def test_lookup_rejects_empty_and_oversized_requests(self, client):
+        assert (
+            client.post("/medication-requests/lookup", json={"ids": []}).status_code
+            == 422
+        )
+        response = client.post(
+            "/medication-requests/lookup", json={"ids": list(range(1001))}
+        )
+        assert response.status_code == 422
+
+
+class TestMedicationRequestBatch:
+    @staticmethod
+    def _create(**overrides) -> dict:
+        data = {
+            "patient_reference": 1,
+            "clinician_reference": "MD12345",
+            "medication_reference": "PARA500",
+            "reason": "Test reason",
+            "prescribed_date": "2025-06-20",
+            "start_date": "2025-06-20",
+            "frequency": "twice daily",
+            "status": "active",
+        }
+        data.update(overrides)
+        return {"op": "create", "data": data}
+
+    def test_batch_applies_operations_in_order(
+        self, client, sample_medication_requests
+    ):
+        first_id = sample_medication_requests[0].id
+        third_id = sample_medication_requests[2].id
+
+        response = client.post(
+            "/medication-requests/batch",
+            json={
+                "operations": [
+                    self._create(),
+                    {"op": "patch", "id": first_id, "data": {"status": "completed"}},
+                    {
+                        "op": "patch",
+                        "id": third_id,
+                        "data": {"frequency": "daily"},
+                        "if_match": 1,
+                    },
+                ]
+            },
+        )
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [result["op"] for result in results] == ["create", "patch", "patch"]
+        created = results[0]["medication_request"]
+        assert created["clinician_last_name"] == "House"
+        assert created["medication_code_name"] == "Paracetamol"
+        assert results[0]["duplicate_therapy"] == [first_id]
+        assert results[1]["medication_request"]["status"] == "completed"
+        assert results[2]["medication_request"]["version"] == 2
+
+        listed = client.get("/medication-requests/").json()
+        assert created["id"] in [row["id"] for row in listed]
+
+    def test_batch_is_rolled_back_on_failure(self, client, sample_medication_requests):
+        first_id = sample_medication_requests[0].id
+
+        response = client.post(
+            "/medication-requests/batch",
+            json={
+                "operations": [
+                    self._create(status="on-hold"),
+                    {"op": "patch", "id": first_id, "data": {"status": "completed"}},
+                    {"op": "patch", "id": first_id, "data": {}, "if_match": 1},
+                ]
+            },
+        )
+
+        assert response.status_code == 412
+        assert response.json()["detail"]["operation"] == 2
+        listed = client.get("/medication-requests/").json()
+        assert len(listed) == 4
+        assert [row["status"] for row in listed if row["id"] == first_id] == ["active"]
+
+    def test_batch_reports_missing_references(
+        self, client, sample_patient, sample_clinician, sample_medication
+    ):
+        response = client.post(
+            "/medication-requests/batch",
+            json={
+                "operations": [
+                    self._create(),
+                    self._create(medication_reference="UNKNOWN"),
+                ]
+            },
+        )
+
+        assert response.status_code == 404
+        assert response.json()["detail"] == {
+            "operation": 1,
+            "detail": "Medication with code UNKNOWN not found",
+        }
+        assert client.get("/medication-requests/").json() == []
+
+    def test_batch_loads_references_once(
+        self, client, sample_patient, sample_clinician, sample_medication
+    ):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = client.post(
+                "/medication-requests/batch",
+                json={"operations": [self._create(status="on-hold")] * 5},
+            )
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert response.status_code == 200
+        assert len(response.json()["results"]) == 5
+        lookups = [s for s in statements if s.startswith("SELECT")]
+        assert len(lookups) == 3
+
+    def test_batch_rejects_empty_and_unknown_operations(self, client):
+        response = client.post("/medication-requests/batch", json={"operations": []})
+        assert response.status_code == 422
+        response = client.post(
+            "/medication-requests/batch",
+            json={"operations": [{"op": "delete", "id": 1}]},
+        )
+        assert response.status_code == 422
@@ -0,0 +1,339 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from patient_medication_app.app import app
+from patient_medication_app.core.archive import archive_closed_requests
+from patient_medication_app.core.audit import AuditDrainer
+from patient_medication_app.core.cache import result_cache
+from patient_medication_app.core.lifecycle import LifecycleScheduler
+from patient_medication_app.core.models import (
+    Clinician,
+    Medication,
+    MedicationRequest,
+    MedicationRequestArchive,
+    MedicationRequestAudit,
+    MedicationRequestAuditOutbox,
+    Patient,
+)
+from patient_medication_app.database.sharding import (
+    HashRing,
+    ShardSet,
+    get_shards,
+    misplaced_patients,
+    place_patients,
+    replicate_reference_data,
+)
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def shards(tmp_path):
+    shard_set = ShardSet(
+        {name: f"sqlite:///{tmp_path / name}.db" for name in ["a", "b", "c"]}
+    )
+    shard_set.create_all()
+    yield shard_set
+    shard_set.dispose()
+
+
+@pytest.fixture
+def sharded_client(client, shards):
+    app.dependency_overrides[get_shards] = lambda: shards
+    yield client
+
+
+@pytest.fixture
+def sharded_patients(db_session: Session, shards, sample_clinician, sample_medication):
+    """Six patients spread over the shards, with reference data replicated."""
+    replicate_reference_data(db_session, shards)
+    for patient_id in range(1, 7):
+        with shards.session_for_patient(patient_id) as db:
+            db.add(
+                Patient(
+                    id=patient_id,
+                    first_name="Patient",
+                    last_name=str(patient_id),
+                    date_of_birth=date(1990, 1, 1),
+                    sex="female",
+                )
+            )
+            db.commit()
+    return list(range(1, 7))
+
+
+def _request_data(patient_reference: int, prescribed_date: str) -> dict:
+    return {
+        "patient_reference": patient_reference,
+        "clinician_reference": "MD12345",
+        "medication_reference": "PARA500",
+        "reason": "Test reason",
+        "prescribed_date": prescribed_date,
+        "start_date": prescribed_date,
+        "frequency": "daily",
+        "status": "completed",
+    }
+
+
+def test_hash_ring_moves_few_keys_when_a_node_is_added():
+    ring = HashRing(["a", "b", "c"])
+    before = {key: ring.node_for(key) for key in range(3000)}
+
+    ring.add("d")
+    after = {key: ring.node_for(key) for key in range(3000)}
+
+    moved = [key for key in before if before[key] != after[key]]
+    assert all(after[key] == "d" for key in moved)
+    assert 0 < len(moved) < 3000 / 2
+    assert set(after.values()) == {"a", "b", "c", "d"}
+
+    ring.remove("d")
+    assert {key: ring.node_for(key) for key in range(3000)} == before
+
+
+def test_replicate_reference_data(
+    db_session: Session, shards, sample_clinician, sample_medication
+):
+    counts = replicate_reference_data(db_session, shards)
+    assert counts == {"medication": 1, "clinician": 1}
+
+    sample_medication.code_name = "Acetaminophen"
+    db_session.commit()
+    replicate_reference_data(db_session, shards)
+
+    for name in shards.names:
+        with shards.session(name) as db:
+            assert db.scalars(select(Medication.code_name)).all() == ["Acetaminophen"]
+            assert db.scalars(select(Clinician.registration_id)).all() == ["MD12345"]
+
+
+def test_create_routes_to_patient_shard(sharded_client, shards, sharded_patients):
+    for patient_id in sharded_patients:
+        response = sharded_client.post(
+            "/medication-requests/", json=_request_data(patient_id, "2025-06-01")
+        )
+        assert response.status_code == 200
+        assert response.json()["medication_code_name"] == "Paracetamol"
+
+    for name in shards.names:
+        with shards.session(name) as db:
+            stored = db.scalars(select(MedicationRequest.patient_reference)).all()
+        assert all(shards.shard_for(patient_id) == name for patient_id in stored)
+
+    assert misplaced_patients(shards) == {name: [] for name in shards.names}
+
+
+def test_create_places_a_new_patient_on_their_shard(
+    sharded_client,
+    db_session: Session,
+    shards,
+    sample_patient,
+    sample_clinician,
+    sample_medication,
+):
+    # Only the reference data has been synced; the patient is on the primary
+    replicate_reference_data(db_session, shards)
+    patient_id = sample_patient.id
+
+    response = sharded_client.post(
+        "/medication-requests/", json=_request_data(patient_id, "2025-06-01")
+    )
+
+    assert response.status_code == 200
+    assert response.json()["patient_reference"] == patient_id
+    home = shards.shard_for(patient_id)
+    for name in shards.names:
+        with shards.session(name) as db:
+            patients = db.scalars(select(Patient.id)).all()
+            requests = db.scalars(select(MedicationRequest.patient_reference)).all()
+        expected = [patient_id] if name == home else []
+        assert (patients, requests) == (expected, expected)
+
+    response = sharded_client.post(
+        "/medication-requests/", json=_request_data(999, "2025-06-01")
+    )
+    assert response.status_code == 404
+    assert "Patient" in response.json()["detail"]
+
+
+def test_place_patients(db_session: Session, shards, sample_clinician):
+    db_session.add_all(
+        Patient(
+            id=patient_id,
+            first_name="Patient",
+            last_name=str(patient_id),
+            date_of_birth=date(1990, 1, 1),
+            sex="female",
+        )
+        for patient_id in range(1, 11)
+    )
+    db_session.commit()
+
+    placed = place_patients(db_session, shards)
+
+    assert sum(placed.values()) == 10
+    assert misplaced_patients(shards) == {name: [] for name in shards.names}
+    for name in shards.names:
+        with shards.session(name) as db:
+            assert len(db.scalars(select(Patient.id)).all()) == placed[name]
+
+
+def test_sharded_creates_are_audited(sharded_client, shards, sharded_patients):
+    for patient_id in sharded_patients:
+        sharded_client.post(
+            "/medication-requests/", json=_request_data(patient_id, "2025-06-01")
+        )
+
+    drainer = AuditDrainer(TestingSessionLocal, shards=shards)
+    assert drainer.run_once() == len(sharded_patients)
+    assert drainer.metrics()["backlog"] == 0
+
+    for name in shards.names:
+        with shards.session(name) as db:
+            assert db.scalars(select(MedicationRequestAuditOutbox.id)).all() == []
+            audited = db.scalars(
+                select(MedicationRequestAudit.medication_request_id)
+            ).all()
+            assert sorted(audited) == sorted(db.scalars(select(MedicationRequest.id)))
+
+
+def test_list_scatters_and_merges(sharded_client, shards, sharded_patients):
+    for patient_id in sharded_patients:
+        sharded_client.post(
+            "/medication-requests/",
+            json=_request_data(patient_id, f"2025-06-{patient_id:02d}"),
+        )
+
+    response = sharded_client.get("/medication-requests/")
+    assert response.status_code == 200
+    assert [row["patient_reference"] for row in response.json()] == [6, 5, 4, 3, 2, 1]
+
+    response = sharded_client.get("/medication-requests/?patient_reference=4")
+    assert [row["patient_reference"] for row in response.json()] == [4]
+
+
+def test_requests_get_unique_ids_and_are_routed_by_id(
+    sharded_client, shards, sharded_patients
+):
+    ids = [
+        sharded_client.post(
+            "/medication-requests/", json=_request_data(patient_id, "2025-06-01")
+        ).json()["id"]
+        for patient_id in sharded_patients
+    ]
+    assert len(set(ids)) == len(ids)
+
+    for request_id, patient_id in zip(ids, sharded_patients):
+        response = sharded_client.get(f"/medication-requests/{request_id}")
+        assert response.status_code == 200
+        assert response.json()["patient_reference"] == patient_id
+
+        response = sharded_client.patch(
+            f"/medication-requests/{request_id}",
+            json={"status": "cancelled"},
+            headers={"If-Match": '"1"'},
+        )
+        assert response.status_code == 200
+        assert response.json()["version"] == 2
+
+    response = sharded_client.post(
+        "/medication-requests/lookup", json={"ids": [ids[3], 999, ids[0]]}
+    )
+    assert [row["id"] for row in response.json()["medication_requests"]] == [
+        ids[3],
+        ids[0],
+    ]
+    assert response.json()["not_found"] == [999]
+
+    assert sharded_client.get("/medication-requests/999").status_code == 404
+
+
+def test_batch_runs_on_the_shard_of_its_patients(
+    sharded_client, shards, sharded_patients
+):
+    home = shards.shard_for(1)
+    same_shard = [p for p in sharded_patients if shards.shard_for(p) == home]
+    other_shard = next(p for p in sharded_patients if shards.shard_for(p) != home)
+    created = sharded_client.post(
+        "/medication-requests/", json=_request_data(1, "2025-06-01")
+    ).json()
+
+    operations = [
+        {"op": "create", "data": _request_data(p, "2025-06-02")} for p in same_shard
+    ]
+    operations.append(
+        {"op": "patch", "id": created["id"], "data": {"status": "cancelled"}}
+    )
+    response = sharded_client.post(
+        "/medication-requests/batch", json={"operations": operations}
+    )
+    assert response.status_code == 200
+    with shards.session(home) as db:
+        assert len(db.scalars(select(MedicationRequest.id)).all()) == (
+            len(same_shard) + 1
+        )
+
+    response = sharded_client.post(
+        "/medication-requests/batch",
+        json={
+            "operations": [
+                {"op": "create", "data": _request_data(1, "2025-06-03")},
+                {"op": "create", "data": _request_data(other_shard, "2025-06-03")},
+            ]
+        },
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"]["operation"] == 1
+
+
+def test_archive_on_a_shard_bumps_the_primary_cache_generation(
+    db_session: Session, shards, sharded_patients
+):
+    with shards.session_for_patient(1) as db:
+        db.add(
+            MedicationRequest(
+                **{
+                    **_request_data(1, "2020-01-01"),
+                    "prescribed_date": date(2020, 1, 1),
+                    "start_date": date(2020, 1, 1),
+                }
+            )
+        )
+        db.commit()
+        generation = result_cache.generation(db_session)
+
+        assert archive_closed_requests(db, older_than_days=30, cache_db=db_session) == 1
+        assert result_cache.generation(db_session) > generation
+        assert db.scalars(select(MedicationRequestArchive.id)).all() != []
+
+
+def test_lifecycle_expires_requests_on_every_shard(shards, sharded_patients):
+    for patient_id in sharded_patients:
+        with shards.session_for_patient(patient_id) as db:
+            db.add(
+                MedicationRequest(
+                    **{
+                        **_request_data(patient_id, "2025-06-01"),
+                        "prescribed_date": date(2025, 6, 1),
+                        "start_date": date(2025, 6, 1),
+                        "end_date": date(2025, 7, 1),
+                        "status": "active",
+                    }
+                )
+            )
+            db.commit()
+
+    scheduler = LifecycleScheduler(TestingSessionLocal, shards=shards)
+    assert scheduler.run_once() == len(sharded_patients)
+    assert scheduler.metrics()["lag_days"] == 0
+
+    for name in shards.names:
+        with shards.session(name) as db:
+            assert set(db.scalars(select(MedicationRequest.status))) <= {"completed"}
+
+
+def test_unsharded_endpoints_are_refused(sharded_client, shards):
+    response = sharded_client.get("/medication-requests/export")
+    assert response.status_code == 501
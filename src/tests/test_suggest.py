@@ -0,0 +1,150 @@
+import time
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.models import Medication
+from patient_medication_app.core.suggest import (
+    MedicationIndex,
+    edit_distance,
+    medication_index,
+)
+
+CATALOGUE = [
+    ("PARA500", "Paracetamol 500mg"),
+    ("PARA1G", "Paracetamol 1g"),
+    ("IBU200", "Ibuprofen 200mg"),
+    ("AMOX250", "Amoxicillin 250mg capsules"),
+    ("CODPARA", "Co-codamol (codeine and paracetamol)"),
+]
+
+
+def _medication(code: str, code_name: str) -> Medication:
+    return Medication(
+        code=code,
+        code_name=code_name,
+        code_system="SNOMED-CT",
+        strength_value=1,
+        strength_unit="mg",
+        form="tablet",
+    )
+
+
+@pytest.fixture
+def index() -> MedicationIndex:
+    index = MedicationIndex()
+    index.apply(dict(CATALOGUE))
+    return index
+
+
+def _codes(suggestions) -> list[str]:
+    return [suggestion.code for suggestion in suggestions]
+
+
+def test_ranks_exact_code_then_prefixes(index: MedicationIndex):
+    suggestions = index.suggest("para500")
+    assert suggestions[0].code == "PARA500"
+    assert suggestions[0].score == 1.0
+
+    # Code prefixes, then name prefixes, then later words of a name
+    assert _codes(index.suggest("para")) == ["PARA1G", "PARA500", "CODPARA"]
+    assert _codes(index.suggest("parac")) == ["PARA1G", "PARA500", "CODPARA"]
+    assert index.suggest("parac")[2].score < index.suggest("parac")[0].score
+
+
+def test_tolerates_typos(index: MedicationIndex):
+    assert _codes(index.suggest("ibuprofin"))[0] == "IBU200"
+    assert _codes(index.suggest("amoxycillin"))[0] == "AMOX250"
+    assert index.suggest("zzzz") == []
+    assert index.suggest("  ") == []
+
+
+def test_tolerates_typos_while_typing(index: MedicationIndex):
+    # Compared with the prefixes of the same length of longer words
+    assert _codes(index.suggest("amoxc")) == ["AMOX250"]
+    assert set(_codes(index.suggest("paarc"))) == {"PARA500", "PARA1G", "CODPARA"}
+    assert _codes(index.suggest("amoxicilin caps")) == ["AMOX250"]
+    assert index.suggest("parxyz") == []
+
+
+def test_edit_distance():
+    assert edit_distance("paarc", "parac") == 1
+    assert edit_distance("amoxc", "amoxi") == 1
+    assert edit_distance("kitten", "sitting") == 3
+    assert edit_distance("", "abc") == 3
+
+
+def test_reloads_once_older_than_max_age(monkeypatch, db_session: Session):
+    index = MedicationIndex(max_age=60)
+    index.ensure_loaded(db_session)
+    assert index.suggest("ibuprofen") == []
+
+    # Written by another process, without this process' session events
+    db_session.execute(
+        insert(Medication).values(
+            code="IBU200",
+            code_name="Ibuprofen 200mg",
+            code_system="SNOMED-CT",
+            strength_value=200,
+            strength_unit="mg",
+            form="tablet",
+        )
+    )
+    db_session.commit()
+    index.ensure_loaded(db_session)
+    assert index.suggest("ibuprofen") == []
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert index.stale()
+    index.ensure_loaded(db_session)
+    assert _codes(index.suggest("ibuprofen")) == ["IBU200"]
+
+
+def test_incremental_changes(index: MedicationIndex):
+    index.apply({"IBU200": None, "NAP250": "Naproxen 250mg"})
+
+    assert index.suggest("ibuprofen") == []
+    assert _codes(index.suggest("napro")) == ["NAP250"]
+
+
+def test_suggest_is_fast(index: MedicationIndex):
+    index.apply({f"MED{i}": f"Medication number {i} tablets" for i in range(5000)})
+
+    started = time.perf_counter()
+    for query in ["para", "ibuprofin", "medication number 42", "tab"] * 25:
+        index.suggest(query)
+    assert (time.perf_counter() - started) / 100 < 0.001
+
+
+def test_index_follows_committed_changes(client, db_session: Session):
+    medication_index.ensure_loaded(db_session)
+    db_session.add(_medication("IBU200", "Ibuprofen 200mg"))
+    db_session.commit()
+    assert _codes(medication_index.suggest("ibu")) == ["IBU200"]
+
+    medication = db_session.query(Medication).filter_by(code="IBU200").one()
+    medication.code_name = "Brufen 200mg"
+    db_session.commit()
+    assert _codes(medication_index.suggest("bruf")) == ["IBU200"]
+    assert medication_index.suggest("ibuprofen") == []
+
+    db_session.add(_medication("NAP250", "Naproxen 250mg"))
+    db_session.rollback()
+    assert medication_index.suggest("naproxen") == []
+
+    db_session.delete(medication)
+    db_session.commit()
+    assert medication_index.suggest("bruf") == []
+
+
+def test_suggest_endpoint(client, sample_medication):
+    response = client.get("/medications/suggest", params={"q": "paracetmol"})
+
+    assert response.status_code == 200
+    assert response.json()[0]["code"] == "PARA500"
+    assert response.json()[0]["code_name"] == "Paracetamol"
+
+    response = client.get("/medications/suggest", params={"q": ""})
+    assert response.status_code == 422
@@ -0,0 +1,88 @@
+from datetime import date
+
+import pytest
+from sqlalchemy.orm import Session
+
+from patient_medication_app.core.models import MedicationRequest
+from patient_medication_app.core.timeseries import active_counts
+
+np = pytest.importorskip("numpy")
+
+
+def test_active_counts_sweep():
+    groups, counts = active_counts(
+        ["B", "A", "A", "A"],
+        [date(2025, 1, 2), date(2025, 1, 1), date(2024, 12, 1), date(2025, 2, 1)],
+        [date(2025, 1, 3), None, date(2025, 1, 2), None],
+        date(2025, 1, 1),
+        date(2025, 1, 5),
+    )
+
+    assert groups == ["A", "B"]
+    assert counts.tolist() == [
+        # Open-ended from 1 Jan, plus a request clipped to end on 2 Jan;
+        # the February request is outside the range
+        [2, 2, 1, 1, 1],
+        [0, 1, 1, 0, 0],
+    ]
+
+
+def test_active_counts_empty():
+    groups, counts = active_counts([], [], [], date(2025, 1, 1), date(2025, 1, 3))
+    assert groups == []
+    assert counts.shape == (0, 3)
+
+
+def test_timeseries_endpoint_by_status(
+    client, db_session: Session, sample_medication_requests
+):
+    # Give the completed request an end date inside the range
+    completed = db_session.get(MedicationRequest, sample_medication_requests[1].id)
+    completed.end_date = date(2025, 6, 10)
+    db_session.commit()
+
+    response = client.get(
+        "/medication-requests/timeseries"
+        "?start=2025-06-08&end=2025-06-17&group_by=status"
+        "&status=active&status=completed&status=on-hold&status=cancelled"
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["groups"] == ["active", "cancelled", "completed", "on-hold"]
+    assert data["counts"][data["groups"].index("completed")] == [0, 1, 1] + [0] * 7
+    assert data["counts"][data["groups"].index("active")][-2:] == [1, 1]
+    assert data["counts"][data["groups"].index("cancelled")] == [1] * 10
+
+
+def test_timeseries_endpoint_excludes_cancelled_by_default(
+    client, sample_medication_requests
+):
+    response = client.get(
+        "/medication-requests/timeseries"
+        "?start=2025-06-16&end=2025-06-16&group_by=status"
+    )
+
+    assert response.status_code == 200
+    assert response.json()["groups"] == ["active", "completed", "on-hold"]
+    assert response.json()["counts"] == [[1], [1], [1]]
+
+
+def test_timeseries_endpoint_by_medication(client, sample_medication_requests):
+    response = client.get(
+        "/medication-requests/timeseries?start=2025-06-16&end=2025-06-16&status=active"
+    )
+
+    assert response.json()["groups"] == ["PARA500"]
+    assert response.json()["counts"] == [[1]]
+
+
+def test_timeseries_endpoint_rejects_bad_ranges(client):
+    response = client.get(
+        "/medication-requests/timeseries?start=2025-06-16&end=2025-06-01"
+    )
+    assert response.status_code == 400
+    response = client.get(
+        "/medication-requests/timeseries?start=2000-01-01&end=2025-01-01"
+    )
+    assert response.status_code == 400